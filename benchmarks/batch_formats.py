@@ -0,0 +1,104 @@
+"""
+Throughput of the list-of-objects /batch-predict endpoint against the columnar
+/batch-predict/columns endpoint.
+
+Both endpoints run on the in-process app (ASGI transport, no network) with
+request bodies encoded up front, so the numbers cover parsing, validation,
+scoring and response encoding. Also times request parsing and validation on
+its own: one pydantic HousePredictionRequest per row against the vectorized
+columnar checks. Run from a directory with models/trained.
+
+    python benchmarks/batch_formats.py --batch-sizes 100 1000 10000
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+import timeit
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "api")
+LOCATIONS = ["Downtown", "Mountain", "Rural", "Suburb", "Urban", "Waterfront"]
+
+
+def rows(size):
+    return [{"sqft": 900.0 + 7 * i % 3000, "bedrooms": 1 + i % 5, "bathrooms": 1 + i % 3,
+             "location": LOCATIONS[i % len(LOCATIONS)], "year_built": 1950 + i % 70, "condition": "Good"}
+            for i in range(size)]
+
+
+def columns(records):
+    return {field: [record[field] for record in records] for field in records[0]}
+
+
+async def median_latency(client, path, body, requests):
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await client.post(path, content=body, headers={"Content-Type": "application/json"})
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+    return statistics.median(latencies)
+
+
+async def endpoints(app, sizes, requests):
+    import httpx
+    results = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                 timeout=120) as client:
+        for size in sizes:
+            records = rows(size)
+            bodies = {"/batch-predict": json.dumps(records).encode(),
+                      "/batch-predict/columns": json.dumps(columns(records)).encode()}
+            count = max(3, min(requests, 20000 // size))
+            latency = {}
+            for path, body in bodies.items():
+                await median_latency(client, path, body, 1)  # warm up
+                latency[path] = await median_latency(client, path, body, count)
+            objects, columnar = latency["/batch-predict"], latency["/batch-predict/columns"]
+            results.append({"batch_size": size, "objects_ms": round(objects * 1e3, 2),
+                            "columns_ms": round(columnar * 1e3, 2),
+                            "objects_rows_per_s": round(size / objects), "columns_rows_per_s": round(size / columnar),
+                            "speedup": round(objects / columnar, 1)})
+            print(json.dumps(results[-1]), flush=True)
+    return results
+
+
+def parsing(sizes, repeat=3):
+    from columnar import parse_columns
+    from schemas import HousePredictionRequest
+    for size in sizes:
+        records = rows(size)
+        object_body, column_body = json.dumps(records).encode(), json.dumps(columns(records)).encode()
+        number = max(1, 2000 // size)
+        objects = min(timeit.repeat(lambda: [HousePredictionRequest(**record) for record in json.loads(object_body)],
+                                    repeat=repeat, number=number)) / number
+        columnar = min(timeit.repeat(lambda: parse_columns(column_body), repeat=repeat, number=number)) / number
+        print(json.dumps({"batch_size": size, "parse_objects_ms": round(objects * 1e3, 3),
+                          "parse_columns_ms": round(columnar * 1e3, 3), "speedup": round(objects / columnar, 1)}))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--requests", type=int, default=50, help="Requests per endpoint and batch size (fewer for big batches)")
+    args = parser.parse_args()
+
+    os.environ.setdefault("MICRO_BATCHING", "false")
+    sys.path.insert(0, os.path.abspath(API_DIR))
+    with contextlib.redirect_stdout(io.StringIO()):
+        import main
+
+    async def run():
+        await main.start_inference()
+        try:
+            await endpoints(main.app, args.batch_sizes, args.requests)
+        finally:
+            await main.stop_inference()
+
+    asyncio.run(run())
+    parsing(args.batch_sizes)
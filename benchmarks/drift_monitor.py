@@ -0,0 +1,73 @@
+"""
+Cost of the API's input drift monitor (src/api/drift.py) per scored input.
+
+Loads the reference profile next to the preprocessor and, per batch size,
+times the scoring path (preprocess + predict) against counting the same
+inputs: DriftMonitor.observe for single requests, observe_batch for request
+objects (sampled past DRIFT_BATCH_SAMPLE_SIZE) and observe_columns for
+columnar batches. Also times computing the PSI/KS gauges, which happens on
+every /metrics scrape.
+
+    python benchmarks/drift_monitor.py --model-dir models/trained --batch-sizes 1 100 10000
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import timeit
+import numpy as np
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "api")
+LOCATIONS = ["Downtown", "Mountain", "Rural", "Suburb", "Urban", "Waterfront"]
+
+
+def best_us(function, repeat, number):
+    return min(timeit.repeat(function, repeat=repeat, number=number)) / number * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--model-dir", default="models/trained",
+                        help="Directory with house_price_model.pkl, preprocessor.pkl and reference_profile.json")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(API_DIR))
+    os.environ.setdefault("PREDICTION_CACHE_SIZE", "0")
+    with contextlib.redirect_stdout(io.StringIO()):
+        import inference
+        from drift import DriftMonitor
+        from registry import load_bundle
+        from schemas import HousePredictionRequest
+    bundle = load_bundle(os.path.join(args.model_dir, "house_price_model.pkl"),
+                         os.path.join(args.model_dir, "preprocessor.pkl"))
+    if bundle.reference_profile is None:
+        sys.exit(f"No reference_profile.json in {args.model_dir}")
+    monitor = DriftMonitor(bundle.reference_profile, min_observations=1)
+
+    for size in args.batch_sizes:
+        requests = [HousePredictionRequest(sqft=900 + 7 * i % 3000, bedrooms=1 + i % 5, bathrooms=1 + i % 3,
+                                           location=LOCATIONS[i % len(LOCATIONS)], year_built=1950 + i % 70,
+                                           condition="Good")
+                    for i in range(size)]
+        # As parsed by columnar.parse_columns: numeric columns as float64 arrays, strings as lists
+        columns = {field: [getattr(request, field) for request in requests] for field in ("location", "condition")}
+        columns.update({field: np.array([getattr(request, field) for request in requests], dtype=np.float64)
+                        for field in ("sqft", "bedrooms", "bathrooms", "year_built")})
+        number = max(1, 1000 // size)
+        if size == 1:
+            scoring = best_us(lambda: inference.predict_price(requests[0], bundle), args.repeat, number)
+            observe = best_us(lambda: monitor.observe(requests[0]), args.repeat, 10000)
+        else:
+            scoring = best_us(lambda: inference._predict_batch(requests, bundle), args.repeat, number)
+            observe = best_us(lambda: monitor.observe_batch(requests), args.repeat, number * 10)
+        observe_columns = best_us(lambda: monitor.observe_columns(columns), args.repeat, number * 10)
+        print(json.dumps({"batch_size": size, "scoring_us": round(scoring, 1), "observe_us": round(observe, 2),
+                          "observe_columns_us": round(observe_columns, 2),
+                          "overhead_pct": round(observe / scoring * 100, 2)}), flush=True)
+
+    scrape = best_us(lambda: list(monitor.collect()), args.repeat, 1000)
+    print(json.dumps({"collect_us": round(scrape, 1)}))
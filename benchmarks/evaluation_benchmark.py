@@ -0,0 +1,94 @@
+"""
+Runtime of the vectorized evaluation engine (src/models/evaluation.py) against
+the per-call approach it replaced: four sklearn metric calls, a Python loop
+over bootstrap resamples, and a pandas groupby per slice.
+
+Targets are log-normal prices, predictions carry 10% noise, and every row gets
+one of six locations and four conditions, one-hot encoded like the feature
+stage's output.
+
+    python benchmarks/evaluation_benchmark.py --rows 100000 1000000 10000000 --bootstrap 1000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "models"))
+from evaluation import decile_codes, evaluate, one_hot_codes
+
+LOCATIONS = ["Downtown", "Mountain", "Rural", "Suburb", "Urban", "Waterfront"]
+CONDITIONS = ["Excellent", "Fair", "Good", "Poor"]
+
+
+def synthetic(rows, seed=42):
+    rng = np.random.default_rng(seed)
+    y = rng.lognormal(13, 0.4, rows)
+    pred = y * (1 + rng.normal(0, 0.1, rows))
+    location = rng.integers(0, len(LOCATIONS), rows)
+    condition = rng.integers(0, len(CONDITIONS), rows)
+    X = pd.DataFrame(np.hstack([np.eye(len(LOCATIONS), dtype=np.float32)[location],
+                                np.eye(len(CONDITIONS), dtype=np.float32)[condition]]),
+                     columns=[f"cat__location_{name}" for name in LOCATIONS] +
+                             [f"cat__condition_{name}" for name in CONDITIONS])
+    return X, y, pred
+
+
+def engine(X, y, pred, n_bootstrap):
+    names = list(X.columns)
+    slices = {"location": one_hot_codes(X, names, "cat__location_"),
+              "condition": one_hot_codes(X, names, "cat__condition_"),
+              "price_decile": decile_codes(y)}
+    return evaluate(y, pred, slices, n_bootstrap=n_bootstrap)
+
+
+def baseline(X, y, pred, n_bootstrap):
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+    def metrics(y, pred):
+        return (mean_absolute_error(y, pred), np.sqrt(mean_squared_error(y, pred)), r2_score(y, pred),
+                np.mean(np.abs((y - pred) / y)) * 100)
+
+    metrics(y, pred)
+    rng = np.random.default_rng(42)
+    for _ in range(n_bootstrap):
+        rows = rng.integers(0, len(y), len(y))
+        metrics(y[rows], pred[rows])
+    frame = pd.DataFrame({"y": y, "pred": pred,
+                          "location": X.filter(like="cat__location_").to_numpy().argmax(axis=1),
+                          "condition": X.filter(like="cat__condition_").to_numpy().argmax(axis=1),
+                          "decile": pd.qcut(y, 10, labels=False)})
+    for column in ("location", "condition", "decile"):
+        frame.groupby(column).apply(lambda group: metrics(group["y"].to_numpy(), group["pred"].to_numpy()))
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return round(time.perf_counter() - start, 3)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--bootstrap", type=int, default=1000)
+    parser.add_argument("--baseline-max-rows", type=int, default=1000000,
+                        help="Skip the baseline above this many rows (it takes minutes)")
+    args = parser.parse_args()
+
+    results = []
+    for rows in args.rows:
+        X, y, pred = synthetic(rows)
+        result = {
+            "rows": rows,
+            "engine_point_s": timed(engine, X, y, pred, 0),
+            "engine_bootstrap_s": timed(engine, X, y, pred, args.bootstrap),
+        }
+        if rows <= args.baseline_max_rows:
+            result["baseline_bootstrap_s"] = timed(baseline, X, y, pred, args.bootstrap)
+        results.append(result)
+        print(json.dumps(result), flush=True)
@@ -0,0 +1,71 @@
+"""
+Latency added by ?explain=true feature attributions (XGBoost pred_contribs).
+
+Per batch size, times the API's batch scoring path (preprocess + predict)
+against batch_explain, which also computes the SHAP values and sums the
+one-hot columns back to location and condition. batch_explain runs three
+ways: with the attribution cache off, so every row goes through exact
+TreeSHAP; the same with ATTRIBUTION_METHOD=approx; and with every row
+already cached.
+
+    python benchmarks/feature_attributions.py --model-dir models/trained --batch-sizes 1 10 100 1000 10000
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import timeit
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "api")
+LOCATIONS = ["Downtown", "Mountain", "Rural", "Suburb", "Urban", "Waterfront"]
+CONDITIONS = ["Excellent", "Fair", "Good", "Poor"]
+
+
+def best_ms(function, repeat, number):
+    return min(timeit.repeat(function, repeat=repeat, number=number)) / number * 1e3
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--model-dir", default="models/trained",
+                        help="Directory with house_price_model.pkl and preprocessor.pkl")
+    parser.add_argument("--model-name", default="house_price_model.pkl")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(API_DIR))
+    with contextlib.redirect_stdout(io.StringIO()):
+        import inference
+        from registry import load_bundle
+        from schemas import HousePredictionRequest
+    bundle = load_bundle(os.path.join(args.model_dir, args.model_name), os.path.join(args.model_dir, "preprocessor.pkl"))
+    if bundle.attributor is None:
+        sys.exit(f"{args.model_name} does not support pred_contribs")
+    cache = inference.attribution_cache
+    print(json.dumps({"trees": bundle.model.get_booster().num_boosted_rounds(), "features": bundle.attributor.features}))
+
+    for size in args.batch_sizes:
+        requests = [HousePredictionRequest(sqft=900 + 7 * i % 3000, bedrooms=1 + i % 5, bathrooms=1 + i % 3,
+                                           location=LOCATIONS[i % len(LOCATIONS)], year_built=1950 + i % 70,
+                                           condition=CONDITIONS[i % len(CONDITIONS)])
+                    for i in range(size)]
+        number = max(1, 200 // size)
+        scoring = best_ms(lambda: inference._predict_batch(requests, bundle), args.repeat, number)
+
+        cache.max_size = 0
+        cold = best_ms(lambda: inference.batch_explain(requests, bundle), args.repeat, number)
+        bundle.attributor.approximate = True
+        approx = best_ms(lambda: inference.batch_explain(requests, bundle), args.repeat, number)
+        bundle.attributor.approximate = False
+        cache.max_size = size
+        inference.batch_explain(requests, bundle)
+        warm = best_ms(lambda: inference.batch_explain(requests, bundle), args.repeat, number)
+        cache.clear()
+
+        print(json.dumps({"batch_size": size, "scoring_ms": round(scoring, 3), "explain_ms": round(cold, 3),
+                          "explain_approx_ms": round(approx, 3), "explain_cached_ms": round(warm, 3),
+                          "overhead_x": round(cold / scoring, 1), "approx_overhead_x": round(approx / scoring, 1),
+                          "cached_overhead_x": round(warm / scoring, 1)}), flush=True)
@@ -0,0 +1,83 @@
+"""
+Time and peak memory of feature engineering: the previous pandas implementation
+of create_features vs the single-pass float32 kernel in src/features/feature_kernel.py.
+
+Each (implementation, rows) pair runs in a fresh process on a synthetic cleaned
+dataset sampled from data/raw/house_data.csv. Peak memory is the largest amount
+allocated (tracemalloc) on top of the input frame, i.e. the input is not counted.
+
+    python benchmarks/feature_engineering.py --rows 1000000 10000000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+WORKER = r"""
+import json, sys, time, tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+sys.path.insert(0, {features_dir!r})
+from feature_kernel import build_feature_frame
+
+def pandas_features(df):
+    # create_features before the kernel: copy, then one temporary Series per step
+    df_featured = df.copy()
+    df_featured['house_age'] = datetime.now().year - df_featured['year_built']
+    df_featured['price_per_sqft'] = df_featured['price'] / df_featured['sqft']
+    df_featured['bed_bath_ratio'] = df_featured['bedrooms'] / df_featured['bathrooms']
+    df_featured['bed_bath_ratio'] = df_featured['bed_bath_ratio'].replace([np.inf, -np.inf], np.nan)
+    df_featured['bed_bath_ratio'] = df_featured['bed_bath_ratio'].fillna(0)
+    return df_featured
+
+rng = np.random.default_rng(42)
+raw = pd.read_csv({data_path!r})
+df = raw.iloc[rng.integers(0, len(raw), size={rows})].reset_index(drop=True)
+df['sqft'] = df['sqft'] * rng.lognormal(0, 0.1, size={rows})
+df['price'] = df['price'] * rng.lognormal(0, 0.1, size={rows})
+input_mb = df.memory_usage(deep=False).sum() / 1e6
+
+fn = pandas_features if {implementation!r} == 'pandas' else build_feature_frame
+tracemalloc.start()
+start = time.perf_counter()
+result = fn(df)
+seconds = time.perf_counter() - start
+_, peak = tracemalloc.get_traced_memory()
+print(json.dumps({{
+    "seconds": round(seconds, 3),
+    "peak_extra_mb": round(peak / 1e6, 1),
+    "input_mb": round(input_mb, 1),
+    "output_mb": round(result.memory_usage(deep=False).sum() / 1e6, 1),
+}}))
+"""
+
+
+def run(implementation, rows):
+    code = WORKER.format(
+        features_dir=os.path.abspath(os.path.join(REPO_ROOT, "src", "features")),
+        data_path=os.path.abspath(os.path.join(REPO_ROOT, "data", "raw", "house_data.csv")),
+        rows=rows,
+        implementation=implementation,
+    )
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000000, 10000000])
+    args = parser.parse_args()
+
+    report = {}
+    for rows in args.rows:
+        report[rows] = {implementation: run(implementation, rows) for implementation in ("pandas", "kernel")}
+        print(f"{rows} rows: {report[rows]}", file=sys.stderr)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Overhead of the API's request/stage instrumentation (src/api/instrumentation.py).
+
+Two measurements against the in-process app (ASGI transport, no network, so
+the instrumentation's share is as large as it gets):
+
+* A/B: every /predict and /batch-predict request is sent twice back to back,
+  once with instrumentation on and once off (alternating which goes first),
+  and the median latency per mode compared;
+* layer: the code the instrumentation runs for one request (middleware,
+  parse mark, stage timer) timed on its own against a stub app and divided by
+  the median uninstrumented /predict latency. The A/B difference is of the
+  same order as run-to-run noise on a busy machine; this is the steadier number.
+
+Micro-batching and the prediction cache are off so every /predict runs the
+model immediately. Run from a directory with models/trained.
+
+    python benchmarks/instrumentation_overhead.py --rounds 10 --requests 300
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "api")
+
+
+def payload(i):
+    return {"sqft": 900 + i % 3000, "bedrooms": 1 + i % 5, "bathrooms": 1 + i % 3,
+            "location": ["Downtown", "Rural", "Suburb", "Urban"][i % 4], "year_built": 1950 + i % 70,
+            "condition": "Good"}
+
+
+async def paired_requests(client, instrumentation, path, bodies):
+    """Send each body twice, once per mode, alternating which goes first."""
+    latencies = {True: [], False: []}
+    for i, body in enumerate(bodies):
+        for enabled in ((True, False) if i % 2 == 0 else (False, True)):
+            instrumentation.set_enabled(enabled)
+            start = time.perf_counter()
+            response = await client.post(path, json=body)
+            latencies[enabled].append(time.perf_counter() - start)
+            response.raise_for_status()
+    return latencies
+
+
+async def ab_test(app, instrumentation, rounds, requests, batch_size):
+    import httpx
+    single = [payload(i) for i in range(requests)]
+    batches = [[payload(i * batch_size + j) for j in range(batch_size)] for i in range(max(1, requests // 10))]
+    latencies = {path: {True: [], False: []} for path in ("/predict", "/batch-predict")}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        await paired_requests(client, instrumentation, "/predict", single[:50])  # warm up
+        for _ in range(rounds):
+            for path, bodies in (("/predict", single), ("/batch-predict", batches)):
+                for enabled, values in (await paired_requests(client, instrumentation, path, bodies)).items():
+                    latencies[path][enabled].extend(values)
+    instrumentation.set_enabled(True)
+    results = {}
+    for path, by_mode in latencies.items():
+        on, off = statistics.median(by_mode[True]), statistics.median(by_mode[False])
+        results[path] = {"instrumented_us": round(on * 1e6, 1), "uninstrumented_us": round(off * 1e6, 1),
+                         "overhead_pct": round((on - off) / off * 100, 2)}
+    return results
+
+
+async def layer_cost_us(instrumentation, number=100000):
+    """
+    Instrumentation cost of one /predict request: the middleware around a stub
+    app that does nothing but mark the parse stage, plus one handler's stage
+    timer with its marks, enabled minus disabled. Over many requests, so stage
+    sampling (STAGE_SAMPLE_EVERY) is amortised as it is in production.
+    """
+    start_message = {"type": "http.response.start", "status": 200, "headers": []}
+    body_message = {"type": "http.response.body", "body": b"{}"}
+
+    async def handler(scope, receive, send):
+        instrumentation.request_parsed(1)
+        timer = instrumentation.stage_timer(1)
+        for stage in ("preprocess", "predict", "postprocess"):
+            timer.mark(stage)
+        await send(start_message)
+        await send(body_message)
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    middleware = instrumentation.InstrumentationMiddleware(handler, endpoints={"/predict"})
+    scope = {"type": "http", "path": "/predict"}
+    best = {}
+    for _ in range(3):
+        for enabled in (True, False):
+            instrumentation.set_enabled(enabled)
+            start = time.perf_counter()
+            for _ in range(number):
+                await middleware(scope, receive, send)
+            elapsed = (time.perf_counter() - start) / number
+            best[enabled] = min(best.get(enabled, elapsed), elapsed)
+    instrumentation.set_enabled(True)
+    return (best[True] - best[False]) * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=300, help="Sequential /predict requests per round")
+    parser.add_argument("--batch-size", type=int, default=100, help="Rows per /batch-predict request")
+    args = parser.parse_args()
+
+    os.environ.update(MICRO_BATCHING="false", PREDICTION_CACHE_SIZE="0", INSTRUMENTATION="true")
+    sys.path.insert(0, os.path.abspath(API_DIR))
+    with contextlib.redirect_stdout(io.StringIO()):
+        import instrumentation
+        import main
+
+    async def run():
+        await main.start_inference()
+        try:
+            return await ab_test(main.app, instrumentation, args.rounds, args.requests, args.batch_size)
+        finally:
+            await main.stop_inference()
+
+    results = asyncio.run(run())
+    cost = asyncio.run(layer_cost_us(instrumentation))
+    results["layer"] = {
+        "per_request_us": round(cost, 2),
+        "share_of_predict_pct": round(cost / results["/predict"]["uninstrumented_us"] * 100, 2),
+    }
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,261 @@
+"""
+End-to-end load test for the prediction API.
+
+Drives /predict and /batch-predict with closed-loop clients at each configured
+concurrency (and batch size), using payloads sampled from the training data, and
+reports throughput plus p50/p95/p99/p999 latency as JSON. The app runs in-process
+(default), on a local uvicorn started by this script (--serve), or at --url.
+
+    python benchmarks/load_benchmark.py --concurrency 1 8 32 --batch-sizes 10 100 --output results.json
+    python benchmarks/load_benchmark.py --baseline benchmarks/baseline.json --max-regression 0.10
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+API_DIR = os.path.join(REPO_ROOT, "src", "api")
+DATA_PATH = os.path.join(REPO_ROOT, "data", "raw", "house_data.csv")
+
+PERCENTILES = {"p50": 50, "p95": 95, "p99": 99, "p999": 99.9}
+
+
+def generate_payloads(data_path: str, n: int, seed: int = 42) -> list[dict]:
+    """
+    Sample n HousePredictionRequest payloads from the raw data: each payload keeps a
+    real row's location/condition/bedrooms mix and jitters sqft and year_built, so
+    payloads follow the data's distribution without repeating (and hitting the cache).
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.read_csv(data_path)
+    rows = df.iloc[rng.integers(0, len(df), size=n)].reset_index(drop=True)
+    sqft = np.round(rows['sqft'] * rng.lognormal(0, 0.1, size=n), 1)
+    year_built = np.clip(rows['year_built'] + rng.integers(-5, 6, size=n), 1800, 2023)
+    return [
+        {
+            "sqft": float(sqft[i]),
+            "bedrooms": int(rows['bedrooms'][i]),
+            "bathrooms": float(rows['bathrooms'][i]),
+            "location": rows['location'][i],
+            "year_built": int(year_built[i]),
+            "condition": rows['condition'][i],
+        }
+        for i in range(n)
+    ]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float, rows_per_request: int) -> dict:
+    """Throughput and latency percentiles (milliseconds) for one scenario."""
+    latencies_ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    requests = len(latencies) + errors
+    return {
+        "requests": requests,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "rows_per_second": round(len(latencies) * rows_per_request / elapsed, 1),
+        "latency_ms": {
+            "mean": round(float(latencies_ms.mean()), 3),
+            **{name: round(float(np.percentile(latencies_ms, q)), 3) for name, q in PERCENTILES.items()},
+            "max": round(float(latencies_ms.max()), 3),
+        },
+    }
+
+
+async def run_scenario(client: httpx.AsyncClient, path: str, bodies: list, concurrency: int,
+                       duration: float, warmup: float) -> tuple:
+    """
+    Run `concurrency` clients that each send the next body as soon as their previous
+    request completes, for warmup + duration seconds; only the measured window counts.
+    """
+    latencies = []
+    errors = 0
+    cursor = 0
+    loop = asyncio.get_running_loop()
+    measure_from = loop.time() + warmup
+    stop_at = measure_from + duration
+
+    async def client_loop():
+        nonlocal cursor, errors
+        while loop.time() < stop_at:
+            body = bodies[cursor % len(bodies)]
+            cursor += 1
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if loop.time() < measure_from:
+                continue
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return latencies, errors, loop.time() - measure_from
+
+
+async def run_suite(client: httpx.AsyncClient, args) -> dict:
+    payloads = generate_payloads(args.data, args.payloads, args.seed)
+    scenarios = {}
+    for concurrency in args.concurrency:
+        name = f"predict_c{concurrency}"
+        latencies, errors, elapsed = await run_scenario(
+            client, "/predict", payloads, concurrency, args.duration, args.warmup)
+        scenarios[name] = {"endpoint": "/predict", "concurrency": concurrency, "batch_size": 1,
+                           **summarize(latencies, errors, elapsed, 1)}
+        print(f"{name}: {scenarios[name]['requests_per_second']} req/s, "
+              f"p99 {scenarios[name]['latency_ms']['p99']} ms", file=sys.stderr)
+
+    for batch_size in args.batch_sizes:
+        batches = [payloads[i:i + batch_size] for i in range(0, len(payloads) - batch_size + 1, batch_size)]
+        for concurrency in args.batch_concurrency:
+            name = f"batch_b{batch_size}_c{concurrency}"
+            latencies, errors, elapsed = await run_scenario(
+                client, "/batch-predict", batches, concurrency, args.duration, args.warmup)
+            scenarios[name] = {"endpoint": "/batch-predict", "concurrency": concurrency, "batch_size": batch_size,
+                               **summarize(latencies, errors, elapsed, batch_size)}
+            print(f"{name}: {scenarios[name]['rows_per_second']} rows/s, "
+                  f"p99 {scenarios[name]['latency_ms']['p99']} ms", file=sys.stderr)
+    return scenarios
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_uvicorn(workers: int) -> tuple:
+    """Start the API on a local uvicorn; returns (process, base_url) once /health responds."""
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", os.path.abspath(API_DIR),
+         "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            if httpx.get(f"{url}/health").status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("uvicorn did not become healthy within 60s")
+
+
+async def benchmark(args) -> dict:
+    limits = httpx.Limits(max_connections=max(args.concurrency + args.batch_concurrency))
+    if args.url or args.serve:
+        process, url = (None, args.url) if args.url else start_uvicorn(args.uvicorn_workers)
+        try:
+            async with httpx.AsyncClient(base_url=url, limits=limits, timeout=args.timeout) as client:
+                return await run_suite(client, args)
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    # In-process: the client and the app share one event loop and process
+    sys.path.insert(0, os.path.abspath(API_DIR))
+    import main as api
+    await api.start_inference()
+    try:
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=args.timeout) as client:
+            return await run_suite(client, args)
+    finally:
+        await api.stop_inference()
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list[str]:
+    """
+    Scenarios in both runs whose throughput dropped, or whose p99 latency grew,
+    by more than max_regression (a fraction) relative to the baseline.
+    """
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline["scenarios"].get(name)
+        if previous is None:
+            continue
+        if current["rows_per_second"] < previous["rows_per_second"] * (1 - max_regression):
+            regressions.append(f"{name}: throughput {previous['rows_per_second']} -> "
+                               f"{current['rows_per_second']} rows/s")
+        if current["latency_ms"]["p99"] > previous["latency_ms"]["p99"] * (1 + max_regression):
+            regressions.append(f"{name}: p99 {previous['latency_ms']['p99']} -> "
+                               f"{current['latency_ms']['p99']} ms")
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{name}: errors {previous['errors']} -> {current['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="Benchmark an already running API instead of the in-process app")
+    target.add_argument("--serve", action="store_true", help="Start the API on a local uvicorn")
+    parser.add_argument("--uvicorn-workers", type=int, default=1)
+    parser.add_argument("--data", default=DATA_PATH, help="CSV whose distribution the payloads follow")
+    parser.add_argument("--payloads", type=int, default=10000, help="Distinct payloads to generate")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32],
+                        help="Concurrent clients for /predict")
+    parser.add_argument("--batch-sizes", type=int, nargs="*", default=[10, 100, 1000],
+                        help="Rows per /batch-predict request")
+    parser.add_argument("--batch-concurrency", type=int, nargs="+", default=[4],
+                        help="Concurrent clients for /batch-predict")
+    parser.add_argument("--duration", type=float, default=10, help="Measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2, help="Unmeasured seconds before each scenario")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--output", help="Write the JSON report here as well as to stdout")
+    parser.add_argument("--baseline", help="Fail if results regress against this earlier report")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="Tolerated relative throughput drop / p99 increase (default 0.10)")
+    args = parser.parse_args()
+
+    results = {
+        "target": args.url or ("uvicorn" if args.serve else "in-process"),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "duration_s": args.duration,
+        "scenarios": asyncio.run(benchmark(args)),
+    }
+    report = json.dumps(results, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("target") != results["target"] or baseline.get("cpus") != results["cpus"]:
+            print(f"Warning: baseline ran against {baseline.get('target')} on {baseline.get('cpus')} CPUs",
+                  file=sys.stderr)
+        regressions = compare(results, baseline, args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Per-stage I/O timing of the training pipeline for CSV vs Parquet vs Arrow IPC.
+
+Builds a synthetic cleaned dataset of N rows from data/raw/house_data.csv, then
+times, for each format, the reads and writes each pipeline stage does
+(run_processing -> engineer -> train_model/evaluate_model) plus handing the
+featured data to xgboost.DMatrix, and reports seconds and file sizes as JSON.
+
+    python benchmarks/pipeline_io.py --rows 1000000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(REPO_ROOT, "src", "data"))
+sys.path.insert(0, os.path.join(REPO_ROOT, "src", "features"))
+
+from storage import read_arrow, read_table, table_format, write_table  # noqa: E402
+
+
+def synthetic_cleaned(rows, seed=42):
+    """rows sampled from the raw data with sqft/price jitter, like a large cleaned file."""
+    rng = np.random.default_rng(seed)
+    df = pd.read_csv(os.path.join(REPO_ROOT, "data", "raw", "house_data.csv"))
+    sample = df.iloc[rng.integers(0, len(df), size=rows)].reset_index(drop=True)
+    sample['sqft'] = np.round(sample['sqft'] * rng.lognormal(0, 0.1, size=rows), 1)
+    sample['price'] = np.round(sample['price'] * rng.lognormal(0, 0.1, size=rows), 2)
+    return sample
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, round(time.perf_counter() - start, 3)
+
+
+def run_format(fmt, cleaned, featured, directory):
+    import xgboost as xgb
+
+    extension = {'csv': '.csv', 'parquet': '.parquet', 'arrow': '.arrow'}[fmt]
+    cleaned_file = os.path.join(directory, "cleaned" + extension)
+    featured_file = os.path.join(directory, "featured" + extension)
+    report = {}
+
+    _, report["processing_write_s"] = timed(lambda: write_table(cleaned, cleaned_file))
+    _, report["engineer_read_s"] = timed(lambda: read_table(cleaned_file))
+    _, report["engineer_write_s"] = timed(lambda: write_table(featured, featured_file))
+
+    def train_handoff():
+        # What train_model.py does: pandas for CSV, the Arrow table as-is otherwise
+        if table_format(featured_file) == 'csv':
+            data = pd.read_csv(featured_file)
+            return xgb.DMatrix(data.drop(columns=['price']), label=data['price'])
+        data = read_arrow(featured_file)
+        return xgb.DMatrix(data.drop(['price']), label=data.column('price').to_numpy())
+
+    _, report["train_read_to_dmatrix_s"] = timed(train_handoff)
+    _, report["evaluate_read_s"] = timed(lambda: read_table(featured_file))
+    report["total_s"] = round(sum(v for k, v in report.items() if k.endswith("_s")), 3)
+    report["cleaned_mb"] = round(os.path.getsize(cleaned_file) / 1e6, 1)
+    report["featured_mb"] = round(os.path.getsize(featured_file) / 1e6, 1)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--formats", nargs="+", default=["csv", "parquet", "arrow"])
+    parser.add_argument("--workdir", default=None, help="Scratch directory (default: a temporary one)")
+    args = parser.parse_args()
+
+    from engineer import create_features, create_preprocessor
+
+    cleaned = synthetic_cleaned(args.rows)
+    X = create_features(cleaned)
+    preprocessor = create_preprocessor()
+    transformed = preprocessor.fit_transform(X.drop(columns=['price']))
+    featured = pd.DataFrame(np.asarray(transformed, dtype=np.float32),
+                            columns=preprocessor.get_feature_names_out())
+    featured['price'] = cleaned['price'].values
+
+    report = {"rows": args.rows}
+    with tempfile.TemporaryDirectory(dir=args.workdir) as directory:
+        for fmt in args.formats:
+            report[fmt] = run_format(fmt, cleaned, featured, directory)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
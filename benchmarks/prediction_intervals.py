@@ -0,0 +1,67 @@
+"""
+Latency added by the calibrated prediction intervals at serving time.
+
+Loads a model directory that has prediction_intervals.json (train_model.py
+output plus the feature stage's preprocessor) and, per batch size, times the
+API's batch scoring path (preprocess + predict) against the interval table
+lookup for the same predictions. Also times build_response, which /predict
+uses, with and without the table.
+
+    python benchmarks/prediction_intervals.py --model-dir models/trained --batch-sizes 1 100 10000
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import timeit
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "api")
+LOCATIONS = ["Downtown", "Mountain", "Rural", "Suburb", "Urban", "Waterfront"]
+
+
+def best_us(function, repeat, number):
+    return min(timeit.repeat(function, repeat=repeat, number=number)) / number * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--model-dir", default="models/trained",
+                        help="Directory with house_price_model.pkl, preprocessor.pkl and prediction_intervals.json")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(API_DIR))
+    os.environ.setdefault("PREDICTION_CACHE_SIZE", "0")
+    with contextlib.redirect_stdout(io.StringIO()):
+        import inference
+        from registry import load_bundle
+        from schemas import HousePredictionRequest
+    bundle = load_bundle(os.path.join(args.model_dir, "house_price_model.pkl"),
+                         os.path.join(args.model_dir, "preprocessor.pkl"))
+    if bundle.intervals is None:
+        sys.exit(f"No prediction_intervals.json in {args.model_dir}")
+    plain = load_bundle(bundle.model_path, bundle.preprocessor_path)
+    plain.intervals = None
+
+    results = []
+    for size in args.batch_sizes:
+        requests = [HousePredictionRequest(sqft=900 + 7 * i % 3000, bedrooms=1 + i % 5, bathrooms=1 + i % 3,
+                                           location=LOCATIONS[i % len(LOCATIONS)], year_built=1950 + i % 70,
+                                           condition="Good")
+                    for i in range(size)]
+        locations = [request.location for request in requests]
+        predictions = inference._predict_batch(requests, bundle)
+        number = max(1, 1000 // size)
+        scoring = best_us(lambda: inference._predict_batch(requests, bundle), args.repeat, number)
+        lookup = best_us(lambda: bundle.intervals.lookup(predictions, locations), args.repeat, number * 10)
+        results.append({"batch_size": size, "scoring_us": round(scoring, 1), "interval_lookup_us": round(lookup, 1),
+                        "overhead_pct": round(lookup / scoring * 100, 2)})
+        print(json.dumps(results[-1]), flush=True)
+
+    price = predictions[0]
+    with_table = best_us(lambda: inference.build_response(price, bundle.version, "Suburb", bundle), args.repeat, 2000)
+    without = best_us(lambda: inference.build_response(price, plain.version, "Suburb", plain), args.repeat, 2000)
+    print(json.dumps({"build_response_us": round(with_table, 1), "build_response_fixed_10pct_us": round(without, 1)}))
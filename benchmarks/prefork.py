@@ -0,0 +1,94 @@
+"""
+Memory and startup of the preforking server (src/api/server.py) against
+`uvicorn --workers N`, where every worker imports the app and loads the model
+on its own.
+
+Starts each server with N workers, waits until all of them have started, sends
+some /predict and /batch-predict traffic so the workers touch the model, then
+sums the proportional set size (PSS, shared pages split between the processes
+sharing them) over the whole process tree. Run from a directory with models/trained.
+
+    python benchmarks/prefork.py --workers 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "api")
+BODY = {"sqft": 1500, "bedrooms": 3, "bathrooms": 2, "location": "Suburb", "year_built": 2000, "condition": "Good"}
+
+
+def smaps_kb(pid, field):
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def process_tree(pid):
+    children = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as f:
+            children += [int(child) for child in f.read().split()]
+    return [pid] + [descendant for child in children for descendant in process_tree(child)]
+
+
+def post(url, body):
+    request = urllib.request.Request(url, data=json.dumps(body).encode(), headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        response.read()
+
+
+def measure(name, command, log_marker, workers, port, requests):
+    with tempfile.TemporaryFile(mode="w+") as log:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            # Ready once every worker has logged log_marker
+            while True:
+                if process.poll() is not None:
+                    log.seek(0)
+                    raise RuntimeError(f"{name} exited during startup:\n{log.read()}")
+                log.seek(0)
+                if log.read().count(log_marker) >= workers:
+                    break
+                time.sleep(0.1)
+            ready = time.perf_counter() - start
+
+            url = f"http://127.0.0.1:{port}"
+            for _ in range(requests):
+                post(f"{url}/predict", BODY)
+                post(f"{url}/batch-predict", [BODY] * 100)
+            tree = process_tree(process.pid)
+            return {"server": name, "workers": workers, "ready_s": round(ready, 2), "processes": len(tree),
+                    "total_pss_mb": round(sum(smaps_kb(pid, "Pss") for pid in tree) / 1024, 1),
+                    "total_rss_mb": round(sum(smaps_kb(pid, "Rss") for pid in tree) / 1024, 1)}
+        finally:
+            process.terminate()
+            process.wait(timeout=60)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8311)
+    parser.add_argument("--requests", type=int, default=100, help="/predict and /batch-predict requests sent before measuring")
+    args = parser.parse_args()
+
+    environment = {"MICRO_BATCHING": "false"}
+    os.environ.update(environment)
+    api_dir = os.path.abspath(API_DIR)
+    servers = [
+        ("uvicorn --workers", [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", api_dir, "--port", str(args.port),
+                               "--workers", str(args.workers)], "Application startup complete"),
+        ("server.py", [sys.executable, os.path.join(api_dir, "server.py"), "--port", str(args.port + 1),
+                       "--workers", str(args.workers)], "Application startup complete"),
+    ]
+    for port_offset, (name, command, marker) in enumerate(servers):
+        print(json.dumps(measure(name, command, marker, args.workers, args.port + port_offset, args.requests)), flush=True)
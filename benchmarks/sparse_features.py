@@ -0,0 +1,101 @@
+"""
+Memory and training time of dense vs sparse (CSR) features at high location cardinality.
+
+Replaces the six locations in data/raw/house_data.csv with N synthetic
+zip-code-level locations, then for each of create_preprocessor(sparse=False)
+and create_preprocessor(sparse=True) measures, in a fresh process, the
+feature matrix size, peak memory while transforming and training (tracemalloc
+plus XGBoost's own allocations via peak RSS), and XGBoost training time.
+
+    python benchmarks/sparse_features.py --rows 200000 --cardinality 100 1000 5000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+WORKER = r"""
+import json, logging, resource, sys, time, tracemalloc
+import numpy as np
+import pandas as pd
+logging.disable(logging.INFO)
+sys.path.insert(0, {features_dir!r})
+sys.path.insert(0, {data_dir!r})
+from engineer import create_features, create_preprocessor
+import xgboost as xgb
+
+rng = np.random.default_rng(42)
+raw = pd.read_csv({data_path!r})
+df = raw.iloc[rng.integers(0, len(raw), size={rows})].reset_index(drop=True)
+df['location'] = 'zip_' + pd.Series(rng.integers(0, {cardinality}, size={rows})).astype(str)
+featured = create_features(df)
+X, y = featured.drop(columns=['price']), featured['price'].to_numpy()
+
+rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+tracemalloc.start()
+start = time.perf_counter()
+X_transformed = create_preprocessor(sparse={sparse}).fit_transform(X)
+X_transformed = X_transformed.astype(np.float32)
+transform_s = time.perf_counter() - start
+if {sparse}:
+    matrix_mb = (X_transformed.data.nbytes + X_transformed.indices.nbytes + X_transformed.indptr.nbytes) / 1e6
+else:
+    matrix_mb = X_transformed.nbytes / 1e6
+_, transform_peak = tracemalloc.get_traced_memory()
+tracemalloc.stop()
+
+start = time.perf_counter()
+model = xgb.XGBRegressor(n_estimators=100, tree_method='hist', random_state=42)
+model.fit(X_transformed, y)
+train_s = time.perf_counter() - start
+rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+print(json.dumps({{
+    "features": int(X_transformed.shape[1]),
+    "matrix_mb": round(matrix_mb, 1),
+    "transform_s": round(transform_s, 2),
+    "transform_peak_mb": round(transform_peak / 1e6, 1),
+    "train_s": round(train_s, 2),
+    "peak_rss_growth_mb": round((rss_peak - rss_before) / 1024, 1),
+}}))
+"""
+
+
+def run(rows, cardinality, sparse):
+    code = WORKER.format(
+        features_dir=os.path.abspath(os.path.join(REPO_ROOT, "src", "features")),
+        data_dir=os.path.abspath(os.path.join(REPO_ROOT, "src", "data")),
+        data_path=os.path.abspath(os.path.join(REPO_ROOT, "data", "raw", "house_data.csv")),
+        rows=rows,
+        cardinality=cardinality,
+        sparse=sparse,
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if result.returncode != 0:
+        # A dense matrix past available memory dies with MemoryError or is OOM-killed
+        lines = result.stderr.strip().splitlines()
+        return {"error": lines[-1] if lines else f"exit status {result.returncode}"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--cardinality", type=int, nargs="+", default=[100, 1000, 5000])
+    args = parser.parse_args()
+
+    report = {"rows": args.rows}
+    for cardinality in args.cardinality:
+        report[cardinality] = {
+            "dense": run(args.rows, cardinality, False),
+            "sparse": run(args.rows, cardinality, True),
+        }
+        print(f"{cardinality} locations: {report[cardinality]}", file=sys.stderr)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
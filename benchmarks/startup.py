@@ -0,0 +1,92 @@
+"""
+Cold-start and per-worker memory benchmark for the API's model artifacts.
+
+Starts N fresh worker processes for each artifact format (pickle vs native
+UBJSON booster + memory-mapped preprocessor spec), the way uvicorn workers
+start, and reports time to first prediction plus RSS/PSS per worker.
+
+    python benchmarks/startup.py --artifacts models/trained --workers 4
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "api")
+
+WORKER = r"""
+import contextlib, io, json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {api_dir!r})
+with contextlib.redirect_stdout(io.StringIO()):
+    from registry import load_bundle
+    import inference
+    imported = time.perf_counter()
+    bundle = load_bundle({model_path!r}, {preprocessor_path!r})
+    loaded = time.perf_counter()
+    inference.predict_price(inference.WARMUP_REQUESTS[0], bundle)
+    ready = time.perf_counter()
+
+def memory_kb(field):
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return None
+
+print(json.dumps({{
+    "import_s": imported - start,
+    "load_s": loaded - imported,
+    "first_prediction_s": ready - loaded,
+    "cold_start_s": ready - start,
+    "rss_mb": memory_kb('Rss') / 1024,
+    "pss_mb": (memory_kb('Pss') or 0) / 1024,
+}}))
+sys.stdout.flush()
+sys.stdin.read()  # stay alive until every worker has been measured
+"""
+
+
+def run_workers(model_path, preprocessor_path, workers):
+    code = WORKER.format(api_dir=os.path.abspath(API_DIR), model_path=model_path,
+                         preprocessor_path=preprocessor_path)
+    env = dict(os.environ, PREDICTION_CACHE_SIZE="0")
+    # inference.py loads models/trained relative to the working directory; run from an empty one
+    procs = [subprocess.Popen([sys.executable, "-c", code], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, text=True, cwd="/tmp", env=env)
+             for _ in range(workers)]
+    results = [json.loads(proc.stdout.readline()) for proc in procs]
+    for proc in procs:
+        proc.communicate("")
+    return {key: statistics.median(result[key] for result in results) for key in results[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--artifacts", default="models/trained", help="Directory with trained artifacts")
+    parser.add_argument("--model-name", default="house_price_model_v2")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    artifacts = os.path.abspath(args.artifacts)
+    formats = {
+        "pickle": (f"{args.model_name}.pkl", "preprocessor.pkl"),
+        "native": (f"{args.model_name}.ubj", "preprocessor_spec.json"),
+    }
+    report = {"workers": args.workers}
+    for name, (model_file, preprocessor_file) in formats.items():
+        model_path = os.path.join(artifacts, model_file)
+        preprocessor_path = os.path.join(artifacts, preprocessor_file)
+        if os.path.exists(model_path) and os.path.exists(preprocessor_path):
+            report[name] = run_workers(model_path, preprocessor_path, args.workers)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+from prometheus_client import Histogram
+from schemas import HousePredictionRequest
+
+# Labelled by batcher, so plain /predict and /predict?explain=true batches stay separate series
+BATCH_SIZE = Histogram(
+    'predict_batch_size',
+    'Number of /predict requests scored together in one micro-batch',
+    ['batcher'],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+)
+QUEUE_WAIT = Histogram(
+    'predict_batch_queue_wait_seconds',
+    'Time a /predict request waited in the micro-batch queue',
+    ['batcher'],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+)
+
+
+class MicroBatcher:
+    """
+    Collect concurrent prediction requests and score them with one vectorized call.
+
+    A batch is dispatched once it holds max_batch_size requests or the oldest
+    request has waited max_wait_us microseconds, whichever comes first.
+    predict_fn is awaited, and batches are dispatched concurrently so several
+    can be in flight on an inference pool at once. name is the batcher label
+    of its metrics.
+    """
+
+    def __init__(self, predict_fn: Callable[[list[HousePredictionRequest]], Awaitable[list[float]]],
+                 max_batch_size: int = 64, max_wait_us: int = 1000, name: str = 'predict'):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.predict_fn = predict_fn
+        self.name = name
+        self._batch_size = BATCH_SIZE.labels(batcher=name)
+        self._queue_wait = QUEUE_WAIT.labels(batcher=name)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max(max_wait_us, 0) / 1_000_000
+        self._queue = None
+        self._task = None
+        self._in_flight = set()
+
+    async def start(self):
+        """Start the background dispatch loop on the running event loop."""
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the dispatch loop, failing any requests still queued."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        while not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Micro-batcher stopped"))
+
+    async def submit(self, request: HousePredictionRequest) -> float:
+        """Queue a request and wait for its predicted price."""
+        if self._task is None:
+            raise RuntimeError("Micro-batcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((request, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+
+            # Skip requests whose callers have gone away
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                continue
+
+            now = time.perf_counter()
+            self._batch_size.observe(len(batch))
+            for _, _, enqueued_at in batch:
+                self._queue_wait.observe(now - enqueued_at)
+
+            task = asyncio.create_task(self._dispatch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _dispatch(self, batch: list):
+        try:
+            predictions = await self.predict_fn([request for request, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), prediction in zip(batch, predictions):
+            if not future.done():
+                future.set_result(prediction)
@@ -0,0 +1,150 @@
+import numpy as np
+import orjson
+from schemas import HousePredictionRequest
+
+# Offending rows listed per failed check; a bad 10k-row batch should not produce a 10k-entry error body
+MAX_ERROR_ROWS = 10
+
+# pydantic v1 messages, so columnar errors read like the ones /batch-predict returns
+_BOUND_CHECKS = {
+    'gt': (np.greater, "ensure this value is greater than {}", "value_error.number.not_gt"),
+    'ge': (np.greater_equal, "ensure this value is greater than or equal to {}", "value_error.number.not_ge"),
+    'lt': (np.less, "ensure this value is less than {}", "value_error.number.not_lt"),
+    'le': (np.less_equal, "ensure this value is less than or equal to {}", "value_error.number.not_le"),
+}
+
+
+def _field_specs(model) -> dict:
+    """
+    {field: (type, bounds)} for the required fields of a pydantic model, where
+    bounds maps gt/ge/lt/le to the Field constraint. Works with pydantic 1 and 2
+    (pydantic 1 reports constrained fields as int/float subclasses).
+    """
+    specs = {}
+    if hasattr(model, 'model_fields'):
+        for name, info in model.model_fields.items():
+            if info.is_required():
+                bounds = {key: getattr(item, key) for item in info.metadata for key in _BOUND_CHECKS
+                          if getattr(item, key, None) is not None}
+                specs[name] = (info.annotation, bounds)
+    else:
+        for name, field in model.__fields__.items():
+            if field.required:
+                bounds = {key: getattr(field.field_info, key) for key in _BOUND_CHECKS
+                          if getattr(field.field_info, key, None) is not None}
+                specs[name] = (field.outer_type_, bounds)
+    return specs
+
+
+# Derived from the schema so the columnar checks cannot drift from the per-object ones
+FIELD_SPECS = _field_specs(HousePredictionRequest)
+
+
+class ColumnarValidationError(ValueError):
+    """Raised with FastAPI-style 422 error entries when a columnar batch is invalid."""
+
+    def __init__(self, errors: list):
+        super().__init__(f"{len(errors)} validation error(s)")
+        self.errors = errors
+
+
+class ColumnarBatch:
+    """
+    A batch of prediction requests held column-wise: numeric fields as float64
+    arrays, string fields as lists, and one model_version for the whole batch.
+    """
+
+    def __init__(self, columns: dict, model_version: str = None):
+        self.columns = columns
+        self.model_version = model_version
+
+    def __len__(self):
+        return len(next(iter(self.columns.values())))
+
+
+def _error(loc: list, msg: str, type_: str) -> dict:
+    return {"loc": ["body", *loc], "msg": msg, "type": type_}
+
+
+def _row_errors(name: str, rows, msg: str, type_: str) -> list:
+    return [_error([name, int(row)], msg, type_) for row in rows[:MAX_ERROR_ROWS]]
+
+
+def _numeric_column(name: str, values: list, kind, bounds: dict) -> tuple:
+    """(float64 array, errors) for one numeric column, checked with whole-array comparisons."""
+    try:
+        array = np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        # Rare path: find the offending rows one by one
+        bad = []
+        for row, value in enumerate(values):
+            try:
+                float(value)
+            except (TypeError, ValueError):
+                bad.append(row)
+        return None, _row_errors(name, bad, "value is not a valid number", "type_error.float")
+    if array.ndim != 1:
+        return None, [_error([name], "value is not a flat list of numbers", "type_error.list")]
+
+    # None becomes NaN in the conversion above
+    invalid = ~np.isfinite(array)
+    if invalid.any():
+        return None, _row_errors(name, np.flatnonzero(invalid), "value is not a finite number", "type_error.float")
+    errors = []
+    if issubclass(kind, int):
+        fractional = array != np.trunc(array)
+        if fractional.any():
+            errors += _row_errors(name, np.flatnonzero(fractional), "value is not a valid integer", "type_error.integer")
+    for key, limit in bounds.items():
+        compare, msg, type_ = _BOUND_CHECKS[key]
+        failed = ~compare(array, limit)
+        if failed.any():
+            errors += _row_errors(name, np.flatnonzero(failed), msg.format(limit), type_)
+    return array, errors
+
+
+def parse_columns(body: bytes) -> ColumnarBatch:
+    """
+    Parse and validate a columnar batch request: a JSON object with one array
+    per HousePredictionRequest field (all the same length) and an optional
+    model_version string. Enforces the schema's Field constraints without
+    creating a request object per row. Raises ColumnarValidationError.
+    """
+    try:
+        payload = orjson.loads(body)
+    except orjson.JSONDecodeError as e:
+        raise ColumnarValidationError([_error([], f"Invalid JSON: {str(e)}", "value_error.jsondecode")])
+    if not isinstance(payload, dict):
+        raise ColumnarValidationError([_error([], "value is not a valid dict", "type_error.dict")])
+
+    columns, errors, length = {}, [], None
+    for name, (kind, bounds) in FIELD_SPECS.items():
+        values = payload.get(name)
+        if values is None:
+            errors.append(_error([name], "field required", "value_error.missing"))
+            continue
+        if not isinstance(values, list):
+            errors.append(_error([name], "value is not a valid list", "type_error.list"))
+            continue
+        if length is None:
+            length = len(values)
+        elif len(values) != length:
+            errors.append(_error([name], f"expected {length} values like the other columns, got {len(values)}",
+                                 "value_error.list.length"))
+            continue
+
+        if issubclass(kind, str):
+            if not all(type(value) is str for value in values):
+                bad = [row for row, value in enumerate(values) if type(value) is not str]
+                errors += _row_errors(name, bad, "str type expected", "type_error.str")
+            columns[name] = values
+        else:
+            columns[name], column_errors = _numeric_column(name, values, kind, bounds)
+            errors += column_errors
+
+    model_version = payload.get('model_version')
+    if model_version is not None and not isinstance(model_version, str):
+        errors.append(_error(['model_version'], "str type expected", "type_error.str"))
+    if errors:
+        raise ColumnarValidationError(errors)
+    return ColumnarBatch(columns, model_version)
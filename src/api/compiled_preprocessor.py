@@ -0,0 +1,249 @@
+import json
+import os
+import sys
+import threading
+import numpy as np
+from datetime import datetime
+from schemas import HousePredictionRequest
+
+# Shared with training; copied next to this module in the container image
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'features'))
+from feature_kernel import build_feature_frame, derive_features, derive_row, imputer_fill_values
+
+# Identifies the array-based preprocessor spec written by export_preprocessor_spec in src/features/engineer.py
+SPEC_FORMAT = "house-price-preprocessor/v1"
+
+
+def request_features(request: HousePredictionRequest, current_year: int) -> dict:
+    """
+    Raw and derived feature values for a single request, keyed by column name.
+    Mirrors the columns the pandas path builds before preprocessor.transform.
+    """
+    house_age, price_per_sqft, bed_bath_ratio = derive_row(
+        request.sqft, request.bedrooms, request.bathrooms, request.year_built, current_year=current_year)
+    return {
+        'sqft': request.sqft,
+        'bedrooms': request.bedrooms,
+        'bathrooms': request.bathrooms,
+        'location': request.location,
+        'year_built': request.year_built,
+        'condition': request.condition,
+        'house_age': house_age,
+        'bed_bath_ratio': bed_bath_ratio,
+        'price_per_sqft': price_per_sqft,  # No price at serving time: 0 for compatibility
+    }
+
+
+def batch_request_features(requests: list[HousePredictionRequest], current_year: int) -> dict:
+    """
+    Column-wise version of request_features: numeric columns as float64 arrays,
+    categorical columns as lists.
+    """
+    n = len(requests)
+    sqft = np.fromiter((req.sqft for req in requests), dtype=np.float64, count=n)
+    bedrooms = np.fromiter((req.bedrooms for req in requests), dtype=np.float64, count=n)
+    bathrooms = np.fromiter((req.bathrooms for req in requests), dtype=np.float64, count=n)
+    year_built = np.fromiter((req.year_built for req in requests), dtype=np.float64, count=n)
+    return {
+        'sqft': sqft,
+        'bedrooms': bedrooms,
+        'bathrooms': bathrooms,
+        'location': [req.location for req in requests],
+        'year_built': year_built,
+        'condition': [req.condition for req in requests],
+        **derive_features(sqft, bedrooms, bathrooms, year_built, current_year=current_year, dtype=np.float64),
+    }
+
+
+def column_features(columns: dict, current_year: int) -> dict:
+    """
+    batch_request_features for a batch that already arrives column-wise
+    (see columnar.py): the columns plus the derived features.
+    """
+    return {
+        **columns,
+        **derive_features(columns['sqft'], columns['bedrooms'], columns['bathrooms'], columns['year_built'],
+                          current_year=current_year, dtype=np.float64),
+    }
+
+
+def _steps(transformer):
+    from sklearn.pipeline import Pipeline
+    if isinstance(transformer, Pipeline):
+        return [step for _, step in transformer.steps]
+    return [transformer]
+
+
+class CompiledPreprocessor:
+    """
+    Flat NumPy plan equivalent to a fitted ColumnTransformer from create_preprocessor().
+
+    Numerical columns are imputed from a vector of fitted means and categorical
+    columns are one-hot encoded through a dict lookup into a preallocated row,
+    so neither /predict nor /batch-predict touches pandas or sklearn.
+    It is built either from a fitted ColumnTransformer (compile) or from the
+    array-based spec exported at training time (from_spec).
+
+    For preprocessors created with sparse=True the output is a CSR matrix laid
+    out like sklearn's: one-hot zeros and zero numerical values are not stored,
+    so XGBoost treats them as missing exactly as it did during training.
+    """
+
+    def __init__(self, numerical_features, statistics, categorical_features, categories,
+                 sparse_output=False):
+        # SimpleImputer drops columns it could not compute a statistic for
+        statistics = np.asarray(statistics, dtype=np.float64)
+        valid = ~np.isnan(statistics)
+        self.numerical_features = [column for column, keep in zip(numerical_features, valid) if keep]
+        self.fill_values = statistics if valid.all() else statistics[valid]
+        self.categorical_features = list(categorical_features)
+
+        # Absolute column index of every category in the output row
+        offset = len(self.numerical_features)
+        self.category_offsets = []
+        for column_categories in categories:
+            self.category_offsets.append({category: offset + i for i, category in enumerate(column_categories)})
+            offset += len(column_categories)
+
+        self.n_features = offset
+        self.sparse_output = sparse_output
+        self._n_numerical = len(self.numerical_features)
+        self._local = threading.local()
+
+    @classmethod
+    def compile(cls, preprocessor) -> "CompiledPreprocessor":
+        """
+        Compile a fitted ColumnTransformer. Raises ValueError for any layout the
+        plan cannot reproduce exactly, so callers can fall back to the pandas path.
+        """
+        from sklearn.compose import ColumnTransformer
+        from sklearn.impute import SimpleImputer
+        from sklearn.preprocessing import OneHotEncoder
+
+        if not isinstance(preprocessor, ColumnTransformer) or not hasattr(preprocessor, 'transformers_'):
+            raise ValueError("Expected a fitted ColumnTransformer")
+        numerical_features, statistics = [], []
+        categorical_features, categories = [], []
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == 'drop' or len(columns) == 0:
+                continue
+            if transformer == 'passthrough':
+                raise ValueError(f"Passthrough columns are not supported: {name}")
+
+            steps = _steps(transformer)
+            if len(steps) != 1:
+                raise ValueError(f"Unsupported pipeline for '{name}': {steps}")
+            step = steps[0]
+
+            if isinstance(step, SimpleImputer):
+                if categorical_features:
+                    raise ValueError("Numerical columns must precede categorical columns")
+                numerical_features.extend(columns)
+                statistics.extend(imputer_fill_values(step))
+            elif isinstance(step, OneHotEncoder):
+                if step.handle_unknown != 'ignore' or step.drop is not None:
+                    raise ValueError("Only OneHotEncoder(handle_unknown='ignore') without drop is supported")
+                if any(infrequent is not None for infrequent in getattr(step, 'infrequent_categories_', [])):
+                    raise ValueError("Infrequent category grouping is not supported")
+                categorical_features.extend(columns)
+                categories.extend(list(column_categories) for column_categories in step.categories_)
+            else:
+                raise ValueError(f"Unsupported transformer for '{name}': {type(step).__name__}")
+
+        return cls(numerical_features, statistics, categorical_features, categories,
+                   sparse_output=bool(getattr(preprocessor, 'sparse_output_', False)))
+
+    @classmethod
+    def from_spec(cls, spec_path: str) -> "CompiledPreprocessor":
+        """
+        Load the array-based spec written at training time. The fill-value
+        vector is memory-mapped, so worker processes share its pages.
+        """
+        with open(spec_path) as f:
+            spec = json.load(f)
+        if spec.get('format') != SPEC_FORMAT:
+            raise ValueError(f"Unsupported preprocessor spec format: {spec.get('format')}")
+        statistics_path = os.path.join(os.path.dirname(spec_path), spec['statistics_file'])
+        statistics = np.load(statistics_path, mmap_mode='r')
+        return cls(spec['numerical_features'], statistics, spec['categorical_features'], spec['categories'],
+                   sparse_output=bool(spec.get('sparse_output')))
+
+    def feature_names_out(self) -> list:
+        """Output column names in OneHotEncoder's style: numerical columns, then '<column>_<category>'."""
+        return self.numerical_features + [f"{column}_{category}"
+                                          for column, offsets in zip(self.categorical_features, self.category_offsets)
+                                          for category in offsets]
+
+    def transform_one(self, request: HousePredictionRequest):
+        """
+        Encode one request into the preallocated (1, n_features) row.
+        Each thread gets its own row, which is reused by that thread's next call,
+        so consume it before then. Sparse plans return a new (1, n_features) CSR matrix.
+        """
+        values = request_features(request, datetime.now().year)
+        row = getattr(self._local, 'row', None)
+        if row is None:
+            row = self._local.row = np.zeros((1, self.n_features), dtype=np.float64)
+        row[0, self._n_numerical:] = 0.0
+
+        for i, column in enumerate(self.numerical_features):
+            value = values[column]
+            row[0, i] = self.fill_values[i] if value is None or value != value else value
+
+        for column, offsets in zip(self.categorical_features, self.category_offsets):
+            index = offsets.get(values[column])
+            if index is not None:
+                row[0, index] = 1.0
+
+        if self.sparse_output:
+            from scipy import sparse
+            return sparse.csr_matrix(row)
+        return row
+
+    def transform(self, requests: list[HousePredictionRequest]):
+        """
+        Encode a batch of requests into a new (n, n_features) matrix, or a CSR
+        matrix for sparse plans (built without a dense intermediate).
+        """
+        return self.transform_features(batch_request_features(requests, datetime.now().year))
+
+    def transform_columns(self, columns: dict):
+        """transform for a batch held column-wise, as parsed by columnar.parse_columns."""
+        return self.transform_features(column_features(columns, datetime.now().year))
+
+    def transform_features(self, values: dict):
+        """Encode column-wise feature values (numeric columns as float64 arrays)."""
+        n = len(values['house_age'])
+        numerical = np.empty((n, self._n_numerical), dtype=np.float64)
+        for i, column in enumerate(self.numerical_features):
+            column_values = values[column]
+            numerical[:, i] = np.where(np.isnan(column_values), self.fill_values[i], column_values)
+
+        category_indices = [
+            np.fromiter((offsets.get(value, -1) for value in values[column]), dtype=np.intp, count=n)
+            for column, offsets in zip(self.categorical_features, self.category_offsets)
+        ]
+        if self.sparse_output:
+            return self._sparse_matrix(numerical, category_indices)
+
+        out = np.zeros((n, self.n_features), dtype=np.float64)
+        out[:, :self._n_numerical] = numerical
+        for index in category_indices:
+            rows = np.flatnonzero(index >= 0)
+            out[rows, index[rows]] = 1.0
+        return out
+
+    def _sparse_matrix(self, numerical: np.ndarray, category_indices: list):
+        from scipy import sparse
+        n = numerical.shape[0]
+        rows, columns = np.nonzero(numerical)
+        row_parts, column_parts, data_parts = [rows], [columns], [numerical[rows, columns]]
+        for index in category_indices:
+            known = np.flatnonzero(index >= 0)
+            row_parts.append(known)
+            column_parts.append(index[known])
+            data_parts.append(np.ones(len(known)))
+        return sparse.csr_matrix(
+            (np.concatenate(data_parts), (np.concatenate(row_parts), np.concatenate(column_parts))),
+            shape=(n, self.n_features),
+        )
@@ -0,0 +1,211 @@
+import bisect
+import json
+import threading
+import time
+from collections import Counter as Tally
+import numpy as np
+from prometheus_client import Counter
+from prometheus_client.core import GaugeMetricFamily
+
+PROFILE_FILE = "reference_profile.json"
+# Identifies the profile written by export_reference_profile in src/features/engineer.py
+PROFILE_FORMAT = "house-price-reference-profile/v1"
+
+# Empty bins are clipped to this share, as in src/models/incremental.py, so PSI stays finite
+MIN_SHARE = 1e-4
+# Distinct unseen categories logged per feature; later ones are only counted
+MAX_LOGGED_UNSEEN = 100
+# Batches of request objects larger than this are counted from an evenly spaced sample, since
+# reading the fields off every pydantic object would cost more than the counting
+BATCH_SAMPLE_SIZE = 1000
+
+UNSEEN_CATEGORIES = Counter('input_unseen_category_total',
+                            'Scored inputs with a category the one-hot encoder ignores (encoded as all zeros)',
+                            ['feature'])
+
+
+class ReferenceProfile:
+    """
+    Training distribution of the raw request features (reference_profile.json):
+    quantile bin edges and bin shares for numerical features, category shares
+    for categorical ones.
+    """
+
+    def __init__(self, numerical: dict, categorical: dict, rows: int = None):
+        self.numerical = {feature: (np.asarray(spec["edges"], dtype=np.float64),
+                                    np.asarray(spec["shares"], dtype=np.float64))
+                          for feature, spec in numerical.items()}
+        # Categorical shares get a trailing zero for the unseen-category bucket
+        self.categorical = {feature: (list(spec["categories"]), np.append(np.asarray(spec["shares"], dtype=np.float64), 0.0))
+                            for feature, spec in categorical.items()}
+        self.rows = rows
+
+    @classmethod
+    def load(cls, path: str) -> "ReferenceProfile":
+        with open(path) as f:
+            profile = json.load(f)
+        if profile.get("format") != PROFILE_FORMAT:
+            raise ValueError(f"Unsupported reference profile format: {profile.get('format')}")
+        return cls(profile["numerical"], profile["categorical"], profile.get("rows"))
+
+
+def population_stability_index(expected_share: np.ndarray, counts: np.ndarray) -> float:
+    """PSI of observed bin counts against the expected bin shares."""
+    expected_share = np.clip(expected_share, MIN_SHARE, None)
+    actual_share = np.clip(counts / counts.sum(), MIN_SHARE, None)
+    return float(np.sum((actual_share - expected_share) * np.log(actual_share / expected_share)))
+
+
+def binned_ks(expected_share: np.ndarray, counts: np.ndarray) -> float:
+    """
+    Kolmogorov-Smirnov statistic evaluated at the bin edges: a lower bound on
+    the exact statistic, which would need the raw values.
+    """
+    return float(np.max(np.abs(np.cumsum(expected_share) - np.cumsum(counts / counts.sum()))))
+
+
+class _Window:
+    """Bin counts for one profile over the current and previous window."""
+
+    def __init__(self, profile: ReferenceProfile):
+        self.profile = profile
+        self.expected = {**{feature: share for feature, (_, share) in profile.numerical.items()},
+                         **{feature: share for feature, (_, share) in profile.categorical.items()}}
+        # Plain-Python copies for single requests, where NumPy's per-call overhead dominates
+        self.edges = {feature: edges.tolist() for feature, (edges, _) in profile.numerical.items()}
+        self.categories = {feature: {category: i for i, category in enumerate(categories)}
+                           for feature, (categories, _) in profile.categorical.items()}
+        self.logged_unseen = {feature: set() for feature in profile.categorical}
+        self.current, self.previous = self.empty_counts(), self.empty_counts()
+        self.start = time.monotonic()
+
+    def empty_counts(self) -> dict:
+        return {feature: np.zeros(len(share), dtype=np.float64) for feature, share in self.expected.items()}
+
+
+class DriftMonitor:
+    """
+    Counts of the scored inputs in the reference profile's bins, compared
+    against the profile whenever /metrics is scraped.
+
+    A numerical value costs a bisect over its (at most ten) bin edges and a
+    category a dict lookup, so an observation is O(1) and memory is fixed by
+    the profile. Categories the model was not trained on are counted in an
+    extra bucket, since the one-hot encoder would silently encode them as all
+    zeros. Counts rotate every window_seconds and the scores cover the current
+    and previous window, so old traffic ages out. Scores are only reported
+    once the windows hold min_observations inputs.
+
+    Batches of more than batch_sample_size request objects are counted from
+    every k-th request, weighted by k, so their share of the window stays
+    right; their unseen-category counts are estimates too.
+    """
+
+    def __init__(self, profile: ReferenceProfile = None, window_seconds: float = 3600, min_observations: int = 100,
+                 batch_sample_size: int = BATCH_SAMPLE_SIZE):
+        self.window_seconds = window_seconds
+        self.min_observations = min_observations
+        self.batch_sample_size = batch_sample_size
+        self._lock = threading.Lock()
+        self.reset(profile)
+
+    def reset(self, profile: ReferenceProfile):
+        """Start comparing against profile (None disables monitoring), dropping the counts so far."""
+        # One reference assignment, so a concurrent observe sees either the old or the new profile
+        self._window = _Window(profile) if profile is not None else None
+
+    @property
+    def enabled(self) -> bool:
+        return self._window is not None
+
+    def _counts(self, window: _Window) -> dict:
+        """The window's current counts, rotating it first if it has ended."""
+        now = time.monotonic()
+        if now - window.start >= self.window_seconds:
+            with self._lock:
+                elapsed = now - window.start
+                if elapsed >= self.window_seconds:
+                    # After an idle gap longer than a window the previous counts are stale too
+                    window.previous = window.current if elapsed < 2 * self.window_seconds else window.empty_counts()
+                    window.current = window.empty_counts()
+                    window.start = now
+        return window.current
+
+    def _unseen(self, window: _Window, feature: str, value, count: float = 1):
+        UNSEEN_CATEGORIES.labels(feature=feature).inc(count)
+        logged = window.logged_unseen[feature]
+        if value not in logged and len(logged) < MAX_LOGGED_UNSEEN:
+            logged.add(value)
+            print(f"Warning: Unseen {feature} category {value!r}; the model encodes it as all zeros")
+
+    def observe(self, request):
+        """Count one request's feature values."""
+        window = self._window
+        if window is None:
+            return
+        counts = self._counts(window)
+        for feature, edges in window.edges.items():
+            counts[feature][bisect.bisect_right(edges, getattr(request, feature))] += 1
+        for feature, categories in window.categories.items():
+            value = getattr(request, feature)
+            index = categories.get(value)
+            if index is None:
+                self._unseen(window, feature, value)
+                index = len(categories)
+            counts[feature][index] += 1
+
+    def observe_batch(self, requests: list):
+        """Count a batch of requests' feature values."""
+        window = self._window
+        if window is None or not requests:
+            return
+        sample = requests
+        if len(requests) > self.batch_sample_size:
+            sample = requests[::-(-len(requests) // self.batch_sample_size)]
+        columns = {feature: [getattr(request, feature) for request in sample]
+                   for feature in window.expected}
+        self.observe_columns(columns, weight=len(requests) / len(sample), window=window)
+
+    def observe_columns(self, columns: dict, weight: float = 1, window: _Window = None):
+        """Count a batch held column-wise (numerical columns as arrays or lists), each row weight times."""
+        window = window or self._window
+        if window is None:
+            return
+        counts = self._counts(window)
+        for feature, (edges, _) in window.profile.numerical.items():
+            bins = np.searchsorted(edges, np.asarray(columns[feature], dtype=np.float64), side='right')
+            counts[feature] += weight * np.bincount(bins, minlength=len(edges) + 1)
+        for feature, categories in window.categories.items():
+            feature_counts = counts[feature]
+            for value, count in Tally(columns[feature]).items():
+                index = categories.get(value)
+                if index is None:
+                    self._unseen(window, feature, value, weight * count)
+                    index = len(categories)
+                feature_counts[index] += weight * count
+
+    def collect(self):
+        """Prometheus collector: PSI, binned KS and window size per feature, computed at scrape time."""
+        psi = GaugeMetricFamily('input_drift_psi', 'Population stability index of scored inputs against the '
+                                'training reference profile', labels=['feature'])
+        ks = GaugeMetricFamily('input_drift_ks', 'Kolmogorov-Smirnov statistic (at the bin edges) of scored '
+                               'numerical inputs against the training reference profile', labels=['feature'])
+        observations = GaugeMetricFamily('input_drift_window_observations', 'Scored inputs the drift scores '
+                                         'are computed over', labels=['feature'])
+        window = self._window
+        if window is not None:
+            self._counts(window)
+            with self._lock:
+                current, previous = window.current, window.previous
+            for feature, share in window.expected.items():
+                counts = current[feature] + previous[feature]
+                total = round(float(counts.sum()))
+                observations.add_metric([feature], total)
+                if total < self.min_observations:
+                    continue
+                psi.add_metric([feature], population_stability_index(share, counts))
+                if feature in window.profile.numerical:
+                    ks.add_metric([feature], binned_ks(share, counts))
+        yield psi
+        yield ks
+        yield observations
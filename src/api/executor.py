@@ -0,0 +1,123 @@
+import asyncio
+import importlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from prometheus_client import Counter, Gauge, Histogram
+
+# multiprocess_mode only applies when server.py runs several workers: counts add up across
+# them, utilization is reported per worker process
+POOL_WORKERS = Gauge('inference_pool_workers', 'Configured workers per inference pool', ['pool'],
+                     multiprocess_mode='livesum')
+POOL_BUSY = Gauge('inference_pool_busy_workers', 'Workers currently running inference', ['pool'],
+                  multiprocess_mode='livesum')
+POOL_QUEUED = Gauge('inference_pool_queued_tasks', 'Tasks waiting for a free worker', ['pool'],
+                    multiprocess_mode='livesum')
+POOL_UTILIZATION = Gauge('inference_pool_utilization', 'Fraction of workers currently busy', ['pool'],
+                         multiprocess_mode='liveall')
+POOL_REJECTED = Counter('inference_pool_rejected_total', 'Tasks rejected because the pool was saturated', ['pool'])
+POOL_TASK_DURATION = Histogram(
+    'inference_pool_task_duration_seconds',
+    'Time from submission to completion of an inference task',
+    ['pool']
+)
+
+
+class PoolSaturated(Exception):
+    """Raised when an inference pool has no room left in its queue."""
+
+    def __init__(self, pool: str, retry_after: int):
+        super().__init__(f"Inference pool '{pool}' is saturated")
+        self.pool = pool
+        self.retry_after = retry_after
+
+
+def _load_worker_model(model_path: str = None, preprocessor_path: str = None, version: str = None):
+    """Process pool initializer: load the model once per worker process."""
+    inference = importlib.import_module('inference')
+    if model_path is not None and inference.registry.version != version:
+        inference.registry.reload(model_path, preprocessor_path, version)
+
+
+class InferenceExecutor:
+    """
+    Run synchronous, CPU-bound inference off the event loop.
+
+    kind='thread' relies on XGBoost releasing the GIL during predict;
+    kind='process' preloads the model in every worker via an initializer,
+    and restart() replaces the workers after a model swap.
+    At most max_workers + max_queue tasks are accepted at once; anything
+    beyond that raises PoolSaturated instead of queueing without bound.
+    """
+
+    def __init__(self, name: str, kind: str = 'thread', max_workers: int = None,
+                 max_queue: int = 256, retry_after: int = 1, initargs: tuple = ()):
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.initargs = initargs
+        self._in_flight = 0
+        self._pool = None
+        POOL_WORKERS.labels(pool=name).set(self.max_workers)
+
+    def _create_pool(self):
+        if self.kind == 'thread':
+            return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"{self.name}-inference")
+        if self.kind == 'process':
+            # Spawn rather than fork: forking after OpenMP has initialised in the parent can deadlock
+            return ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_load_worker_model,
+                initargs=self.initargs
+            )
+        raise ValueError(f"Unknown executor kind: {self.kind}")
+
+    def start(self):
+        if self._pool is None:
+            self._pool = self._create_pool()
+            POOL_WORKERS.labels(pool=self.name).set(self.max_workers)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def restart(self, initargs: tuple = None):
+        """
+        Replace a process pool's workers, e.g. so they load a newly swapped-in model.
+        Tasks already running on the old workers finish there. Thread pools share
+        the parent's model and are left alone.
+        """
+        if initargs is not None:
+            self.initargs = initargs
+        if self.kind != 'process' or self._pool is None:
+            return
+        previous, self._pool = self._pool, self._create_pool()
+        previous.shutdown(wait=False)
+
+    def _update_gauges(self):
+        busy = min(self._in_flight, self.max_workers)
+        POOL_BUSY.labels(pool=self.name).set(busy)
+        POOL_QUEUED.labels(pool=self.name).set(self._in_flight - busy)
+        POOL_UTILIZATION.labels(pool=self.name).set(busy / self.max_workers)
+
+    async def run(self, fn, *args):
+        """Run fn(*args) in the pool, or raise PoolSaturated if the queue is full."""
+        if self._in_flight >= self.max_workers + self.max_queue:
+            POOL_REJECTED.labels(pool=self.name).inc()
+            raise PoolSaturated(self.name, self.retry_after)
+        self.start()
+
+        self._in_flight += 1
+        self._update_gauges()
+        start_time = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+        finally:
+            self._in_flight -= 1
+            self._update_gauges()
+            POOL_TASK_DURATION.labels(pool=self.name).observe(time.perf_counter() - start_time)
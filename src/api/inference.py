@@ -1,70 +1,380 @@
-import joblib
+import os
+import threading
+import time
+import numpy as np
 import pandas as pd
+from collections import OrderedDict
 from datetime import datetime
+from prometheus_client import Counter, Gauge
 from schemas import HousePredictionRequest, PredictionResponse
+from compiled_preprocessor import build_feature_frame
+from registry import LocalModelStore, ModelBundle, ModelPool, ModelRegistry, UnknownModelVersion
+from instrumentation import stage_timer
+from columnar import ColumnarBatch
 
 # Load model and preprocessor
 MODEL_PATH = "models/trained/house_price_model_v2.pkl"
 PREPROCESSOR_PATH = "models/trained/preprocessor.pkl"
 
-try:
-    model = joblib.load(MODEL_PATH)
-    preprocessor = joblib.load(PREPROCESSOR_PATH)
-    MODEL_LOADED = True
-except Exception as e:
-    print(f"Warning: Model files not found: {str(e)}")
-    print("Models will be loaded after training pipeline completes")
-    model = None
-    preprocessor = None
-    MODEL_LOADED = False
+# Native artifacts load without unpickling and are preferred when both are present
+NATIVE_MODEL_PATH = "models/trained/house_price_model_v2.ubj"
+PREPROCESSOR_SPEC_PATH = "models/trained/preprocessor_spec.json"
 
-def predict_price(request: HousePredictionRequest) -> PredictionResponse:
+def default_artifact_paths() -> tuple:
     """
-    Predict house price based on input features.
+    (model_path, preprocessor_path) to load from models/trained.
     """
-    if not MODEL_LOADED:
-        raise RuntimeError("Model not available. Please run the training pipeline first.")
-    
-    # Prepare input data
-    input_data = pd.DataFrame([request.dict()])
-    input_data['house_age'] = datetime.now().year - input_data['year_built']
-    input_data['bed_bath_ratio'] = input_data['bedrooms'] / input_data['bathrooms']
-    input_data['price_per_sqft'] = 0  # Dummy value for compatibility
+    if os.path.exists(NATIVE_MODEL_PATH) and os.path.exists(PREPROCESSOR_SPEC_PATH):
+        return NATIVE_MODEL_PATH, PREPROCESSOR_SPEC_PATH
+    return MODEL_PATH, PREPROCESSOR_PATH
 
-    # Preprocess input data
-    processed_features = preprocessor.transform(input_data)
+# Synthetic requests used to warm a freshly loaded model before it serves traffic
+WARMUP_REQUESTS = [
+    HousePredictionRequest(sqft=1500, bedrooms=3, bathrooms=2, location="Suburb", year_built=2000, condition="Good"),
+    HousePredictionRequest(sqft=2500, bedrooms=4, bathrooms=2.5, location="Downtown", year_built=1985, condition="Excellent"),
+    HousePredictionRequest(sqft=900, bedrooms=2, bathrooms=1, location="Rural", year_built=1960, condition="Fair"),
+]
 
-    # Make prediction
-    predicted_price = model.predict(processed_features)[0]
+def warm_up(bundle: ModelBundle):
+    """
+    Run a few synthetic predictions through both inference paths of a new bundle.
+    """
+    predict_price(WARMUP_REQUESTS[0], bundle)
+    batch_predict(WARMUP_REQUESTS, bundle)
 
-    # Convert numpy.float32 to Python float and round to 2 decimal places
-    predicted_price = round(float(predicted_price), 2)
+registry = ModelRegistry(warmup=warm_up)
 
-    # Confidence interval (10% range)
-    confidence_interval = [predicted_price * 0.9, predicted_price * 1.1]
+# Optional local model store laid out like the S3 bucket written by ModelDeployer.
+# Other versions are loaded from it on demand and kept within a memory budget.
+MODEL_STORE_DIR = os.getenv("MODEL_STORE_DIR")
+model_store = LocalModelStore(MODEL_STORE_DIR, os.getenv("MODEL_NAME", "house-price-model")) if MODEL_STORE_DIR else None
+model_pool = ModelPool(registry, model_store, int(float(os.getenv("MODEL_MEMORY_BUDGET_MB", "512")) * 1024 * 1024))
 
-    # Convert confidence interval values to Python float and round to 2 decimal places
+def load_model(model_path: str = None, preprocessor_path: str = None, version: str = None) -> bool:
+    """
+    Load a model/preprocessor pair into the registry; returns whether it loaded.
+    """
+    if model_path is None:
+        model_path, preprocessor_path = default_artifact_paths()
+    try:
+        registry.reload(model_path, preprocessor_path, version)
+        return True
+    except Exception as e:
+        print(f"Warning: Model files not found: {str(e)}")
+        print("Models will be loaded after training pipeline completes")
+        return False
+
+# Prediction cache metrics
+CACHE_HITS = Counter('prediction_cache_hits_total', 'Prediction cache hits')
+CACHE_MISSES = Counter('prediction_cache_misses_total', 'Prediction cache misses')
+CACHE_EVICTIONS = Counter('prediction_cache_evictions_total', 'Prediction cache evictions', ['reason'])
+CACHE_SIZE = Gauge('prediction_cache_entries', 'Entries currently held in the prediction cache',
+                   multiprocess_mode='livesum')
+ATTRIBUTION_CACHE_HITS = Counter('attribution_cache_hits_total', 'Feature attribution cache hits')
+ATTRIBUTION_CACHE_MISSES = Counter('attribution_cache_misses_total', 'Feature attribution cache misses')
+ATTRIBUTION_CACHE_EVICTIONS = Counter('attribution_cache_evictions_total', 'Feature attribution cache evictions',
+                                      ['reason'])
+ATTRIBUTION_CACHE_SIZE = Gauge('attribution_cache_entries', 'Entries currently held in the feature attribution cache',
+                               multiprocess_mode='livesum')
+
+def cache_key(request: HousePredictionRequest, current_year: int = None) -> tuple:
+    """
+    Canonical key for a request: every input field in a fixed order and type,
+    plus the year used to derive house_age.
+    """
+    return (
+        float(request.sqft),
+        int(request.bedrooms),
+        float(request.bathrooms),
+        request.location,
+        int(request.year_built),
+        request.condition,
+        current_year or datetime.now().year,
+    )
+
+class PredictionCache:
+    """
+    Bounded LRU cache of per-request results (predicted prices by default)
+    with an optional TTL. Entries are keyed by model version, and everything
+    is dropped when the serving model is swapped. metrics is the
+    (hits, misses, evictions, size) tuple the cache reports to.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 0,
+                 metrics: tuple = (CACHE_HITS, CACHE_MISSES, CACHE_EVICTIONS, CACHE_SIZE)):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._hits, self._misses, self._evictions, self._size = metrics
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self, *args):
+        """Drop every entry (used as a registry swap listener)."""
+        with self._lock:
+            if self._entries:
+                self._evictions.labels(reason='invalidated').inc(len(self._entries))
+                self._entries.clear()
+            self._size.set(0)
+
+    def get(self, request: HousePredictionRequest, version: str):
+        """Return the cached result for a request, or None on a miss."""
+        if self.max_size <= 0:
+            return None
+        key = (version,) + cache_key(request)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+                del self._entries[key]
+                self._evictions.labels(reason='expired').inc()
+                entry = None
+            if entry is None:
+                self._misses.inc()
+                self._size.set(len(self._entries))
+                return None
+            self._entries.move_to_end(key)
+        self._hits.inc()
+        return entry[0]
+
+    def put(self, request: HousePredictionRequest, version: str, value):
+        """Cache the result computed for a request by the given model version."""
+        if self.max_size <= 0:
+            return
+        key = (version,) + cache_key(request)
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions.labels(reason='capacity').inc()
+            self._size.set(len(self._entries))
+
+prediction_cache = PredictionCache(
+    max_size=int(os.getenv("PREDICTION_CACHE_SIZE", "10000")),
+    ttl_seconds=float(os.getenv("PREDICTION_CACHE_TTL", "0")),
+)
+registry.on_swap(prediction_cache.clear)
+
+# Feature attributions of requests already explained (?explain=true), keyed like the prediction cache
+attribution_cache = PredictionCache(
+    max_size=int(os.getenv("ATTRIBUTION_CACHE_SIZE", "10000")),
+    ttl_seconds=float(os.getenv("PREDICTION_CACHE_TTL", "0")),
+    metrics=(ATTRIBUTION_CACHE_HITS, ATTRIBUTION_CACHE_MISSES, ATTRIBUTION_CACHE_EVICTIONS, ATTRIBUTION_CACHE_SIZE),
+)
+registry.on_swap(attribution_cache.clear)
+
+def _prepare_features(requests: list[HousePredictionRequest]) -> pd.DataFrame:
+    """
+    Build the raw feature frame expected by the preprocessor.
+    """
+    input_data = pd.DataFrame([req.dict(exclude={'model_version'}) for req in requests])
+    return build_feature_frame(input_data, dtype=np.float64, serving=True)
+
+def build_response(predicted_price: float, model_version: str = None, location: str = None,
+                   bundle: ModelBundle = None, features_importance: dict = None) -> PredictionResponse:
+    """
+    Wrap a raw model output in a PredictionResponse. The interval comes from
+    the bundle's calibrated interval table when it has one (and location is
+    given); otherwise it falls back to a fixed ±10% with no stated coverage.
+    features_importance (see batch_explain) is left empty unless given.
+    """
+    bundle = bundle or model_pool.get(model_version)
+    intervals = bundle.intervals if bundle is not None and location is not None else None
+    if intervals is not None:
+        confidence_interval, coverage = list(intervals.lookup_one(float(predicted_price), location)), intervals.coverage
+    else:
+        confidence_interval, coverage = [predicted_price * 0.9, predicted_price * 1.1], None
+
+    # Convert numpy.float32 to Python float and round to 2 decimal places
+    predicted_price = round(float(predicted_price), 2)
     confidence_interval = [round(float(value), 2) for value in confidence_interval]
 
     return PredictionResponse(
         predicted_price=predicted_price,
         confidence_interval=confidence_interval,
-        features_importance={},
-        prediction_time=datetime.now().isoformat()
+        interval_coverage=coverage,
+        features_importance=features_importance or {},
+        prediction_time=datetime.now().isoformat(),
+        model_version=model_version
     )
 
-def batch_predict(requests: list[HousePredictionRequest]) -> list[float]:
+def batch_intervals(requests: list[HousePredictionRequest], predictions: list[float]) -> list[dict]:
+    """
+    Predictions with their calibrated intervals, one table lookup per model
+    version in the batch.
+    """
+    results = [None] * len(requests)
+    groups = {}
+    for i, req in enumerate(requests):
+        groups.setdefault(req.model_version, []).append(i)
+    for model_version, positions in groups.items():
+        bundle = resolve_bundle(model_version)
+        group_predictions = np.array([predictions[i] for i in positions], dtype=np.float64)
+        if bundle.intervals is not None:
+            lower, upper = bundle.intervals.lookup(group_predictions, [requests[i].location for i in positions])
+            coverage = bundle.intervals.coverage
+        else:
+            lower, upper, coverage = group_predictions * 0.9, group_predictions * 1.1, None
+        for position, price, low, high in zip(positions, group_predictions.tolist(), lower.tolist(), upper.tolist()):
+            results[position] = {"predicted_price": price, "confidence_interval": [round(low, 2), round(high, 2)],
+                                 "interval_coverage": coverage}
+    return results
+
+def resolve_bundle(model_version: str = None) -> ModelBundle:
+    """
+    Bundle serving a requested model version; None routes to the current model.
     """
-    Perform batch predictions.
+    if model_version is None and registry.current is None:
+        raise RuntimeError("Model not available. Please run the training pipeline first.")
+    return model_pool.get(model_version)
+
+def predict_price(request: HousePredictionRequest, bundle: ModelBundle = None) -> PredictionResponse:
     """
-    input_data = pd.DataFrame([req.dict() for req in requests])
-    input_data['house_age'] = datetime.now().year - input_data['year_built']
-    input_data['bed_bath_ratio'] = input_data['bedrooms'] / input_data['bathrooms']
-    input_data['price_per_sqft'] = 0  # Dummy value for compatibility
+    Predict house price based on input features.
+    """
+    bundle = bundle or resolve_bundle(request.model_version)
+    timer = stage_timer(1)
+    predicted_price = _predict_one(request, bundle, timer)
+
+    response = build_response(predicted_price, bundle.version, request.location, bundle)
+    timer.mark('postprocess')
+    return response
+
+def predict_raw(request: HousePredictionRequest, bundle: ModelBundle = None) -> float:
+    """
+    Unrounded model output for one request: what prediction_cache holds, so a
+    cache hit builds the same response (and interval) as the miss did.
+    """
+    bundle = bundle or resolve_bundle(request.model_version)
+    return _predict_one(request, bundle, stage_timer(1))
+
+def _predict_one(request: HousePredictionRequest, bundle: ModelBundle, timer) -> float:
+    # Preprocess input data, skipping pandas when the compiled plan is available
+    if bundle.compiled is not None:
+        processed_features = bundle.compiled.transform_one(request)
+    else:
+        input_frame = _prepare_features([request])
+        timer.mark('frame')
+        processed_features = bundle.preprocessor.transform(input_frame)
+    timer.mark('preprocess')
+
+    # Make prediction; float() as in _predict_batch's tolist(), so both paths cache the same value
+    predicted_price = float(bundle.model.predict(processed_features)[0])
+    timer.mark('predict')
+    return predicted_price
+
+def batch_predict(requests: list[HousePredictionRequest], bundle: ModelBundle = None) -> list[float]:
+    """
+    Perform batch predictions, routing each request to its model_version.
+    """
+    if bundle is not None:
+        return _predict_batch(requests, bundle)
+
+    groups = {}
+    for i, req in enumerate(requests):
+        groups.setdefault(req.model_version, []).append(i)
+    if len(groups) == 1:
+        return _predict_batch(requests, resolve_bundle(requests[0].model_version))
+
+    predictions = [None] * len(requests)
+    for model_version, positions in groups.items():
+        group_predictions = _predict_batch([requests[i] for i in positions], resolve_bundle(model_version))
+        for position, prediction in zip(positions, group_predictions):
+            predictions[position] = prediction
+    return predictions
+
+def _encode_batch(requests: list[HousePredictionRequest], bundle: ModelBundle, timer):
+    if bundle.compiled is not None:
+        processed_features = bundle.compiled.transform(requests)
+    else:
+        input_frame = _prepare_features(requests)
+        timer.mark('frame')
+        processed_features = bundle.preprocessor.transform(input_frame)
+    timer.mark('preprocess')
+    return processed_features
+
+def _predict_batch(requests: list[HousePredictionRequest], bundle: ModelBundle) -> list[float]:
+    timer = stage_timer(len(requests))
 
     # Preprocess input data
-    processed_features = preprocessor.transform(input_data)
+    processed_features = _encode_batch(requests, bundle, timer)
 
     # Make predictions
-    predictions = model.predict(processed_features)
-    return predictions.tolist()
\ No newline at end of file
+    predictions = bundle.model.predict(processed_features)
+    timer.mark('predict')
+    predictions = predictions.tolist()
+    timer.mark('postprocess')
+    return predictions
+
+def batch_explain(requests: list[HousePredictionRequest], bundle: ModelBundle = None) -> list[tuple]:
+    """
+    (predicted price, feature attributions) per request, routed like
+    batch_predict. Attributions are {feature: SHAP value} dicts, largest
+    first; requests explained before are served from attribution_cache and
+    the rest share one pred_contribs call per model version.
+    """
+    if bundle is not None:
+        return _explain_batch(requests, bundle)
+
+    groups = {}
+    for i, req in enumerate(requests):
+        groups.setdefault(req.model_version, []).append(i)
+    results = [None] * len(requests)
+    for model_version, positions in groups.items():
+        group_results = _explain_batch([requests[i] for i in positions], resolve_bundle(model_version))
+        for position, result in zip(positions, group_results):
+            results[position] = result
+    return results
+
+def _explain_batch(requests: list[HousePredictionRequest], bundle: ModelBundle) -> list[tuple]:
+    timer = stage_timer(len(requests))
+    processed_features = _encode_batch(requests, bundle, timer)
+    predictions = bundle.model.predict(processed_features).tolist()
+    timer.mark('predict')
+
+    if bundle.attributor is None:
+        return [(price, {}) for price in predictions]
+    attributions = [attribution_cache.get(req, bundle.version) for req in requests]
+    misses = [i for i, attribution in enumerate(attributions) if attribution is None]
+    if misses:
+        rows = processed_features if len(misses) == len(requests) else processed_features[misses]
+        computed = bundle.attributor.as_dicts(bundle.attributor.explain(rows))
+        for i, attribution in zip(misses, computed):
+            attributions[i] = attribution
+            attribution_cache.put(requests[i], bundle.version, attribution)
+    timer.mark('explain')
+    return list(zip(predictions, attributions))
+
+def predict_columns(batch: ColumnarBatch, intervals: bool = False) -> dict:
+    """
+    Score a columnar batch (see columnar.py) without per-row request objects.
+    Returns columns ready for orjson: predicted_price and, with intervals,
+    interval_lower/interval_upper and interval_coverage.
+    """
+    bundle = resolve_bundle(batch.model_version)
+    timer = stage_timer(len(batch))
+
+    if bundle.compiled is not None:
+        processed_features = bundle.compiled.transform_columns(batch.columns)
+    else:
+        input_frame = build_feature_frame(pd.DataFrame(batch.columns), dtype=np.float64, serving=True)
+        timer.mark('frame')
+        processed_features = bundle.preprocessor.transform(input_frame)
+    timer.mark('preprocess')
+
+    # float64 so orjson writes the same digits /batch-predict does (float32 reprs are shorter)
+    predictions = bundle.model.predict(processed_features).astype(np.float64)
+    timer.mark('predict')
+
+    result = {"model_version": bundle.version, "predicted_price": predictions}
+    if intervals:
+        if bundle.intervals is not None:
+            lower, upper = bundle.intervals.lookup(predictions, batch.columns['location'])
+            coverage = bundle.intervals.coverage
+        else:
+            lower, upper, coverage = predictions * 0.9, predictions * 1.1, None
+        result.update(interval_lower=np.round(lower, 2), interval_upper=np.round(upper, 2), interval_coverage=coverage)
+    timer.mark('postprocess')
+    return result
+
+load_model()
@@ -0,0 +1,190 @@
+import collections
+import contextvars
+import itertools
+import os
+import sys
+import threading
+import time
+from prometheus_client import Histogram
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'HTTP request duration, from the first byte received to the last byte sent',
+    ['endpoint', 'status', 'batch_size'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+STAGE_DURATION = Histogram(
+    'inference_stage_duration_seconds',
+    'Time spent in each stage of a request: parse (body parsing and pydantic validation), '
+    'frame (DataFrame construction), preprocess, predict, explain (feature attributions) and postprocess',
+    ['stage', 'batch_size'],
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1, 1.0)
+)
+
+# Batch sizes are bucketed to keep label cardinality fixed
+BATCH_SIZE_BUCKETS = ((1, "1"), (10, "2-10"), (100, "11-100"), (1000, "101-1000"))
+
+ENABLED = os.getenv("INSTRUMENTATION", "true").lower() == "true"
+# Stage timings are recorded for one call in STAGE_SAMPLE_EVERY: an observation costs about
+# as much as the rest of the layer put together, and a sample gives the same distribution
+STAGE_SAMPLE_EVERY = max(1, int(os.getenv("STAGE_SAMPLE_EVERY", "8")))
+_stage_calls = itertools.count()
+
+
+def set_enabled(enabled: bool):
+    global ENABLED
+    ENABLED = enabled
+
+
+def batch_size_bucket(size: int) -> str:
+    for limit, label in BATCH_SIZE_BUCKETS:
+        if size <= limit:
+            return label
+    return ">1000"
+
+
+# Labelled children are resolved once; .labels() costs more than the observation itself
+_stage_children = {}
+
+
+def _stage_child(stage: str, bucket: str):
+    child = _stage_children.get((stage, bucket))
+    if child is None:
+        child = _stage_children[(stage, bucket)] = STAGE_DURATION.labels(stage=stage, batch_size=bucket)
+    return child
+
+
+class StageTimer:
+    """
+    Times consecutive stages of one inference call: each mark(stage) records
+    the time since the previous mark (or since the timer was created).
+    """
+
+    __slots__ = ('bucket', '_last')
+
+    def __init__(self, batch_size: int):
+        self.bucket = batch_size_bucket(batch_size)
+        self._last = time.perf_counter()
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        _stage_child(stage, self.bucket).observe(now - self._last)
+        self._last = now
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def mark(self, stage: str):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+def _sampled() -> bool:
+    return next(_stage_calls) % STAGE_SAMPLE_EVERY == 0
+
+
+def stage_timer(batch_size: int):
+    """A StageTimer for sampled calls, or a no-op timer (also when instrumentation is disabled)."""
+    return StageTimer(batch_size) if ENABLED and _sampled() else NULL_TIMER
+
+
+class _RequestTrace:
+    __slots__ = ('start', 'batch_size')
+
+    def __init__(self, start: float):
+        self.start = start
+        self.batch_size = None
+
+
+_current_trace = contextvars.ContextVar('request_trace', default=None)
+
+
+def request_parsed(batch_size: int = 1):
+    """
+    Called first thing in a handler: records the request's batch size for its
+    latency labels and, for sampled requests, the parse stage (everything since
+    the request arrived, mostly body parsing and pydantic validation).
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    trace.batch_size = batch_size
+    if _sampled():
+        _stage_child('parse', batch_size_bucket(batch_size)).observe(time.perf_counter() - trace.start)
+
+
+class InstrumentationMiddleware:
+    """
+    ASGI middleware observing http_request_duration_seconds per endpoint,
+    status and batch-size bucket. Plain ASGI rather than BaseHTTPMiddleware,
+    which would add a task and a response copy to every request.
+    """
+
+    def __init__(self, app, endpoints=None):
+        self.app = app
+        self.endpoints = endpoints
+        self._children = {}
+
+    def _endpoint(self, scope) -> str:
+        # Only known routes become label values, so scans of random paths cannot grow the metric
+        if self.endpoints is None:
+            self.endpoints = {route.path for route in getattr(scope.get('app'), 'routes', [])}
+        path = scope['path']
+        return path if path in self.endpoints else 'other'
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        trace = _RequestTrace(time.perf_counter())
+        token = _current_trace.set(trace)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_trace.reset(token)
+            key = (self._endpoint(scope), status, batch_size_bucket(trace.batch_size) if trace.batch_size else "none")
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = REQUEST_LATENCY.labels(endpoint=key[0], status=str(status),
+                                                                     batch_size=key[2])
+            child.observe(time.perf_counter() - trace.start)
+
+
+def sample_stacks(seconds: float, interval: float = 0.005, skip_thread: int = None) -> str:
+    """
+    Sampling profiler: every interval seconds, record the Python stack of every
+    thread but the sampler (and skip_thread), for the given duration. Returns
+    collapsed stacks ("thread;outer;...;inner count" per line) as read by
+    flamegraph.pl and speedscope. Threads only pay for this while it runs.
+    """
+    counts = collections.Counter()
+    sampler = threading.get_ident()
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident in (sampler, skip_thread):
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if ident not in names:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stack.append(names.get(ident, str(ident)))
+            counts[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
@@ -0,0 +1,43 @@
+import bisect
+import json
+import numpy as np
+
+INTERVALS_FILE = "prediction_intervals.json"
+
+
+class IntervalTable:
+    """
+    Conformal prediction intervals calibrated at training time
+    (prediction_intervals.json, see src/models/conformal.py): residual offsets
+    per location and bin of the predicted price. An interval costs a
+    searchsorted and a gather, however many predictions are looked up at once.
+    """
+
+    def __init__(self, coverage: float, price_edges, overall, locations: dict):
+        self.coverage = coverage
+        self.price_edges = np.asarray(price_edges, dtype=np.float64)
+        # Row 0 holds the all-locations offsets, used for locations not calibrated on their own
+        self.offsets = np.array([overall] + list(locations.values()), dtype=np.float64)
+        self.location_rows = {name: row for row, name in enumerate(locations, start=1)}
+        # Plain-Python copies for single predictions, where NumPy's per-call overhead dominates
+        self._edges = self.price_edges.tolist()
+        self._offsets = self.offsets.tolist()
+
+    @classmethod
+    def load(cls, path: str) -> "IntervalTable":
+        with open(path) as f:
+            table = json.load(f)
+        return cls(table["coverage"], table["price_edges"], table["overall"], table["locations"])
+
+    def lookup(self, predictions, locations) -> tuple:
+        """(lower, upper) arrays of the intervals around predictions for the given locations."""
+        predictions = np.asarray(predictions, dtype=np.float64)
+        rows = np.fromiter((self.location_rows.get(location, 0) for location in locations),
+                           dtype=np.intp, count=len(predictions))
+        offsets = self.offsets[rows, np.searchsorted(self.price_edges, predictions, side='right')]
+        return predictions + offsets[:, 0], predictions + offsets[:, 1]
+
+    def lookup_one(self, prediction: float, location: str) -> tuple:
+        """(lower, upper) of the interval around a single prediction."""
+        lower, upper = self._offsets[self.location_rows.get(location, 0)][bisect.bisect_right(self._edges, prediction)]
+        return prediction + lower, prediction + upper
@@ -1,9 +1,22 @@
-from fastapi import FastAPI, Response
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from inference import predict_price, batch_predict, MODEL_LOADED
+from inference import (predict_raw, batch_predict, batch_explain, batch_intervals, predict_columns, build_response, prediction_cache, registry, model_pool,
+                       model_store, resolve_bundle, default_artifact_paths)
 from schemas import HousePredictionRequest, PredictionResponse
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
-import time
+from typing import Optional
+from batching import MicroBatcher
+from executor import InferenceExecutor, PoolSaturated
+from registry import UnknownModelVersion, VersionPoller
+from shadow import ShadowScorer
+from instrumentation import InstrumentationMiddleware, request_parsed, sample_stacks
+from columnar import ColumnarValidationError, parse_columns
+from drift import DriftMonitor
+from streaming import BodyStreamingResponse, score_stream, stream_format, CSV_MEDIA_TYPE, NDJSON_MEDIA_TYPE
+from prometheus_client import CollectorRegistry, Counter, REGISTRY, generate_latest, multiprocess, CONTENT_TYPE_LATEST
+import asyncio
+import functools
+import os
 
 # Initialize FastAPI app with metadata
 app = FastAPI(
@@ -34,35 +47,330 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency per endpoint, status and batch-size bucket (INSTRUMENTATION=false turns it off)
+app.add_middleware(InstrumentationMiddleware)
+
 # Prometheus metrics
 REQUEST_COUNT = Counter('http_requests_total', 'Total HTTP requests', ['method', 'endpoint'])
-REQUEST_DURATION = Histogram('http_request_duration_seconds', 'HTTP request duration')
 PREDICTION_COUNT = Counter('predictions_total', 'Total predictions made')
 
+# Worker pools that keep CPU-bound inference off the event loop.
+# /predict and /batch-predict get separate pools so large batches cannot starve single predictions.
+def _worker_initargs(bundle):
+    return (bundle.model_path, bundle.preprocessor_path, bundle.version) if bundle is not None else ()
+
+def _create_executor(name):
+    return InferenceExecutor(
+        name,
+        kind=os.getenv("INFERENCE_EXECUTOR", "thread"),
+        max_workers=int(os.getenv("INFERENCE_WORKERS", "0")) or None,
+        max_queue=int(os.getenv("INFERENCE_MAX_QUEUE", "256")),
+        retry_after=int(os.getenv("INFERENCE_RETRY_AFTER", "1")),
+        initargs=_worker_initargs(registry.current),
+    )
+
+predict_executor = _create_executor("predict")
+batch_executor = _create_executor("batch")
+
+# Process pool workers hold their own copy of the model, so replace them after every swap
+def _restart_workers(bundle):
+    predict_executor.restart(_worker_initargs(bundle))
+    batch_executor.restart(_worker_initargs(bundle))
+
+registry.on_swap(_restart_workers)
+
+# Input drift against the serving model's training profile, scored on /metrics (DRIFT_MONITORING=false turns it off)
+DRIFT_MONITORING = os.getenv("DRIFT_MONITORING", "true").lower() == "true"
+drift_monitor = DriftMonitor(
+    window_seconds=float(os.getenv("DRIFT_WINDOW_SECONDS", "3600")),
+    min_observations=int(os.getenv("DRIFT_MIN_OBSERVATIONS", "100")),
+    batch_sample_size=int(os.getenv("DRIFT_BATCH_SAMPLE_SIZE", "1000")),
+)
+REGISTRY.register(drift_monitor)
+
+def _reset_drift_monitor(bundle):
+    drift_monitor.reset(bundle.reference_profile if DRIFT_MONITORING and bundle is not None else None)
+
+_reset_drift_monitor(registry.current)
+registry.on_swap(_reset_drift_monitor)
+
+# Poll the model store (if configured) for new versions
+MODEL_POLL_INTERVAL = float(os.getenv("MODEL_POLL_INTERVAL", "30"))
+version_poller = VersionPoller(registry, model_store, MODEL_POLL_INTERVAL) if model_store and MODEL_POLL_INTERVAL > 0 else None
+
+# Micro-batching of concurrent /predict requests
+MICRO_BATCHING = os.getenv("MICRO_BATCHING", "true").lower() == "true"
+batcher = MicroBatcher(
+    lambda requests: predict_executor.run(batch_predict, requests),
+    max_batch_size=int(os.getenv("BATCH_MAX_SIZE", "64")),
+    max_wait_us=int(os.getenv("BATCH_MAX_WAIT_US", "1000")),
+    name="predict",
+)
+# /predict?explain=true requests are batched separately so their attributions share one pred_contribs call
+explain_batcher = MicroBatcher(
+    lambda requests: predict_executor.run(batch_explain, requests),
+    max_batch_size=int(os.getenv("BATCH_MAX_SIZE", "64")),
+    max_wait_us=int(os.getenv("BATCH_MAX_WAIT_US", "1000")),
+    name="explain",
+)
+
+# Optional shadow scoring of live traffic with a candidate model version
+SHADOW_MODEL_VERSION = os.getenv("SHADOW_MODEL_VERSION")
+shadow_executor = InferenceExecutor(
+    "shadow",
+    max_workers=int(os.getenv("SHADOW_WORKERS", "1")),
+    max_queue=int(os.getenv("SHADOW_MAX_QUEUE", "32")),
+)
+shadow_scorer = ShadowScorer(
+    SHADOW_MODEL_VERSION,
+    shadow_executor,
+    batch_predict,
+    sample_rate=float(os.getenv("SHADOW_SAMPLE_RATE", "1.0")),
+) if SHADOW_MODEL_VERSION else None
+
+# Rows parsed and scored at a time by the streaming bulk endpoint
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "1000"))
+
+@app.on_event("startup")
+async def start_inference():
+    predict_executor.start()
+    batch_executor.start()
+    if MICRO_BATCHING:
+        await batcher.start()
+        await explain_batcher.start()
+    if version_poller is not None:
+        version_poller.start()
+    if shadow_scorer is not None:
+        shadow_executor.start()
+
+@app.on_event("shutdown")
+async def stop_inference():
+    if version_poller is not None:
+        version_poller.stop()
+    await batcher.stop()
+    await explain_batcher.stop()
+    if shadow_scorer is not None:
+        await shadow_scorer.drain()
+    predict_executor.shutdown()
+    batch_executor.shutdown()
+    shadow_executor.shutdown()
+
+# Reject work with 503 instead of queueing without bound when a pool is saturated
+@app.exception_handler(PoolSaturated)
+async def pool_saturated_handler(request: Request, exc: PoolSaturated):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+# Requests for a model version that does not exist
+@app.exception_handler(UnknownModelVersion)
+async def unknown_model_version_handler(request: Request, exc: UnknownModelVersion):
+    return JSONResponse(status_code=404, content={"detail": str(exc)})
+
+async def _route(requests: list[HousePredictionRequest], header_version: Optional[str]):
+    """
+    Apply the X-Model-Version header to requests without a model_version and make
+    sure every requested version is loaded (lazily, off the event loop).
+    """
+    versions = set()
+    for req in requests:
+        if req.model_version is None:
+            req.model_version = header_version
+        if req.model_version is not None and req.model_version != registry.version:
+            versions.add(req.model_version)
+    for version in versions:
+        await asyncio.to_thread(resolve_bundle, version)
+
+# Under server.py with several workers, each worker writes its metrics to PROMETHEUS_MULTIPROC_DIR
+# and whichever worker is scraped reports the aggregate. Drift scores are the scraped worker's own:
+# the kernel spreads connections across workers, so its inputs are a sample of the pod's.
+def _metrics_registry():
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(drift_monitor)
+    return registry
+
 # Metrics endpoint
 @app.get("/metrics")
 async def metrics():
-    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(_metrics_registry()), media_type=CONTENT_TYPE_LATEST)
 
 # Health check endpoint
 @app.get("/health", response_model=dict)
 async def health_check():
     REQUEST_COUNT.labels(method='GET', endpoint='/health').inc()
-    return {"status": "healthy", "model_loaded": MODEL_LOADED}
+    return {
+        "status": "healthy",
+        "model_loaded": registry.loaded,
+        "model_version": registry.version,
+        "loaded_versions": model_pool.versions(),
+    }
 
-# Prediction endpoint
+# Prediction endpoint (?explain=true fills features_importance with per-feature SHAP values)
 @app.post("/predict", response_model=PredictionResponse)
-async def predict(request: HousePredictionRequest):
-    start_time = time.time()
+async def predict(request: HousePredictionRequest, x_model_version: Optional[str] = Header(None),
+                  explain: bool = False):
+    request_parsed(1)
     REQUEST_COUNT.labels(method='POST', endpoint='/predict').inc()
     PREDICTION_COUNT.inc()
+    drift_monitor.observe(request)
     
-    result = predict_price(request)
+    await _route([request], x_model_version)
+    serving_version = registry.version
+    model_version = request.model_version or serving_version
+    if explain:
+        # Attributions have their own cache, in batch_explain
+        if MICRO_BATCHING:
+            price, attributions = await explain_batcher.submit(request)
+        else:
+            price, attributions = (await predict_executor.run(batch_explain, [request]))[0]
+        result = build_response(price, model_version, request.location, features_importance=attributions)
+    else:
+        # The cache holds the unrounded model output, so hits and misses build identical responses
+        price = prediction_cache.get(request, model_version)
+        if price is None:
+            if MICRO_BATCHING:
+                price = await batcher.submit(request)
+            else:
+                price = await predict_executor.run(predict_raw, request)
+            # Don't cache a result computed while a new model was being swapped in
+            if registry.version == serving_version:
+                prediction_cache.put(request, model_version, price)
+        result = build_response(price, model_version, request.location)
+
+    if shadow_scorer is not None and request.model_version is None:
+        shadow_scorer.submit([request], [result.predicted_price])
     
-    REQUEST_DURATION.observe(time.time() - start_time)
     return result
 
-# Batch prediction endpoint
-@app.post("/batch-predict", response_model=list)
-async def batch_predict_endpoint(requests: list[HousePredictionRequest]):
-    return batch_predict(requests)
\ No newline at end of file
+# Batch prediction endpoint (encoded with orjson; FastAPI's encoder walks every element in Python)
+@app.post("/batch-predict", response_model=list, response_class=ORJSONResponse)
+async def batch_predict_endpoint(requests: list[HousePredictionRequest], x_model_version: Optional[str] = Header(None),
+                                 intervals: bool = False, explain: bool = False):
+    request_parsed(len(requests))
+    drift_monitor.observe_batch(requests)
+    shadow_candidates = [req.model_version is None and x_model_version is None for req in requests]
+    await _route(requests, x_model_version)
+    if explain:
+        explained = await batch_executor.run(batch_explain, requests)
+        predictions = [price for price, _ in explained]
+    else:
+        predictions = await batch_executor.run(batch_predict, requests)
+
+    if shadow_scorer is not None and any(shadow_candidates):
+        shadowed = [i for i, candidate in enumerate(shadow_candidates) if candidate]
+        shadow_scorer.submit([requests[i] for i in shadowed], [predictions[i] for i in shadowed])
+    # ?intervals=true returns {predicted_price, confidence_interval, interval_coverage} per request instead of bare prices,
+    # ?explain=true {predicted_price, features_importance} (both: all four)
+    if intervals or explain:
+        results = batch_intervals(requests, predictions) if intervals else [{"predicted_price": price} for price in predictions]
+        if explain:
+            for result, (_, attributions) in zip(results, explained):
+                result["features_importance"] = attributions
+        return ORJSONResponse(results)
+    return ORJSONResponse(predictions)
+
+# Columnar batch prediction endpoint: one array per field in, one array per output out.
+# Validated with whole-array checks instead of a pydantic object per row.
+@app.post("/batch-predict/columns", response_class=ORJSONResponse)
+async def batch_predict_columns(request: Request, x_model_version: Optional[str] = Header(None),
+                                intervals: bool = False):
+    REQUEST_COUNT.labels(method='POST', endpoint='/batch-predict/columns').inc()
+    if not registry.loaded:
+        raise HTTPException(status_code=503, detail="Model not available. Please run the training pipeline first.")
+    try:
+        batch = parse_columns(await request.body())
+    except ColumnarValidationError as e:
+        return ORJSONResponse(status_code=422, content={"detail": e.errors})
+    request_parsed(len(batch))
+    drift_monitor.observe_columns(batch.columns)
+
+    batch.model_version = batch.model_version or x_model_version
+    if batch.model_version is not None and batch.model_version != registry.version:
+        await asyncio.to_thread(resolve_bundle, batch.model_version)
+    return ORJSONResponse(await batch_executor.run(predict_columns, batch, intervals))
+
+async def _score_stream_chunk(requests: list[HousePredictionRequest], header_version: Optional[str]) -> list:
+    """
+    Score one chunk of a bulk stream. The response has already started, so a row
+    asking for a model version that does not exist gets its error in place of a
+    price instead of a 404.
+    """
+    errors = {}
+    for req in requests:
+        if req.model_version is None:
+            req.model_version = header_version
+        version = req.model_version
+        if version is not None and version != registry.version and version not in errors:
+            try:
+                await asyncio.to_thread(resolve_bundle, version)
+                errors[version] = None
+            except UnknownModelVersion as e:
+                errors[version] = str(e)
+    scored = [req for req in requests if errors.get(req.model_version) is None]
+    prices = []
+    if scored:
+        drift_monitor.observe_batch(scored)
+        # A bulk stream cannot return 503 once it has started, so wait for pool capacity instead
+        while True:
+            try:
+                prices = await batch_executor.run(batch_predict, scored)
+                break
+            except PoolSaturated as e:
+                await asyncio.sleep(e.retry_after)
+    prices = iter(prices)
+    return [errors.get(req.model_version) or next(prices) for req in requests]
+
+# Streaming bulk prediction endpoint (NDJSON or CSV in, same format out)
+@app.post("/batch-predict/stream")
+async def batch_predict_stream(request: Request, x_model_version: Optional[str] = Header(None)):
+    REQUEST_COUNT.labels(method='POST', endpoint='/batch-predict/stream').inc()
+    if not registry.loaded:
+        raise HTTPException(status_code=503, detail="Model not available. Please run the training pipeline first.")
+
+    fmt = stream_format(request.headers.get('content-type', ''))
+    return BodyStreamingResponse(
+        score_stream(request.stream(), fmt, STREAM_CHUNK_SIZE,
+                     functools.partial(_score_stream_chunk, header_version=x_model_version)),
+        media_type=CSV_MEDIA_TYPE if fmt == 'csv' else NDJSON_MEDIA_TYPE,
+    )
+
+# Admin endpoint: load a new model version in the background and swap it in without dropping requests
+@app.post("/admin/reload", response_model=dict)
+async def reload_model(version: str = None):
+    REQUEST_COUNT.labels(method='POST', endpoint='/admin/reload').inc()
+    previous_version = registry.version
+
+    if model_store is not None:
+        version = version or model_store.latest_version()
+        if version is None:
+            raise HTTPException(status_code=404, detail="No model version published in the model store")
+        model_path, preprocessor_path = model_store.artifact_paths(version)
+    elif version is not None:
+        raise HTTPException(status_code=400, detail="MODEL_STORE_DIR is not configured; cannot select a version")
+    else:
+        model_path, preprocessor_path = default_artifact_paths()
+
+    if not (os.path.exists(model_path) and os.path.exists(preprocessor_path)):
+        raise HTTPException(status_code=404, detail=f"Model artifacts not found for version {version}")
+
+    bundle = await asyncio.to_thread(registry.reload, model_path, preprocessor_path, version)
+    return {"previous_version": previous_version, "version": bundle.version}
+
+# Admin endpoint: sample every thread's Python stack for a while and return collapsed stacks
+# (for flamegraph.pl or speedscope). Off unless PROFILER_ENABLED=true; costs nothing until called.
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+PROFILER_MAX_SECONDS = 60
+
+@app.get("/admin/profile", response_class=PlainTextResponse)
+async def profile(seconds: float = 10, interval_ms: float = 5):
+    REQUEST_COUNT.labels(method='GET', endpoint='/admin/profile').inc()
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler is disabled; set PROFILER_ENABLED=true")
+    if not 0 < seconds <= PROFILER_MAX_SECONDS or interval_ms < 1:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {PROFILER_MAX_SECONDS}] and interval_ms >= 1")
+    return await asyncio.to_thread(sample_stacks, seconds, interval_ms / 1000)
@@ -0,0 +1,349 @@
+import hashlib
+import os
+import tarfile
+import threading
+import time
+from collections import OrderedDict
+import joblib
+from compiled_preprocessor import CompiledPreprocessor
+from intervals import INTERVALS_FILE, IntervalTable
+from drift import PROFILE_FILE, ReferenceProfile
+from attributions import FeatureAttributor
+
+
+def artifact_version(*paths) -> str:
+    """
+    Content hash identifying a model/preprocessor pair.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+class UnknownModelVersion(LookupError):
+    """Raised when a requested model version does not exist or cannot be served."""
+
+
+class ModelBundle:
+    """
+    A loaded model/preprocessor pair plus its compiled preprocessing plan, its
+    feature attributor and, when they ship with the artifacts, its prediction
+    interval table and the training reference profile drift is measured
+    against. Bundles are
+    never mutated after loading, so a request that grabbed one can keep
+    using it while a newer bundle is swapped in.
+    """
+
+    def __init__(self, model, preprocessor, version: str, model_path: str = None,
+                 preprocessor_path: str = None, compiled: CompiledPreprocessor = None,
+                 intervals: IntervalTable = None, reference_profile: ReferenceProfile = None):
+        self.model = model
+        self.preprocessor = preprocessor
+        self.version = version
+        self.model_path = model_path
+        self.preprocessor_path = preprocessor_path
+        self.loaded_at = time.time()
+        self.size_bytes = 0
+        self.compiled = compiled
+        self.intervals = intervals
+        self.reference_profile = reference_profile
+        if compiled is None:
+            try:
+                self.compiled = CompiledPreprocessor.compile(preprocessor)
+            except ValueError as e:
+                print(f"Warning: Could not compile preprocessor, using pandas path: {str(e)}")
+        self.attributor = None
+        try:
+            self.attributor = FeatureAttributor.for_model(model, self.compiled, preprocessor)
+        except ValueError as e:
+            print(f"Warning: Feature attributions unavailable: {str(e)}")
+
+
+def is_native_model(model_path: str) -> bool:
+    return model_path.endswith(('.ubj', '.json'))
+
+
+def is_preprocessor_spec(preprocessor_path: str) -> bool:
+    return preprocessor_path.endswith('.json')
+
+
+def set_model_threads(model, threads: int):
+    """
+    Cap the threads one predict call may use (XGBoost's nthread). Models
+    without an n_jobs parameter are left alone.
+    """
+    if threads and hasattr(model, 'get_params') and 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=threads)
+
+
+def load_bundle(model_path: str, preprocessor_path: str, version: str = None) -> ModelBundle:
+    """
+    Load a model/preprocessor pair from disk. Native XGBoost models (.ubj/.json)
+    and array-based preprocessor specs (.json) are loaded without unpickling.
+    """
+    if is_native_model(model_path):
+        import xgboost as xgb
+        model = xgb.XGBRegressor()
+        model.load_model(model_path)
+    else:
+        model = joblib.load(model_path)
+    # Left unset, XGBoost starts a thread per host CPU, not per CPU the container may use
+    set_model_threads(model, int(os.getenv("INFERENCE_THREADS", "0")))
+
+    artifact_files = [model_path, preprocessor_path]
+    if is_preprocessor_spec(preprocessor_path):
+        preprocessor = None
+        compiled = CompiledPreprocessor.from_spec(preprocessor_path)
+        artifact_files.append(os.path.splitext(preprocessor_path)[0] + ".npy")
+    else:
+        preprocessor = joblib.load(preprocessor_path)
+        compiled = None
+
+    # Calibrated intervals live next to the model; models trained before them have none
+    intervals_path = os.path.join(os.path.dirname(model_path), INTERVALS_FILE)
+    intervals = None
+    if os.path.exists(intervals_path):
+        intervals = IntervalTable.load(intervals_path)
+        artifact_files.append(intervals_path)
+
+    # The reference profile is written next to the preprocessor; it does not change predictions,
+    # so it is not part of the version hash
+    profile_path = os.path.join(os.path.dirname(preprocessor_path), PROFILE_FILE)
+    reference_profile = ReferenceProfile.load(profile_path) if os.path.exists(profile_path) else None
+
+    bundle = ModelBundle(
+        model,
+        preprocessor,
+        version or artifact_version(*artifact_files),
+        model_path=model_path,
+        preprocessor_path=preprocessor_path,
+        compiled=compiled,
+        intervals=intervals,
+        reference_profile=reference_profile,
+    )
+    # On-disk size is a cheap proxy for the memory the loaded bundle holds
+    bundle.size_bytes = sum(os.path.getsize(path) for path in artifact_files)
+    return bundle
+
+
+class ModelRegistry:
+    """
+    Holds the bundle currently serving traffic.
+
+    reload() loads and warms a new bundle on the calling thread while the old
+    one keeps serving, then swaps it in with a single reference assignment.
+    """
+
+    def __init__(self, warmup=None):
+        self.warmup = warmup
+        self._bundle = None
+        self._reload_lock = threading.Lock()
+        self._listeners = []
+
+    @property
+    def current(self) -> ModelBundle:
+        return self._bundle
+
+    @property
+    def loaded(self) -> bool:
+        return self._bundle is not None
+
+    @property
+    def version(self) -> str:
+        bundle = self._bundle
+        return bundle.version if bundle is not None else None
+
+    def on_swap(self, listener):
+        """Register listener(bundle) to be called after every swap."""
+        self._listeners.append(listener)
+
+    def swap(self, bundle: ModelBundle) -> ModelBundle:
+        """Install bundle and return the one it replaced."""
+        previous, self._bundle = self._bundle, bundle
+        for listener in self._listeners:
+            listener(bundle)
+        return previous
+
+    def reload(self, model_path: str, preprocessor_path: str, version: str = None) -> ModelBundle:
+        """Load, warm and swap in a new model/preprocessor pair."""
+        with self._reload_lock:
+            bundle = load_bundle(model_path, preprocessor_path, version)
+            if self.warmup is not None:
+                self.warmup(bundle)
+            self.swap(bundle)
+            print(f"Model version {bundle.version} loaded from {model_path}")
+            return bundle
+
+
+class LocalModelStore:
+    """
+    Local-directory stand-in for the S3 layout written by ModelDeployer:
+    {root}/models/{model_name}/{version}/ holding house_price_model.pkl and
+    preprocessor.pkl (or a model.tar.gz containing them), plus
+    {root}/models/{model_name}/latest/version.txt naming the current version.
+    Native artifacts (house_price_model.ubj, preprocessor_spec.json) are
+    preferred when a version directory has both.
+    """
+
+    MODEL_FILE = "house_price_model.pkl"
+    PREPROCESSOR_FILE = "preprocessor.pkl"
+    NATIVE_MODEL_FILE = "house_price_model.ubj"
+    PREPROCESSOR_SPEC_FILE = "preprocessor_spec.json"
+
+    def __init__(self, root: str, model_name: str = "house-price-model"):
+        self.root = root
+        self.model_name = model_name
+
+    def _model_dir(self, version: str) -> str:
+        return os.path.join(self.root, "models", self.model_name, version)
+
+    def latest_version(self) -> str:
+        """Version named by latest/version.txt, or None if there is none yet."""
+        path = os.path.join(self.root, "models", self.model_name, "latest", "version.txt")
+        try:
+            with open(path) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def artifact_paths(self, version: str) -> tuple:
+        """Return (model_path, preprocessor_path) for a version, unpacking model.tar.gz if needed."""
+        model_dir = self._model_dir(version)
+        if version in ('', '.', '..', 'latest') or os.sep in version or not os.path.isdir(model_dir):
+            raise UnknownModelVersion(f"Model version not found: {version}")
+        model_path = os.path.join(model_dir, self.MODEL_FILE)
+        tarball = os.path.join(model_dir, "model.tar.gz")
+        if not os.path.exists(model_path) and os.path.exists(tarball):
+            with tarfile.open(tarball, "r:gz") as tar:
+                tar.extractall(model_dir, filter="data")
+
+        native_model_path = os.path.join(model_dir, self.NATIVE_MODEL_FILE)
+        spec_path = os.path.join(model_dir, self.PREPROCESSOR_SPEC_FILE)
+        if os.path.exists(native_model_path) and os.path.exists(spec_path):
+            return native_model_path, spec_path
+        return model_path, os.path.join(model_dir, self.PREPROCESSOR_FILE)
+
+
+class ModelPool:
+    """
+    Extra model versions held in memory next to the serving bundle.
+
+    Versions are loaded lazily from the store on first use and evicted least
+    recently used once their combined size exceeds memory_budget_bytes. The
+    registry's serving bundle is never evicted and does not count towards
+    the budget.
+
+    _lock only guards the OrderedDict. Loads are serialized per version, so
+    concurrent requests for a version being loaded wait for that one load
+    while requests for other versions carry on.
+    """
+
+    def __init__(self, registry: ModelRegistry, store: LocalModelStore, memory_budget_bytes: int):
+        self.registry = registry
+        self.store = store
+        self.memory_budget_bytes = memory_budget_bytes
+        self._bundles = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def _lookup(self, version: str) -> ModelBundle:
+        with self._lock:
+            bundle = self._bundles.get(version)
+            if bundle is not None:
+                self._bundles.move_to_end(version)
+            return bundle
+
+    def get(self, version: str = None) -> ModelBundle:
+        """Return the bundle for version, loading it if needed; None means the serving bundle."""
+        current = self.registry.current
+        if version is None or (current is not None and version == current.version):
+            return current
+
+        bundle = self._lookup(version)
+        if bundle is not None:
+            return bundle
+        if self.store is None:
+            raise UnknownModelVersion(f"Model version not found: {version}")
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(version, threading.Lock())
+        try:
+            with load_lock:
+                # Loaded by another request while this one waited
+                bundle = self._lookup(version)
+                if bundle is not None:
+                    return bundle
+                bundle = load_bundle(*self.store.artifact_paths(version), version=version)
+                if self.registry.warmup is not None:
+                    self.registry.warmup(bundle)
+                with self._lock:
+                    self._bundles[version] = bundle
+                    self._evict(keep=version)
+        finally:
+            # Dropped after every attempt, so requests for unknown versions leave nothing behind
+            with self._lock:
+                if self._load_locks.get(version) is load_lock:
+                    del self._load_locks[version]
+        print(f"Model version {version} loaded alongside {self.registry.version}")
+        return bundle
+
+    def _evict(self, keep: str):
+        total = sum(bundle.size_bytes for bundle in self._bundles.values())
+        for version in list(self._bundles):
+            if total <= self.memory_budget_bytes:
+                break
+            if version != keep:
+                total -= self._bundles.pop(version).size_bytes
+
+    def versions(self) -> list:
+        """Versions currently held in memory, least recently used first."""
+        return list(self._bundles)
+
+
+class VersionPoller:
+    """
+    Background thread that reloads the registry whenever the store's
+    latest/version.txt pointer changes. Only pointer changes trigger a reload,
+    so a version pinned through the admin endpoint stays until a new one is published.
+    """
+
+    def __init__(self, registry: ModelRegistry, store: LocalModelStore, interval: float = 30):
+        self.registry = registry
+        self.store = store
+        self.interval = interval
+        self._last_seen = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check(self) -> bool:
+        """Reload if the latest pointer moved since the last check; returns whether it moved."""
+        version = self.store.latest_version()
+        if version is None or version == self._last_seen:
+            return False
+        if version != self.registry.version:
+            self.registry.reload(*self.store.artifact_paths(version), version=version)
+        self._last_seen = version
+        return True
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Warning: Model reload failed: {str(e)}")
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="model-version-poller", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+            self._thread = None
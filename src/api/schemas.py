@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
 
 class HousePredictionRequest(BaseModel):
     sqft: float = Field(..., gt=0, description="Square footage of the house")
@@ -8,9 +8,12 @@ class HousePredictionRequest(BaseModel):
     location: str = Field(..., description="Location (urban, suburban, rural)")
     year_built: int = Field(..., ge=1800, le=2023, description="Year the house was built")
     condition: str = Field(..., description="Condition of the house (e.g., Good, Excellent, Fair)")
+    model_version: Optional[str] = Field(None, description="Model version to score with (defaults to the serving model)")
 
 class PredictionResponse(BaseModel):
     predicted_price: float
     confidence_interval: List[float]
+    interval_coverage: Optional[float] = Field(None, description="Calibrated coverage of confidence_interval (None: uncalibrated ±10%)")
     features_importance: dict
-    prediction_time: str
\ No newline at end of file
+    prediction_time: str
+    model_version: Optional[str] = None
\ No newline at end of file
@@ -0,0 +1,272 @@
+"""
+Production entry point: load and warm the model once in a master process,
+then fork workers that share its memory copy-on-write and serve one
+listening socket.
+
+    python server.py --host 0.0.0.0 --port 8000
+
+The worker count (WEB_CONCURRENCY) and the inference threads per worker
+(INFERENCE_THREADS) default to the CPUs the container's cgroup quota grants,
+not the node's CPU count, so inference threads never oversubscribe the pod.
+"""
+import argparse
+import gc
+import logging
+import os
+import select
+import signal
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+logger = logging.getLogger("uvicorn.error")
+
+# Native thread pools sized from the environment when their libraries load, so set before any import
+THREAD_ENVIRONMENT = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+
+def cgroup_cpu_quota(root: str = "/sys/fs/cgroup") -> float:
+    """CPUs granted by the cgroup CPU quota (v2 cpu.max or v1 cfs_quota_us), or None without one."""
+    try:
+        with open(os.path.join(root, "cpu.max")) as f:
+            quota, period = f.read().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(os.path.join(root, "cpu", "cpu.cfs_quota_us")) as f:
+            quota = int(f.read())
+        with open(os.path.join(root, "cpu", "cpu.cfs_period_us")) as f:
+            period = int(f.read())
+        return quota / period if quota > 0 and period > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def available_cpus() -> float:
+    """CPUs this process may use: its affinity mask, capped by the cgroup quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = cgroup_cpu_quota()
+    return min(cpus, quota) if quota else cpus
+
+
+def worker_layout(cpus: float, workers: int = None, threads: int = None) -> tuple:
+    """
+    (workers, inference threads per worker) for a CPU budget. A fractional
+    quota rounds down (never below one), since running past the quota gets
+    the whole pod throttled.
+    """
+    workers = workers or max(1, int(cpus))
+    return workers, threads or max(1, int(cpus // workers))
+
+
+def configure_environment(workers: int, threads: int):
+    """Thread caps and metrics settings the API modules read when they are imported."""
+    for name in THREAD_ENVIRONMENT:
+        os.environ.setdefault(name, str(threads))
+    # Threads per inference pool in each worker (main.py reads this at import)
+    os.environ.setdefault("INFERENCE_WORKERS", str(threads))
+    if workers > 1:
+        # Workers write metrics to shared files so /metrics on any of them reports the whole pod
+        metrics_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+        if metrics_dir is None:
+            metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="prometheus-")
+        os.makedirs(metrics_dir, exist_ok=True)
+        # Files left by a previous run would be added to this run's metrics
+        for name in os.listdir(metrics_dir):
+            if name.endswith(".db"):
+                os.remove(os.path.join(metrics_dir, name))
+
+
+class _Worker:
+    __slots__ = ('ready_fd', 'ready')
+
+    def __init__(self, ready_fd: int):
+        self.ready_fd = ready_fd
+        self.ready = False
+
+
+class PreforkServer:
+    """
+    Master process supervising forked uvicorn workers.
+
+    The master imports the app, which loads and warms the serving model, then
+    freezes the garbage collector so workers do not dirty the shared pages.
+    Each forked worker raises its inference threads, warms the model again and
+    reports ready before it starts accepting connections. Workers that die
+    are replaced. If one dies before it is ready, the whole server exits,
+    since a replacement would fail the same way. SIGTERM/SIGINT stop the
+    workers gracefully.
+    """
+
+    def __init__(self, config, workers: int, threads: int, graceful_timeout: float = 30):
+        self.config = config
+        self.workers = workers
+        self.threads = threads
+        self.graceful_timeout = graceful_timeout
+        self.exit_code = 0
+        self._children = {}
+        self._stopping = False
+        self._socket = None
+
+    def run(self) -> int:
+        self._socket = self.config.bind_socket()
+        if threading.active_count() > 1:
+            # fork copies only the calling thread; anything started by an import would be lost in the workers
+            logger.warning("Forking with %d threads running in the master", threading.active_count())
+        # Gauges the master set while loading would count as a live process next to the workers
+        _mark_process_dead(os.getpid())
+        gc.collect()
+        gc.freeze()
+
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, self._stop)
+        for _ in range(self.workers):
+            self._spawn()
+        while not self._stopping:
+            self._wait_ready(timeout=0.5)
+            self._reap()
+        self._shutdown()
+        return self.exit_code
+
+    def _stop(self, signum, frame):
+        self._stopping = True
+
+    def _spawn(self):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            for worker in self._children.values():
+                os.close(worker.ready_fd)
+            code = 0
+            try:
+                self._serve(write_fd)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        os.close(write_fd)
+        self._children[pid] = _Worker(read_fd)
+
+    def _serve(self, ready_fd: int):
+        """Worker body: raise thread caps, warm the shared model, report ready, serve."""
+        import uvicorn
+        import instrumentation
+        import inference
+        from registry import set_model_threads
+
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, signal.SIG_DFL)
+        os.environ["INFERENCE_THREADS"] = str(self.threads)
+        os.environ["INSTRUMENTATION"] = "true" if INSTRUMENTATION else "false"
+        bundle = inference.registry.current
+        if bundle is not None:
+            set_model_threads(bundle.model, self.threads)
+            inference.warm_up(bundle)
+        instrumentation.set_enabled(INSTRUMENTATION)
+
+        os.write(ready_fd, b"1")
+        os.close(ready_fd)
+        uvicorn.Server(self.config).run(sockets=[self._socket])
+
+    def _wait_ready(self, timeout: float):
+        pending = {worker.ready_fd: pid for pid, worker in self._children.items() if not worker.ready}
+        if not pending:
+            time.sleep(timeout)
+            return
+        readable, _, _ = select.select(list(pending), [], [], timeout)
+        for fd in readable:
+            worker = self._children[pending[fd]]
+            if os.read(fd, 1):
+                worker.ready = True
+                ready = sum(child.ready for child in self._children.values())
+                logger.info("Worker %d ready (%d/%d)", pending[fd], ready, self.workers)
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self._children.pop(pid, None)
+            if worker is None:
+                continue
+            os.close(worker.ready_fd)
+            _mark_process_dead(pid)
+            if self._stopping:
+                continue
+            if not worker.ready:
+                logger.error("Worker %d failed to start (exit status %d); stopping", pid, os.waitstatus_to_exitcode(status))
+                self.exit_code = 1
+                self._stopping = True
+            else:
+                logger.warning("Worker %d exited (exit status %d); starting a replacement",
+                               pid, os.waitstatus_to_exitcode(status))
+                self._spawn()
+
+    def _shutdown(self):
+        for pid in self._children:
+            _signal(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self._children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in self._children:
+            logger.warning("Worker %d did not stop within %ss; killing it", pid, self.graceful_timeout)
+            _signal(pid, signal.SIGKILL)
+        while self._children:
+            self._reap()
+            time.sleep(0.1)
+        self._socket.close()
+
+
+def _signal(pid: int, signum: int):
+    try:
+        os.kill(pid, signum)
+    except ProcessLookupError:
+        pass
+
+
+def _mark_process_dead(pid: int):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
+
+
+# Requested instrumentation setting; the master preloads with it off so warm-up is not recorded
+INSTRUMENTATION = os.getenv("INSTRUMENTATION", "true").lower() == "true"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the API from preforked workers sharing one loaded model")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "0")) or None,
+                        help="Worker processes (default: WEB_CONCURRENCY, else the CPU quota rounded down)")
+    parser.add_argument("--threads", type=int, default=int(os.getenv("INFERENCE_THREADS", "0")) or None,
+                        help="Inference threads per worker (default: INFERENCE_THREADS, else CPUs / workers)")
+    parser.add_argument("--graceful-timeout", type=float, default=float(os.getenv("GRACEFUL_TIMEOUT", "30")))
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    args = parser.parse_args()
+
+    cpus = available_cpus()
+    workers, threads = worker_layout(cpus, args.workers, args.threads)
+    configure_environment(workers, threads)
+    # One thread while preloading: an OpenMP pool started in the master does not survive fork
+    os.environ["INFERENCE_THREADS"] = "1"
+    os.environ["INSTRUMENTATION"] = "false"
+
+    import uvicorn
+    config = uvicorn.Config("main:app", host=args.host, port=args.port, log_level=args.log_level)
+    logger.info("Preloading the API for %d worker(s) x %d inference thread(s) (%.2f CPUs available)",
+                workers, threads, cpus)
+    config.load()
+    sys.exit(PreforkServer(config, workers, threads, args.graceful_timeout).run())
@@ -0,0 +1,71 @@
+import asyncio
+import random
+import time
+from prometheus_client import Counter, Histogram
+from executor import InferenceExecutor, PoolSaturated
+from schemas import HousePredictionRequest
+
+SHADOW_DURATION = Histogram(
+    'shadow_prediction_duration_seconds',
+    'Time to score a request batch with the shadow model',
+    ['model_version']
+)
+SHADOW_DELTA = Histogram(
+    'shadow_prediction_delta_ratio',
+    'Relative difference |shadow - primary| / primary between shadow and serving predictions',
+    ['model_version'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+SHADOW_SKIPPED = Counter(
+    'shadow_predictions_skipped_total',
+    'Requests that were not shadow scored',
+    ['model_version', 'reason']
+)
+
+
+class ShadowScorer:
+    """
+    Score a sample of live traffic with a candidate model version off the request path.
+
+    submit() returns immediately; scoring runs on its own small executor so a slow
+    candidate can never add latency to, or take capacity from, the serving model.
+    Latency and the relative prediction delta are recorded per candidate version.
+    """
+
+    def __init__(self, model_version: str, executor: InferenceExecutor, predict_fn, sample_rate: float = 1.0):
+        self.model_version = model_version
+        self.executor = executor
+        self.predict_fn = predict_fn
+        self.sample_rate = sample_rate
+        self._tasks = set()
+
+    def submit(self, requests: list[HousePredictionRequest], primary_predictions: list[float]):
+        """Schedule shadow scoring for requests already answered by the serving model."""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        task = asyncio.create_task(self._score(requests, primary_predictions))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _score(self, requests: list[HousePredictionRequest], primary_predictions: list[float]):
+        shadow_requests = [req.copy(update={'model_version': self.model_version}) for req in requests]
+        start_time = time.perf_counter()
+        try:
+            predictions = await self.executor.run(self.predict_fn, shadow_requests)
+        except PoolSaturated:
+            SHADOW_SKIPPED.labels(model_version=self.model_version, reason='saturated').inc(len(requests))
+            return
+        except Exception as e:
+            print(f"Warning: Shadow scoring with {self.model_version} failed: {str(e)}")
+            SHADOW_SKIPPED.labels(model_version=self.model_version, reason='error').inc(len(requests))
+            return
+        SHADOW_DURATION.labels(model_version=self.model_version).observe(time.perf_counter() - start_time)
+
+        delta = SHADOW_DELTA.labels(model_version=self.model_version)
+        for primary, shadow in zip(primary_predictions, predictions):
+            delta.observe(abs(shadow - primary) / abs(primary) if primary else abs(shadow - primary))
+
+    async def drain(self):
+        """Wait for shadow scoring still in flight."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,219 @@
+import csv
+import io
+import json
+import re
+from typing import AsyncIterator, Awaitable, Callable
+from pydantic import ValidationError
+from starlette.responses import StreamingResponse
+from schemas import HousePredictionRequest
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv"
+# Longest line, and longest CSV record (a quoted field may span lines): a body without newlines or with an
+# unterminated quote would otherwise be buffered whole
+MAX_RECORD_SIZE = 1 << 16
+
+# A field as csv.reader parses it: quoted ("" escapes a quote; text after the closing quote is kept), or unquoted
+_CSV_FIELD = r'(?:"(?:[^"]|"")*"(?!")[^,]*|[^",][^,]*|)'
+# Lines that leave no quoted field open, starting outside or inside one
+_COMPLETE_LINE = re.compile(rf'{_CSV_FIELD}(?:,{_CSV_FIELD})*')
+_CLOSING_LINE = re.compile(rf'(?:[^"]|"")*"(?!")[^,]*(?:,{_CSV_FIELD})*')
+
+
+class BodyStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose generator reads the request body as it writes.
+    The stock class listens for disconnects on receive(), which would swallow
+    body messages the generator has not consumed yet; a disconnect still
+    surfaces here as ClientDisconnect from request.stream().
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+
+def stream_format(content_type: str) -> str:
+    """Pick the stream format ('csv' or 'ndjson') from a Content-Type header."""
+    return 'csv' if 'csv' in content_type.lower() else 'ndjson'
+
+
+class LineError:
+    """Stands in for a line iter_lines cannot return: longer than MAX_RECORD_SIZE or not UTF-8."""
+
+    def __init__(self, error: str):
+        self.error = error
+
+
+def _decode(line: bytes):
+    try:
+        return line.decode('utf-8').rstrip('\r')
+    except UnicodeDecodeError as e:
+        return LineError(f"Invalid UTF-8: {e}")
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator:
+    """
+    Split a chunked byte stream into decoded lines without buffering the whole
+    body. Lines that are too long or not UTF-8 come out as a LineError, so they
+    fail as a row instead of ending a response that has already started.
+    """
+    buffer = b''
+    skipping = False  # Dropping the rest of a line already reported as too long
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            if skipping:
+                skipping = False
+            elif len(line) > MAX_RECORD_SIZE:
+                yield LineError(f"Line exceeds {MAX_RECORD_SIZE} bytes")
+            else:
+                yield _decode(line)
+        if len(buffer) > MAX_RECORD_SIZE:
+            if not skipping:
+                yield LineError(f"Line exceeds {MAX_RECORD_SIZE} bytes")
+                skipping = True
+            buffer = b''
+    if buffer and not skipping:
+        yield _decode(buffer)
+
+
+def _ends_in_quoted_field(line: str, in_quotes: bool) -> bool:
+    """
+    Whether a CSV line ends inside a quoted field, given whether it started
+    inside one. Follows csv's default dialect: a quote only opens a field at
+    its start, and "" inside a quoted field is a literal quote.
+    """
+    return (_CLOSING_LINE if in_quotes else _COMPLETE_LINE).fullmatch(line) is None
+
+
+async def iter_csv_rows(lines: AsyncIterator) -> AsyncIterator[tuple]:
+    """
+    Group lines into CSV records, so quoted fields may contain newlines as they
+    can for csv.reader over a file. Yields (fields, error); records longer than
+    MAX_RECORD_SIZE (usually an unterminated quote) and LineErrors, with the
+    record they were part of, are dropped with an error.
+    """
+    pending, in_quotes, size = [], False, 0
+    async for line in lines:
+        if isinstance(line, LineError):
+            yield None, line.error
+            pending, in_quotes, size = [], False, 0
+            continue
+        if not pending and not line.strip():
+            continue
+        pending.append(line)
+        size += len(line)
+        if in_quotes or '"' in line:
+            in_quotes = _ends_in_quoted_field(line, in_quotes)
+        if not in_quotes:
+            yield _parse_record(pending), None
+            pending, size = [], 0
+        elif size > MAX_RECORD_SIZE:
+            yield None, f"CSV record exceeds {MAX_RECORD_SIZE} characters (unterminated quoted field?)"
+            pending, in_quotes, size = [], False, 0
+    if pending:
+        # Unterminated quote at the end of the body: parsed as csv.reader would, final newline included
+        yield _parse_record(pending + ['']), None
+
+
+def _parse_record(lines: list[str]) -> list[str]:
+    # csv.reader only keeps a quoted newline when the line still ends with it
+    if len(lines) > 1:
+        lines = [line + '\n' for line in lines[:-1]] + lines[-1:]
+    return next(csv.reader(lines))
+
+
+async def iter_records(lines: AsyncIterator, fmt: str) -> AsyncIterator[tuple]:
+    """
+    Parse NDJSON objects or CSV rows (first record is the header; quoted
+    fields may span lines). Yields (row_id, record, error); row_id is the
+    record's 'id' field when present, otherwise its 0-based position in the stream.
+    """
+    header = None
+    row_number = 0
+    async for item in (iter_csv_rows(lines) if fmt == 'csv' else lines):
+        if fmt == 'csv':
+            fields, error = item
+            if header is None and error is None:
+                header = fields
+                continue
+            record = dict(zip(header, fields)) if error is None else None
+        elif isinstance(item, LineError):
+            record, error = None, item.error
+        else:
+            line = item
+            if not line.strip():
+                continue
+            try:
+                record, error = json.loads(line), None
+                if not isinstance(record, dict):
+                    record, error = None, "Expected a JSON object"
+            except json.JSONDecodeError as e:
+                record, error = None, f"Invalid JSON: {e}"
+
+        row_id = record.get('id', row_number) if record is not None else row_number
+        row_number += 1
+        yield row_id, record, error
+
+
+def _encode(results: list[tuple], fmt: str) -> str:
+    if fmt == 'csv':
+        out = io.StringIO()
+        writer = csv.writer(out, lineterminator='\n')
+        for row_id, price, error in results:
+            writer.writerow([row_id, '' if price is None else price, error or ''])
+        return out.getvalue()
+
+    lines = []
+    for row_id, price, error in results:
+        if error is None:
+            lines.append(json.dumps({"id": row_id, "predicted_price": price}))
+        else:
+            lines.append(json.dumps({"id": row_id, "error": error}))
+    return '\n'.join(lines) + '\n'
+
+
+async def _score_chunk(chunk: list[tuple], predict_fn) -> list[tuple]:
+    results = []
+    requests, positions = [], []
+    for row_id, record, error in chunk:
+        if error is None:
+            try:
+                requests.append(HousePredictionRequest(**record))
+                positions.append(len(results))
+            except ValidationError as e:
+                error = "; ".join(
+                    f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors()
+                )
+        results.append((row_id, None, error))
+
+    if requests:
+        predictions = await predict_fn(requests)
+        for position, prediction in zip(positions, predictions):
+            if isinstance(prediction, str):
+                results[position] = (results[position][0], None, prediction)
+            else:
+                results[position] = (results[position][0], prediction, None)
+    return results
+
+
+async def score_stream(chunks: AsyncIterator[bytes], fmt: str, chunk_size: int,
+                       predict_fn: Callable[[list[HousePredictionRequest]], Awaitable[list]]) -> AsyncIterator[str]:
+    """
+    Parse, validate and score a request body chunk_size rows at a time,
+    yielding encoded results as each chunk completes. Rows that fail to parse
+    or validate produce an error result instead of aborting the stream, as do
+    rows predict_fn returns an error message (a str) for instead of a price.
+    """
+    if fmt == 'csv':
+        yield "id,predicted_price,error\n"
+
+    chunk = []
+    async for item in iter_records(iter_lines(chunks), fmt):
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield _encode(await _score_chunk(chunk, predict_fn), fmt)
+            chunk = []
+    if chunk:
+        yield _encode(await _score_chunk(chunk, predict_fn), fmt)
@@ -3,6 +3,12 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 import logging
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from sketches import ModeCounter, QuantileSketch
+from storage import TableWriter, find_input_file, stage_output_path, read_chunks, read_table
 
 # Set up logging
 logging.basicConfig(
@@ -12,9 +18,9 @@ logging.basicConfig(
 logger = logging.getLogger('data-processor')
 
 def load_data(file_path):
-    """Load data from a CSV file."""
+    """Load data from a CSV, Parquet or Arrow IPC file."""
     logger.info(f"Loading data from {file_path}")
-    return pd.read_csv(file_path)
+    return read_table(file_path)
 
 def clean_data(df):
     """Clean the dataset by handling missing values and outliers."""
@@ -60,11 +66,119 @@ def clean_data(df):
     
     return df_cleaned
 
-def process_data(input_file, output_file):
-    """Full data processing pipeline."""
+def collect_statistics(input_file, chunk_size, sketch_capacity=200000):
+    """
+    First streaming pass: per-column missing counts, median/mode fill values and
+    price IQR bounds, computed chunk by chunk with bounded-memory sketches.
+    Matches clean_data exactly while each numeric column has at most
+    sketch_capacity values; beyond that medians and quantiles are approximate.
+    """
+    logger.info(f"Collecting statistics from {input_file}")
+    missing = {}
+    numeric = {}
+    sketches = {}
+    modes = {}
+    rows = 0
+    for chunk in read_chunks(input_file, chunk_size):
+        rows += len(chunk)
+        for column in chunk.columns:
+            values = chunk[column]
+            missing[column] = missing.get(column, 0) + int(values.isnull().sum())
+            if values.isnull().all():
+                continue  # An all-missing chunk says nothing about the column's type
+            if pd.api.types.is_numeric_dtype(values):
+                if numeric.get(column) is False:
+                    logger.warning(f"Column {column} mixes numeric and non-numeric chunks; its mode is approximate")
+                    continue
+                numeric[column] = True
+                sketches.setdefault(column, QuantileSketch(sketch_capacity)).update(values.to_numpy())
+            else:
+                if numeric.get(column):
+                    logger.warning(f"Column {column} mixes numeric and non-numeric chunks; its mode is approximate")
+                numeric[column] = False
+                modes.setdefault(column, ModeCounter()).update(values)
+
+    fill_values = {}
+    for column, missing_count in missing.items():
+        if missing_count > 0:
+            logger.info(f"Found {missing_count} missing values in {column}")
+            if numeric.get(column, True):
+                sketch = sketches.get(column)
+                fill_values[column] = sketch.median() if sketch is not None else np.nan
+                logger.info(f"Filling missing values in {column} with median: {fill_values[column]}")
+            else:
+                fill_values[column] = modes[column].mode()
+                logger.info(f"Filling missing values in {column} with mode: {fill_values[column]}")
+
+    # Price quantiles are taken after imputation, so count the filled-in medians too
+    price_sketch = sketches.get('price', QuantileSketch(sketch_capacity))
+    remaining = missing.get('price', 0)
+    while remaining > 0:
+        block = min(remaining, chunk_size)
+        price_sketch.update(np.full(block, fill_values['price']))
+        remaining -= block
+
+    Q1 = price_sketch.quantile(0.25)
+    Q3 = price_sketch.quantile(0.75)
+    IQR = Q3 - Q1
+    stats = {
+        'rows': rows,
+        'fill_values': fill_values,
+        # Columns that had missing values are float in the in-memory path; keep every chunk consistent
+        'float_columns': [c for c, m in missing.items() if m > 0 and numeric.get(c, True)],
+        'lower_bound': Q1 - 1.5 * IQR,
+        'upper_bound': Q3 + 1.5 * IQR,
+        'exact': all(sketch.exact for sketch in sketches.values()),
+    }
+    logger.info(f"Price bounds: [{stats['lower_bound']}, {stats['upper_bound']}] "
+                f"({'exact' if stats['exact'] else 'approximate'} quantiles over {rows} rows)")
+    return stats
+
+def cleaned_metadata(input_file):
+    """Schema metadata recorded with the cleaned dataset."""
+    return {"stage": "cleaned", "source": os.path.basename(input_file), "target": "price"}
+
+def clean_data_streaming(input_file, output_file, chunk_size=100000, sketch_capacity=200000):
+    """
+    Clean a file of any size in two passes with memory bounded by chunk_size and
+    sketch_capacity: collect_statistics, then impute, drop price outliers and
+    append each chunk to output_file.
+    """
+    stats = collect_statistics(input_file, chunk_size, sketch_capacity)
+
+    logger.info("Cleaning dataset in chunks")
+    rows_written = 0
+    outliers = 0
+    with TableWriter(output_file, cleaned_metadata(input_file)) as writer:
+        for chunk in read_chunks(input_file, chunk_size):
+            for column in stats['float_columns']:
+                chunk[column] = chunk[column].astype(float)
+            chunk = chunk.fillna(stats['fill_values'])
+            keep = (chunk['price'] >= stats['lower_bound']) & (chunk['price'] <= stats['upper_bound'])
+            outliers += int((~keep).sum())
+            chunk = chunk[keep]
+            writer.write(chunk)
+            rows_written += len(chunk)
+
+    if outliers:
+        logger.info(f"Found {outliers} outliers in price column")
+    logger.info(f"Removed outliers. New dataset rows: {rows_written}")
+    return stats
+
+def process_data(input_file, output_file, chunk_size=None, sketch_capacity=200000):
+    """
+    Full data processing pipeline. With chunk_size set, the file is cleaned in a
+    streaming pass that never holds the whole dataset in memory, and the cleaning
+    statistics are returned instead of the cleaned frame.
+    """
     # Create output directory if it doesn't exist
     output_path = Path(output_file).parent
     output_path.mkdir(parents=True, exist_ok=True)
+
+    if chunk_size:
+        stats = clean_data_streaming(input_file, output_file, chunk_size, sketch_capacity)
+        logger.info(f"Saved processed data to {output_file}")
+        return stats
     
     # Load data
     df = load_data(input_file)
@@ -74,26 +188,36 @@ def process_data(input_file, output_file):
     df_cleaned = clean_data(df)
     
     # Save processed data
-    df_cleaned.to_csv(output_file, index=False)
+    with TableWriter(output_file, cleaned_metadata(input_file)) as writer:
+        writer.write(df_cleaned)
     logger.info(f"Saved processed data to {output_file}")
     
     return df_cleaned
 
 if __name__ == "__main__":
-    import os
-    import sys
-    
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Clean raw house data")
+    parser.add_argument("--input", help="Input .csv/.parquet/.arrow (default: first data file in the SageMaker input directory)")
+    parser.add_argument("--output", help="Output .csv/.parquet/.arrow (default: SageMaker output directory, "
+                                         "in the PIPELINE_DATA_FORMAT format)")
+    parser.add_argument("--chunk-size", type=int, default=int(os.getenv("PROCESSING_CHUNK_SIZE", "100000")),
+                        help="Rows per chunk for streaming cleaning; 0 loads the whole file into memory")
+    parser.add_argument("--sketch-capacity", type=int, default=200000,
+                        help="Values per column held exactly before quantiles become approximate")
+    args = parser.parse_args()
+
     # SageMaker paths
     input_path = "/opt/ml/processing/input"
     output_path = "/opt/ml/processing/output"
     
-    # Find CSV file in input directory
-    input_files = [f for f in os.listdir(input_path) if f.endswith('.csv')]
-    if not input_files:
-        print("No CSV files found in input directory")
-        sys.exit(1)
-    
-    input_file = os.path.join(input_path, input_files[0])
-    output_file = os.path.join(output_path, "cleaned_house_data.csv")
+    input_file = args.input
+    if input_file is None:
+        # Find data file in input directory
+        input_file = find_input_file(input_path)
+        if input_file is None:
+            print("No data files found in input directory")
+            sys.exit(1)
+    output_file = args.output or stage_output_path(output_path, "cleaned_house_data")
     
-    process_data(input_file, output_file)
+    process_data(input_file, output_file, chunk_size=args.chunk_size, sketch_capacity=args.sketch_capacity)
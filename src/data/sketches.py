@@ -0,0 +1,104 @@
+# src/data/sketches.py
+import numpy as np
+from collections import Counter
+
+
+class QuantileSketch:
+    """
+    Bounded-memory quantile sketch for a stream of numbers (KLL-style).
+
+    Values are buffered as-is until more than `capacity` have been seen, so
+    quantiles are exact (and interpolated like pandas) on small inputs. Past
+    that, full levels are sorted and compacted by keeping every other item at
+    double the weight, which bounds memory at roughly 3 * capacity values
+    regardless of stream length. The rank error is about 1/capacity.
+    """
+
+    def __init__(self, capacity=200000, seed=0):
+        self.capacity = capacity
+        self.count = 0
+        self._levels = [[]]  # level h holds arrays of items with weight 2**h
+        self._sizes = [0]
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def exact(self):
+        """Whether every value seen is still held, i.e. quantiles are exact."""
+        return len(self._levels) == 1
+
+    def _level_capacity(self, level):
+        depth = len(self._levels) - 1 - level
+        return max(2, int(np.ceil(self.capacity * (2 / 3) ** depth)))
+
+    def update(self, values):
+        """Add an array of values; NaNs are ignored."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self._levels[0].append(values)
+        self._sizes[0] += len(values)
+        self._compress()
+
+    def _compress(self):
+        level = 0
+        while level < len(self._levels):
+            if self._sizes[level] <= self._level_capacity(level):
+                level += 1
+                continue
+            if level + 1 == len(self._levels):
+                self._levels.append([])
+                self._sizes.append(0)
+            items = np.sort(np.concatenate(self._levels[level]))
+            # An odd item out stays behind so the total weight is preserved
+            leftover = items[-1:] if len(items) % 2 else items[:0]
+            items = items[:len(items) - len(leftover)]
+            promoted = items[self._rng.integers(2)::2]
+            self._levels[level] = [leftover]
+            self._sizes[level] = len(leftover)
+            self._levels[level + 1].append(promoted)
+            self._sizes[level + 1] += len(promoted)
+            # Adding a level shrinks the capacity of the ones below it, so start over
+            level = 0
+
+    def quantile(self, q):
+        """Value at quantile q (0 <= q <= 1), or NaN if no values were seen."""
+        if self.count == 0:
+            return np.nan
+        if self.exact:
+            return float(np.quantile(np.concatenate(self._levels[0]), q))
+
+        items = np.concatenate([np.concatenate(level) for level in self._levels])
+        weights = np.concatenate([
+            np.full(size, 2.0 ** h) for h, size in enumerate(self._sizes)
+        ])
+        order = np.argsort(items, kind='stable')
+        items, weights = items[order], weights[order]
+        # Place each item at the midpoint of the rank range it stands for
+        ranks = np.cumsum(weights) - weights / 2
+        return float(np.interp(q * weights.sum(), ranks, items))
+
+    def median(self):
+        return self.quantile(0.5)
+
+
+class ModeCounter:
+    """
+    Value counts for a categorical stream. Memory grows with the number of
+    distinct values, not the number of rows.
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def update(self, values):
+        """Add a pandas Series of values; NaNs are ignored."""
+        self.counts.update(values.value_counts(dropna=True).to_dict())
+
+    def mode(self):
+        """Most frequent value; ties go to the smallest value, like pandas' mode()[0]."""
+        if not self.counts:
+            return None
+        top = max(self.counts.values())
+        return min(value for value, count in self.counts.items() if count == top)
@@ -0,0 +1,246 @@
+# src/data/stage_cache.py
+"""
+Content-addressed cache of pipeline stage outputs.
+
+A stage's key hashes everything its outputs depend on: the contents of its
+input files, the source of its script and every repository module it
+imports, its arguments and environment, and the versions of the libraries
+that do the work. Equal keys mean equal outputs, so a hit restores the cached
+files instead of running the stage. Because the keys hash contents rather than
+run IDs, a stage that reruns but writes byte-identical outputs still lets the
+stages after it hit.
+"""
+import ast
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from importlib import metadata
+
+logger = logging.getLogger('stage-cache')
+
+# Libraries whose version can change a stage's outputs
+KEY_PACKAGES = ('numpy', 'pandas', 'pyarrow', 'scikit-learn', 'scipy', 'xgboost')
+
+
+def hash_file(path, digest=None, chunk_size=1 << 20):
+    """sha256 of a file's contents, or feed them into digest."""
+    own = digest is None
+    digest = digest or hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest() if own else None
+
+
+def hash_tree(path):
+    """sha256 over the relative paths and contents of a file or every file under a directory."""
+    digest = hashlib.sha256()
+    for relative, full in _walk(path):
+        digest.update(relative.encode() + b'\0')
+        hash_file(full, digest)
+    return digest.hexdigest()
+
+
+def _walk(path):
+    if os.path.isfile(path):
+        yield os.path.basename(path), path
+        return
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            full = os.path.join(root, name)
+            yield os.path.relpath(full, path), full
+
+
+def code_closure(script, search_path):
+    """
+    The script plus every module it imports, directly or not, that resolves to
+    a file in search_path (the directories the stage adds to sys.path).
+    Third-party modules are covered by KEY_PACKAGES instead.
+    """
+    seen, pending = [], [os.path.abspath(script)]
+    while pending:
+        path = pending.pop()
+        if path in seen:
+            continue
+        seen.append(path)
+        with open(path) as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                for directory in search_path:
+                    candidate = os.path.abspath(os.path.join(directory, *name.split('.')) + '.py')
+                    if os.path.isfile(candidate):
+                        pending.append(candidate)
+                        break
+    return sorted(seen)
+
+
+def stage_key(stage, inputs, code_files, params):
+    """Cache key of a stage run, plus the parts it was built from (recorded in the manifest)."""
+    parts = {
+        'stage': stage,
+        'inputs': {name: hash_tree(path) for name, path in sorted(inputs.items())},
+        'code': {os.path.basename(path): hash_file(path) for path in code_files},
+        'params': params,
+        'packages': {name: _package_version(name) for name in KEY_PACKAGES},
+    }
+    key = hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+    return key, parts
+
+
+def _package_version(name):
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+class LocalCacheBackend:
+    """
+    Entries under {root}/{key[:2]}/{key}/: the stage's output files plus a
+    manifest.json. Entries are written to a temporary directory and renamed
+    into place, so concurrent writers and interrupted runs never leave a
+    partial entry behind.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _entry(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key, output_dir):
+        """Copy the entry's files into output_dir and return its manifest, or None on a miss."""
+        entry = self._entry(key)
+        manifest_file = os.path.join(entry, 'manifest.json')
+        if not os.path.isfile(manifest_file):
+            return None
+        with open(manifest_file) as f:
+            manifest = json.load(f)
+        files_dir = os.path.join(entry, 'files')
+        for relative, full in _walk(files_dir):
+            destination = os.path.join(output_dir, relative)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            shutil.copy2(full, destination)
+        os.utime(manifest_file)  # Last use, for prune()
+        return manifest
+
+    def put(self, key, output_dir, manifest):
+        entry = self._entry(key)
+        if os.path.isdir(entry):
+            return
+        tmp_entry = os.path.join(self.root, 'tmp', uuid.uuid4().hex)
+        shutil.copytree(output_dir, os.path.join(tmp_entry, 'files'))
+        with open(os.path.join(tmp_entry, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        try:
+            os.rename(tmp_entry, entry)
+        except OSError:
+            shutil.rmtree(tmp_entry, ignore_errors=True)  # Another writer stored the same key first
+
+    def prune(self, max_bytes):
+        """Delete least recently used entries until the cache holds at most max_bytes; returns entries deleted."""
+        entries = []
+        for prefix in os.listdir(self.root) if os.path.isdir(self.root) else []:
+            if prefix == 'tmp':
+                continue
+            for key in os.listdir(os.path.join(self.root, prefix)):
+                entry = os.path.join(self.root, prefix, key)
+                size = sum(os.path.getsize(full) for _, full in _walk(entry))
+                entries.append((os.path.getmtime(os.path.join(entry, 'manifest.json')), size, entry))
+        total = sum(size for _, size, _ in entries)
+        deleted = 0
+        for _, size, entry in sorted(entries):
+            if total <= max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            deleted += 1
+        return deleted
+
+
+# Backends by URI scheme; register others (e.g. an object store) with register_backend
+BACKENDS = {'file': LocalCacheBackend}
+
+
+def register_backend(scheme, backend_class):
+    BACKENDS[scheme] = backend_class
+
+
+def open_cache(uri):
+    """Cache backend for a URI: a plain path or file:// is a LocalCacheBackend."""
+    scheme, separator, location = uri.partition('://')
+    if not separator:
+        scheme, location = 'file', uri
+    if scheme not in BACKENDS:
+        raise ValueError(f"No stage cache backend for '{scheme}://' (known: {', '.join(sorted(BACKENDS))})")
+    return BACKENDS[scheme](location)
+
+
+class StageCache:
+    """Runs pipeline stages through a cache backend and keeps per-stage statistics."""
+
+    def __init__(self, backend, enabled=True):
+        self.backend = backend
+        self.enabled = enabled
+        self.stats = []
+
+    def run(self, stage, run, inputs, output_dir, code_files, params, cacheable=True):
+        """
+        Restore output_dir from the cache, or clear it, call run() and store
+        what it wrote. Returns the stage's statistics entry.
+        """
+        start = time.perf_counter()
+        key, parts = stage_key(stage, inputs, code_files, params)
+        stats = {'stage': stage, 'key': key[:16]}
+
+        if os.path.isdir(output_dir):
+            shutil.rmtree(output_dir)
+        os.makedirs(output_dir)
+
+        manifest = self.backend.get(key, output_dir) if self.enabled and cacheable else None
+        if manifest is not None:
+            stats.update(
+                result='hit',
+                seconds=round(time.perf_counter() - start, 3),
+                saved_seconds=manifest['run_seconds'],
+                files=len(manifest['files']),
+                bytes=sum(manifest['files'].values()),
+            )
+        else:
+            run_start = time.perf_counter()
+            run()
+            run_seconds = round(time.perf_counter() - run_start, 3)
+            files = {relative: os.path.getsize(full) for relative, full in _walk(output_dir)}
+            if self.enabled and cacheable:
+                self.backend.put(key, output_dir, {'stage': stage, 'key': key, 'parts': parts,
+                                                   'run_seconds': run_seconds, 'files': files})
+            stats.update(
+                result='miss' if self.enabled and cacheable else 'uncached',
+                seconds=round(time.perf_counter() - start, 3),
+                run_seconds=run_seconds,
+                files=len(files),
+                bytes=sum(files.values()),
+            )
+
+        if stats['result'] == 'hit':
+            logger.info(f"{stage}: cache hit {stats['key']}, restored {stats['files']} files "
+                        f"({stats['bytes'] / 1e6:.1f} MB) in {stats['seconds']:.2f}s, "
+                        f"skipped {stats['saved_seconds']:.1f}s of work")
+        else:
+            logger.info(f"{stage}: cache {stats['result']} {stats['key']}, ran in {stats['run_seconds']:.1f}s, "
+                        f"{stats['files']} files ({stats['bytes'] / 1e6:.1f} MB)")
+        self.stats.append(stats)
+        return stats
@@ -0,0 +1,201 @@
+# src/data/storage.py
+import json
+import os
+import pandas as pd
+
+# Schema metadata key under which pipeline stages record what a file holds
+METADATA_KEY = b'house_price'
+
+FORMATS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.ipc': 'arrow',
+    '.npz': 'sparse',
+}
+
+# Extension used for a stage's output in each format (see PIPELINE_DATA_FORMAT)
+EXTENSIONS = {'csv': '.csv', 'parquet': '.parquet', 'arrow': '.arrow', 'sparse': '.npz'}
+
+
+def table_format(path):
+    """'csv', 'parquet', 'arrow' (IPC file) or 'sparse' (CSR .npz), from the file extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Unsupported data file extension: {path}")
+    return FORMATS[extension]
+
+
+def stage_output_path(directory, stem, fmt=None):
+    """Output path for a stage: stem plus the extension of fmt (default PIPELINE_DATA_FORMAT or csv)."""
+    fmt = fmt or os.getenv('PIPELINE_DATA_FORMAT', 'csv')
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"Unsupported data format: {fmt}")
+    return os.path.join(directory, stem + EXTENSIONS[fmt])
+
+
+def find_input_file(directory):
+    """
+    First data file in a directory, preferring sparse .npz, then Parquet, then
+    Arrow IPC, then CSV; None if there is none.
+    """
+    files = sorted(f for f in os.listdir(directory) if os.path.splitext(f)[1].lower() in FORMATS)
+    for fmt in ('sparse', 'parquet', 'arrow', 'csv'):
+        for f in files:
+            if table_format(f) == fmt:
+                return os.path.join(directory, f)
+    return None
+
+
+def read_arrow(path, columns=None):
+    """Read a Parquet or Arrow IPC file as a pyarrow Table (IPC files are memory-mapped)."""
+    import pyarrow as pa
+    fmt = table_format(path)
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.read_table(path, columns=columns)
+    if fmt == 'arrow':
+        with pa.memory_map(path) as source:
+            table = pa.ipc.open_file(source).read_all()
+        return table.select(columns) if columns else table
+    return pa.Table.from_pandas(pd.read_csv(path, usecols=columns), preserve_index=False)
+
+
+def read_table(path, columns=None):
+    """Read a CSV, Parquet or Arrow IPC file into a DataFrame."""
+    fmt = table_format(path)
+    if fmt == 'csv':
+        return pd.read_csv(path, usecols=columns)
+    if fmt == 'sparse':
+        raise ValueError(f"{path} holds a sparse feature matrix; use read_sparse")
+    return read_arrow(path, columns).to_pandas()
+
+
+def read_chunks(path, chunk_size):
+    """Yield DataFrame chunks of at most chunk_size rows."""
+    fmt = table_format(path)
+    if fmt == 'csv':
+        yield from pd.read_csv(path, chunksize=chunk_size)
+    elif fmt == 'parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        for batch in read_arrow(path).to_batches(max_chunksize=chunk_size):
+            yield batch.to_pandas()
+
+
+def read_metadata(path):
+    """Pipeline metadata stored in a Parquet/Arrow file's schema ({} for CSV or if absent)."""
+    if table_format(path) == 'csv':
+        return {}
+    if table_format(path) == 'sparse':
+        return read_sparse(path)[3]
+    if table_format(path) == 'parquet':
+        import pyarrow.parquet as pq
+        schema = pq.read_schema(path)
+    else:
+        import pyarrow as pa
+        with pa.memory_map(path) as source:
+            schema = pa.ipc.open_file(source).schema
+    raw = (schema.metadata or {}).get(METADATA_KEY)
+    return json.loads(raw) if raw else {}
+
+
+class TableWriter:
+    """
+    Write DataFrame chunks to a CSV, Parquet or Arrow IPC file. Every chunk is
+    cast to the first chunk's schema; metadata is stored in the file's schema
+    (ignored for CSV).
+    """
+
+    def __init__(self, path, metadata=None):
+        self.path = path
+        self.format = table_format(path)
+        self.metadata = metadata
+        self._writer = None
+        self._schema = None
+        self._header_written = False
+
+    def write(self, df):
+        if self.format == 'csv':
+            df.to_csv(self.path, mode='a' if self._header_written else 'w',
+                      header=not self._header_written, index=False)
+            self._header_written = True
+            return
+
+        import pyarrow as pa
+        table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+        if self._writer is None:
+            schema = table.schema.remove_metadata()
+            if self.metadata:
+                schema = schema.with_metadata({METADATA_KEY: json.dumps(self.metadata)})
+            self._schema = schema
+            table = table.replace_schema_metadata(schema.metadata)
+            if self.format == 'parquet':
+                import pyarrow.parquet as pq
+                self._writer = pq.ParquetWriter(self.path, schema)
+            else:
+                self._writer = pa.ipc.new_file(self.path, schema)
+        else:
+            table = table.replace_schema_metadata(self._schema.metadata)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_table(df, path, metadata=None):
+    """Write a DataFrame to a CSV, Parquet or Arrow IPC file, chosen by extension."""
+    with TableWriter(path, metadata) as writer:
+        writer.write(df)
+
+
+def write_sparse(path, X, y=None, feature_names=None, metadata=None):
+    """
+    Save a scipy sparse feature matrix as CSR in an .npz file, together with the
+    target, the feature names and pipeline metadata.
+    """
+    import numpy as np
+    X = X.tocsr()
+    arrays = {
+        'data': X.data,
+        'indices': X.indices,
+        'indptr': X.indptr,
+        'shape': np.asarray(X.shape),
+        'feature_names': np.asarray(feature_names if feature_names is not None else [], dtype=str),
+        'metadata': np.asarray(json.dumps(metadata or {})),
+    }
+    if y is not None:
+        arrays['target'] = np.asarray(y)
+    with open(path, 'wb') as f:
+        np.savez(f, **arrays)
+
+
+def read_sparse(path):
+    """(X as CSR, target or None, feature names, metadata) from a write_sparse file."""
+    import numpy as np
+    from scipy import sparse
+    with np.load(path) as npz:
+        X = sparse.csr_matrix((npz['data'], npz['indices'], npz['indptr']), shape=tuple(npz['shape']))
+        y = npz['target'] if 'target' in npz.files else None
+        return X, y, list(npz['feature_names']), json.loads(str(npz['metadata']))
+
+
+def take_rows(X, rows):
+    """Rows of a DataFrame, Arrow table or CSR matrix by position."""
+    if isinstance(X, pd.DataFrame):
+        return X.iloc[rows]
+    if hasattr(X, 'take'):
+        return X.take(rows)
+    return X[rows]
@@ -1,13 +1,20 @@
 # src/features/engineer.py
 import pandas as pd
 import numpy as np
-from datetime import datetime
 import logging
 from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import OneHotEncoder
 from sklearn.pipeline import Pipeline
 from sklearn.impute import SimpleImputer
+import hashlib
 import joblib
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data'))
+from storage import find_input_file, read_table, stage_output_path, table_format, write_sparse, write_table
+from feature_kernel import DERIVED_FEATURES, build_feature_frame, imputer_fill_values
 
 # Set up logging
 logging.basicConfig(
@@ -17,34 +24,26 @@ logging.basicConfig(
 logger = logging.getLogger('feature-engineering')
 
 def create_features(df):
-    """Create new features from existing data."""
+    """
+    Create new features from existing data: house_age, price_per_sqft and
+    bed_bath_ratio as float32, with location/condition as categories.
+    """
     logger.info("Creating new features")
     
-    # Make a copy to avoid modifying the original dataframe
-    df_featured = df.copy()
-    
-    # Calculate house age
-    current_year = datetime.now().year
-    df_featured['house_age'] = current_year - df_featured['year_built']
-    logger.info("Created 'house_age' feature")
-    
-    # Price per square foot
-    df_featured['price_per_sqft'] = df_featured['price'] / df_featured['sqft']
-    logger.info("Created 'price_per_sqft' feature")
-    
-    # Bedroom to bathroom ratio
-    df_featured['bed_bath_ratio'] = df_featured['bedrooms'] / df_featured['bathrooms']
-    # Handle division by zero
-    df_featured['bed_bath_ratio'] = df_featured['bed_bath_ratio'].replace([np.inf, -np.inf], np.nan)
-    df_featured['bed_bath_ratio'] = df_featured['bed_bath_ratio'].fillna(0)
-    logger.info("Created 'bed_bath_ratio' feature")
+    # Single pass per derived column into preallocated float32 arrays; no copy of df
+    df_featured = build_feature_frame(df)
+    logger.info(f"Created {', '.join(DERIVED_FEATURES)} features "
+                f"({df_featured.memory_usage(deep=False).sum() / 1e6:.1f} MB)")
     
     # Do NOT one-hot encode categorical variables here; let the preprocessor handle it
     return df_featured
 
-def create_preprocessor():
-    """Create a preprocessing pipeline."""
-    logger.info("Creating preprocessor pipeline")
+def create_preprocessor(sparse=False):
+    """
+    Create a preprocessing pipeline. With sparse=True the one-hot output is kept
+    as a CSR matrix instead of being densified, for high-cardinality locations.
+    """
+    logger.info(f"Creating {'sparse' if sparse else 'dense'} preprocessor pipeline")
     
     # Define feature groups
     categorical_features = ['location', 'condition']
@@ -60,62 +59,240 @@ def create_preprocessor():
         ('onehot', OneHotEncoder(handle_unknown='ignore'))
     ])
     
-    # Combine preprocessors in a column transformer
+    # Combine preprocessors in a column transformer; the threshold pins the output
+    # layout instead of letting it flip with the data's density
     preprocessor = ColumnTransformer(
         transformers=[
             ('num', numerical_transformer, numerical_features),
             ('cat', categorical_transformer, categorical_features)
-        ]
+        ],
+        sparse_threshold=1.0 if sparse else 0.0
     )
     
     return preprocessor
 
-def run_feature_engineering(input_file, output_file, preprocessor_file):
-    """Full feature engineering pipeline."""
+def rows_digest(X):
+    """Short sha256 of feature rows' contents, to check that fitted rows were not dropped, moved or rewritten."""
+    row_hashes = pd.util.hash_pandas_object(X, index=False).to_numpy()
+    return hashlib.sha256(row_hashes.tobytes()).hexdigest()[:16]
+
+def export_preprocessor_spec(preprocessor, spec_file, rows_fitted=None, statistics_counts=None, fitted_digest=None):
+    """
+    Save a fitted preprocessor as a compact array-based spec: a JSON layout plus
+    a .npy vector of imputer statistics that the API memory-maps at startup.
+    rows_fitted, fitted_digest (rows_digest of those rows) and statistics_counts
+    (non-missing values behind each mean) let refresh_preprocessor update the
+    statistics later without refitting.
+    """
+    spec = {
+        "format": "house-price-preprocessor/v1",
+        "sparse_output": bool(getattr(preprocessor, 'sparse_output_', False)),
+        "numerical_features": [],
+        "categorical_features": [],
+        "categories": [],
+    }
+    if rows_fitted is not None:
+        spec["rows_fitted"] = int(rows_fitted)
+        spec["statistics_counts"] = [int(count) for count in statistics_counts]
+        spec["fitted_digest"] = fitted_digest
+    statistics = []
+
+    for name, transformer, columns in preprocessor.transformers_:
+        if name == 'num':
+            spec["numerical_features"] = list(columns)
+            # The values sklearn actually fills in, so the compiled plan matches it bit for bit
+            statistics = imputer_fill_values(transformer.named_steps['imputer'])
+        elif name == 'cat':
+            spec["categorical_features"] = list(columns)
+            spec["categories"] = [categories.tolist() for categories in transformer.named_steps['onehot'].categories_]
+
+    statistics_file = os.path.splitext(spec_file)[0] + ".npy"
+    spec["statistics_file"] = os.path.basename(statistics_file)
+    np.save(statistics_file, np.asarray(statistics, dtype=np.float64))
+    with open(spec_file, 'w') as f:
+        json.dump(spec, f, indent=2)
+    logger.info(f"Saved preprocessor spec to {spec_file}")
+
+# Raw request features whose live distribution the API compares against training (src/api/drift.py)
+PROFILE_NUMERICAL_FEATURES = ['sqft', 'bedrooms', 'bathrooms', 'year_built']
+PROFILE_CATEGORICAL_FEATURES = ['location', 'condition']
+
+def export_reference_profile(X, profile_file, bins=10):
+    """
+    Save the training distribution of the raw request features for drift
+    monitoring: quantile bin edges and the share of rows in each bin for
+    numerical features (binned like population_stability_index in
+    src/models/incremental.py), and the share of each category for
+    categorical ones.
+    """
+    profile = {
+        "format": "house-price-reference-profile/v1",
+        "rows": int(len(X)),
+        "numerical": {},
+        "categorical": {},
+    }
+    for column in PROFILE_NUMERICAL_FEATURES:
+        values = X[column].to_numpy(dtype=np.float64)
+        values = values[~np.isnan(values)]
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1))[1:-1])
+        counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+        profile["numerical"][column] = {"edges": edges.tolist(), "shares": (counts / len(values)).tolist()}
+    for column in PROFILE_CATEGORICAL_FEATURES:
+        shares = X[column].dropna().astype(str).value_counts(normalize=True)
+        profile["categorical"][column] = {"categories": shares.index.tolist(), "shares": shares.tolist()}
+
+    with open(profile_file, 'w') as f:
+        json.dump(profile, f, indent=2)
+    logger.info(f"Saved reference profile of {len(X)} rows to {profile_file}")
+
+def refresh_preprocessor(preprocessor_file, X):
+    """
+    Load the previous fitted preprocessor and fold the rows appended since it
+    was fitted into its imputer means, keeping its one-hot categories, so the
+    feature layout the previous model was trained on does not change.
+    Returns (preprocessor, statistics counts), or (None, reason) when it has
+    to be refit: the spec lacks counts, the rows it was fitted on are no longer
+    an unchanged prefix of X, or the new rows contain categories it has never
+    seen. Processing filters outliers and imputes over the whole dataset, so
+    new data can drop, shift or rewrite earlier rows as well as append.
+    """
+    spec_file = os.path.join(os.path.dirname(preprocessor_file), "preprocessor_spec.json")
+    if not os.path.exists(spec_file):
+        return None, "no preprocessor spec next to the previous preprocessor"
+    with open(spec_file) as f:
+        spec = json.load(f)
+    rows_fitted = spec.get("rows_fitted")
+    if rows_fitted is None:
+        return None, "previous preprocessor spec has no statistics counts"
+    if len(X) < rows_fitted:
+        return None, f"data has {len(X)} rows, fewer than the {rows_fitted} the preprocessor was fitted on"
+    if spec.get("fitted_digest") is None:
+        return None, "previous preprocessor spec has no digest of its fitted rows"
+    if rows_digest(X.iloc[:rows_fitted]) != spec["fitted_digest"]:
+        return None, f"the first {rows_fitted} rows are not the rows the preprocessor was fitted on"
+
+    preprocessor = joblib.load(preprocessor_file)
+    new_rows = X.iloc[rows_fitted:]
+    for column, categories in zip(spec["categorical_features"], spec["categories"]):
+        unseen = set(new_rows[column].dropna().unique()) - set(categories)
+        if unseen:
+            return None, f"unseen {column} categories: {sorted(unseen)[:10]}"
+
+    imputer = preprocessor.named_transformers_['num'].named_steps['imputer']
+    counts = np.asarray(spec["statistics_counts"], dtype=np.float64)
+    new_values = new_rows[spec["numerical_features"]].to_numpy(dtype=np.float64)
+    new_counts = np.sum(~np.isnan(new_values), axis=0)
+    total = counts + new_counts
+    with np.errstate(invalid='ignore', divide='ignore'):
+        statistics = (imputer.statistics_ * counts + np.nansum(new_values, axis=0)) / total
+    imputer.statistics_ = np.where(total > 0, statistics, imputer.statistics_)
+    logger.info(f"Refreshed imputer means with {len(new_rows)} appended rows")
+    return preprocessor, total
+
+def sparse_features_enabled():
+    """Whether the SPARSE_FEATURES environment variable asks for the sparse path."""
+    return os.getenv("SPARSE_FEATURES", "false").lower() == "true"
+
+def run_feature_engineering(input_file, output_file, preprocessor_file, sparse=None, previous_preprocessor=None):
+    """
+    Full feature engineering pipeline. sparse (default: SPARSE_FEATURES) keeps
+    the features as CSR; they are saved as such when output_file is an .npz file
+    and densified otherwise. With previous_preprocessor (default:
+    PREVIOUS_PREPROCESSOR), its statistics are refreshed with the appended rows
+    instead of fitting a new preprocessor, when refresh_preprocessor allows it.
+    """
+    if previous_preprocessor is None:
+        previous_preprocessor = os.getenv("PREVIOUS_PREPROCESSOR") or None
+    if sparse is None:
+        sparse = sparse_features_enabled()
     # Load cleaned data
     logger.info(f"Loading data from {input_file}")
-    df = pd.read_csv(input_file)
+    df = read_table(input_file)
     
     # Create features
     df_featured = create_features(df)
     logger.info(f"Created featured dataset with shape: {df_featured.shape}")
     
-    # Create and fit the preprocessor
-    preprocessor = create_preprocessor()
     X = df_featured.drop(columns=['price'], errors='ignore')  # Features only
     y = df_featured['price'] if 'price' in df_featured.columns else None  # Target column (if available)
-    X_transformed = preprocessor.fit_transform(X)
-    logger.info("Fitted the preprocessor and transformed the features")
+    
+    # Refresh the previous preprocessor, or create and fit a new one
+    preprocessor, refresh = None, None
+    if previous_preprocessor:
+        preprocessor, statistics_counts = refresh_preprocessor(previous_preprocessor, X)
+        if preprocessor is None:
+            refresh = {"mode": "refit", "reason": statistics_counts}
+            logger.warning(f"Refitting the preprocessor: {statistics_counts}")
+        else:
+            refresh = {"mode": "refreshed", "previous": previous_preprocessor}
+            sparse = bool(preprocessor.sparse_output_)  # The previous layout wins
+            X_transformed = preprocessor.transform(X)
+    if preprocessor is None:
+        preprocessor = create_preprocessor(sparse=sparse)
+        X_transformed = preprocessor.fit_transform(X)
+        statistics_counts = X[list(preprocessor.transformers_[0][2])].notna().sum().to_numpy()
+        logger.info("Fitted the preprocessor and transformed the features")
     
     # Save the preprocessor
     joblib.dump(preprocessor, preprocessor_file)
     logger.info(f"Saved preprocessor to {preprocessor_file}")
+    export_preprocessor_spec(preprocessor, os.path.join(os.path.dirname(preprocessor_file), "preprocessor_spec.json"),
+                             rows_fitted=len(X), statistics_counts=statistics_counts, fitted_digest=rows_digest(X))
+    export_reference_profile(X, os.path.join(os.path.dirname(preprocessor_file), "reference_profile.json"))
+    
+    # Save fully preprocessed data with named float32 feature columns
+    # (XGBoost trains on float32, so nothing is lost)
+    feature_names = list(preprocessor.get_feature_names_out())
+    metadata = {
+        "stage": "featured",
+        "feature_names": feature_names,
+        "target": "price" if y is not None else None,
+        "preprocessor": os.path.basename(preprocessor_file),
+    }
+    if refresh is not None:
+        metadata["preprocessor_refresh"] = refresh
+    if sparse and table_format(output_file) == 'sparse':
+        X_transformed = X_transformed.astype(np.float32)
+        write_sparse(output_file, X_transformed, y.values if y is not None else None, feature_names, metadata)
+        logger.info(f"Saved sparse features ({X_transformed.nnz} non-zeros, "
+                    f"{X_transformed.nnz / max(np.prod(X_transformed.shape), 1):.2%} dense) to {output_file}")
+        return X_transformed
+    if sparse:
+        logger.warning(f"{output_file} cannot hold sparse features; densifying")
+        X_transformed = X_transformed.toarray()
     
-    # Save fully preprocessed data
-    df_transformed = pd.DataFrame(X_transformed)
+    df_transformed = pd.DataFrame(np.asarray(X_transformed, dtype=np.float32), columns=feature_names)
     if y is not None:
         df_transformed['price'] = y.values
-    df_transformed.to_csv(output_file, index=False)
+    write_table(df_transformed, output_file, metadata=metadata)
     logger.info(f"Saved fully preprocessed data to {output_file}")
     
     return df_transformed
 
 if __name__ == "__main__":
-    import os
-    import sys
-    
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Create features and fit the preprocessor")
+    parser.add_argument("--input", help="Cleaned data file (default: first data file in the SageMaker input directory)")
+    parser.add_argument("--output", help="Featured data file (default: SageMaker output directory, in the "
+                                         "PIPELINE_DATA_FORMAT format, or .npz with SPARSE_FEATURES)")
+    parser.add_argument("--preprocessor", help="Where to save the fitted preprocessor (default: next to the output)")
+    args = parser.parse_args()
+
     # SageMaker paths
     input_path = "/opt/ml/processing/input"
     output_path = "/opt/ml/processing/output"
     
-    # Find CSV file in input directory
-    input_files = [f for f in os.listdir(input_path) if f.endswith('.csv')]
-    if not input_files:
-        print("No CSV files found in input directory")
-        sys.exit(1)
+    input_file = args.input
+    if input_file is None:
+        # Find data file in input directory
+        input_file = find_input_file(input_path)
+        if input_file is None:
+            print("No data files found in input directory")
+            sys.exit(1)
     
-    input_file = os.path.join(input_path, input_files[0])
-    output_file = os.path.join(output_path, "featured_house_data.csv")
-    preprocessor_file = os.path.join(output_path, "preprocessor.pkl")
+    sparse = sparse_features_enabled()
+    output_file = args.output or stage_output_path(output_path, "featured_house_data", 'sparse' if sparse else None)
+    preprocessor_file = args.preprocessor or os.path.join(os.path.dirname(output_file), "preprocessor.pkl")
     
-    run_feature_engineering(input_file, output_file, preprocessor_file)
+    run_feature_engineering(input_file, output_file, preprocessor_file, sparse=sparse)
@@ -0,0 +1,120 @@
+# src/features/feature_kernel.py
+"""
+Derived features shared by training (engineer.py, batch_score.py) and serving (src/api).
+
+Every derived column is written by a single NumPy ufunc pass straight into its
+preallocated output array, computed at the inputs' precision and rounded once
+on store. XGBoost rounds features to float32 when it builds its matrix, so a
+float32 output gives the model exactly the values a float64 one would.
+"""
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+DERIVED_FEATURES = ('house_age', 'price_per_sqft', 'bed_bath_ratio')
+CATEGORICAL_FEATURES = ('location', 'condition')
+TARGET = 'price'
+
+
+def derive_row(sqft, bedrooms, bathrooms, year_built, price=None, current_year=None):
+    """
+    Scalar version of derive_features for a single house:
+    (house_age, price_per_sqft, bed_bath_ratio). Without a price (at serving
+    time) price_per_sqft is 0.
+    """
+    current_year = current_year or datetime.now().year
+    price_per_sqft = price / sqft if price is not None else 0.0
+    bed_bath_ratio = bedrooms / bathrooms if bathrooms else 0.0
+    if bed_bath_ratio != bed_bath_ratio:  # NaN
+        bed_bath_ratio = 0.0
+    return current_year - year_built, price_per_sqft, bed_bath_ratio
+
+
+def derive_features(sqft, bedrooms, bathrooms, year_built, price=None, current_year=None,
+                    dtype=np.float32) -> dict:
+    """
+    house_age, price_per_sqft and bed_bath_ratio for arrays of houses, each as a
+    new dtype array. Infinite or undefined bed_bath_ratio (no bathrooms) is 0;
+    without a price, price_per_sqft is 0.
+    """
+    current_year = current_year or datetime.now().year
+    n = len(sqft)
+    house_age = np.empty(n, dtype=dtype)
+    price_per_sqft = np.zeros(n, dtype=dtype)
+    bed_bath_ratio = np.empty(n, dtype=dtype)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.subtract(current_year, year_built, out=house_age, casting='unsafe')
+        if price is not None:
+            np.divide(price, sqft, out=price_per_sqft, casting='unsafe')
+        np.divide(bedrooms, bathrooms, out=bed_bath_ratio, casting='unsafe')
+    np.nan_to_num(bed_bath_ratio, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+
+    return {
+        'house_age': house_age,
+        'price_per_sqft': price_per_sqft,
+        'bed_bath_ratio': bed_bath_ratio,
+    }
+
+
+def imputer_fill_values(imputer) -> np.ndarray:
+    """
+    The value a fitted SimpleImputer writes into each column's missing cells,
+    as float64: its statistics_, at the precision it applies them (recent
+    scikit-learn rounds them to the dtype it was fitted on, float32 for frames
+    from build_feature_frame). NaN for columns it drops as all-missing.
+    """
+    statistics = np.asarray(imputer.statistics_, dtype=np.float64)
+    missing = np.full((1, len(statistics)), np.nan)
+    if hasattr(imputer, 'feature_names_in_'):
+        missing = pd.DataFrame(missing, columns=imputer.feature_names_in_)
+    filled = np.asarray(imputer.transform(missing), dtype=np.float64)[0]
+    if len(filled) == len(statistics):
+        return filled
+    values = statistics.copy()
+    values[~np.isnan(statistics)] = filled
+    return values
+
+
+def _downcast_integer(values):
+    """Smallest signed integer type holding every value (pd.to_numeric(downcast=...) without its overhead)."""
+    array = values.to_numpy()
+    if len(array) == 0:
+        return values
+    low, high = array.min(), array.max()
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return pd.Series(array.astype(dtype), index=values.index, name=values.name)
+    return values
+
+
+def build_feature_frame(df, current_year=None, dtype=np.float32, serving=False) -> pd.DataFrame:
+    """
+    Input columns plus derived features, without copying df first: float columns
+    are stored as dtype, integer columns downcast to the smallest type that holds
+    them, location/condition as pandas category and the price target as-is.
+    With serving=True, price_per_sqft is 0 even if df has a price column, as it
+    is for API requests.
+    """
+    price = df[TARGET].to_numpy() if TARGET in df.columns and not serving else None
+    derived = derive_features(
+        df['sqft'].to_numpy(), df['bedrooms'].to_numpy(), df['bathrooms'].to_numpy(),
+        df['year_built'].to_numpy(), price=price, current_year=current_year, dtype=dtype,
+    )
+
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        if column == TARGET:
+            columns[column] = values
+        elif column in CATEGORICAL_FEATURES:
+            columns[column] = values.astype('category')
+        elif pd.api.types.is_float_dtype(values):
+            columns[column] = values.astype(dtype, copy=False)
+        elif pd.api.types.is_integer_dtype(values):
+            columns[column] = _downcast_integer(values)
+        else:
+            columns[column] = values
+    columns.update(derived)
+    return pd.DataFrame(columns, index=df.index, copy=False)
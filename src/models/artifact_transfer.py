@@ -0,0 +1,181 @@
+"""
+S3 transfer layer for model artifacts, used by ModelDeployer.
+
+Uploads go through boto3's multipart transfer manager with the part size and
+concurrency set here, and record the artifact's sha256 as object metadata.
+Downloads fetch byte ranges in parallel, write them in place, and verify the
+sha256 before the file is renamed into place. ArtifactCache keeps verified
+artifacts on local disk, so pods sharing a node (and the cache directory)
+download each artifact once.
+"""
+import fcntl
+import hashlib
+import logging
+import math
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from boto3.s3.transfer import TransferConfig
+
+logger = logging.getLogger(__name__)
+
+# Parts of 16 MiB keep a few-hundred-MB artifact at a few dozen requests, and
+# transfers are network-bound, so they run on more threads than there are cores
+PART_SIZE = 16 * 1024 * 1024
+MAX_CONCURRENCY = 10
+# S3 rejects multipart uploads of more parts than this
+MAX_PARTS = 10000
+SHA256_METADATA = "sha256"
+
+
+class ChecksumMismatch(Exception):
+    """A downloaded artifact does not match the sha256 recorded at upload."""
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def part_size_for(size: int, part_size: int = PART_SIZE) -> int:
+    """part_size, or larger if a file of size bytes would need more than MAX_PARTS parts."""
+    return max(part_size, math.ceil(size / MAX_PARTS))
+
+
+def upload_artifact(s3_client, local_path: str, bucket: str, key: str, part_size: int = PART_SIZE,
+                    max_concurrency: int = MAX_CONCURRENCY) -> str:
+    """Upload local_path (multipart above part_size) with its sha256 as metadata; returns the sha256."""
+    sha256 = file_sha256(local_path)
+    part_size = part_size_for(os.path.getsize(local_path), part_size)
+    config = TransferConfig(multipart_threshold=part_size, multipart_chunksize=part_size,
+                            max_concurrency=max_concurrency, use_threads=True)
+    start = time.perf_counter()
+    s3_client.upload_file(local_path, bucket, key, ExtraArgs={'Metadata': {SHA256_METADATA: sha256}}, Config=config)
+    seconds = time.perf_counter() - start
+    logger.info(f"Uploaded {os.path.getsize(local_path) / 1e6:.1f} MB to s3://{bucket}/{key} in {seconds:.2f}s")
+    return sha256
+
+
+def download_artifact(s3_client, bucket: str, key: str, destination: str, part_size: int = PART_SIZE,
+                      max_concurrency: int = MAX_CONCURRENCY, head: dict = None) -> str:
+    """
+    Download an object with parallel ranged GETs and return its sha256.
+
+    Every range is requested with If-Match on the object's ETag, so an object
+    overwritten mid-download fails instead of mixing two versions. Objects
+    uploaded without sha256 metadata are only checked for size.
+    """
+    head = head or s3_client.head_object(Bucket=bucket, Key=key)
+    size, etag = head['ContentLength'], head['ETag']
+    expected = head.get('Metadata', {}).get(SHA256_METADATA)
+
+    os.makedirs(os.path.dirname(os.path.abspath(destination)), exist_ok=True)
+    tmp_path = f"{destination}.{uuid.uuid4().hex}.part"
+    start = time.perf_counter()
+    try:
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, size)
+
+            def fetch(offset):
+                end = min(offset + part_size, size) - 1
+                body = s3_client.get_object(Bucket=bucket, Key=key, Range=f"bytes={offset}-{end}",
+                                            IfMatch=etag)['Body']
+                position = offset
+                for chunk in body.iter_chunks(1 << 20):
+                    os.pwrite(fd, chunk, position)
+                    position += len(chunk)
+                if position != end + 1:
+                    raise IOError(f"Short read of s3://{bucket}/{key} bytes {offset}-{end}")
+
+            with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+                list(pool.map(fetch, range(0, size, part_size)))
+        finally:
+            os.close(fd)
+
+        sha256 = file_sha256(tmp_path)
+        if expected and sha256 != expected:
+            raise ChecksumMismatch(f"s3://{bucket}/{key}: sha256 {sha256}, expected {expected}")
+        if not expected:
+            logger.warning(f"s3://{bucket}/{key} has no sha256 metadata; only its size was checked")
+        os.replace(tmp_path, destination)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    seconds = time.perf_counter() - start
+    logger.info(f"Downloaded {size / 1e6:.1f} MB from s3://{bucket}/{key} in {seconds:.2f}s "
+                f"({math.ceil(size / part_size) if size else 0} ranges)")
+    return sha256
+
+
+class ArtifactCache:
+    """
+    Verified artifacts on local disk under {root}/{sha256[:2]}/{sha256}.
+
+    Objects are looked up by their sha256 metadata (or bucket, key and ETag
+    when they have none), so an artifact is reused whatever version names
+    it. Downloads of one artifact are serialized with a file lock, so
+    processes sharing root wait for the first download instead of repeating it.
+    """
+
+    def __init__(self, root: str, part_size: int = PART_SIZE, max_concurrency: int = MAX_CONCURRENCY):
+        self.root = root
+        self.part_size = part_size
+        self.max_concurrency = max_concurrency
+
+    def _entry(self, bucket: str, key: str, head: dict) -> str:
+        name = head.get('Metadata', {}).get(SHA256_METADATA)
+        if not name:
+            name = hashlib.sha256(f"{bucket}/{key}/{head['ETag']}".encode()).hexdigest()
+        return os.path.join(self.root, name[:2], name)
+
+    def fetch(self, s3_client, bucket: str, key: str) -> str:
+        """Local path of the object, downloading it on a cache miss."""
+        head = s3_client.head_object(Bucket=bucket, Key=key)
+        entry = self._entry(bucket, key, head)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        with open(f"{entry}.lock", 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if os.path.exists(entry):
+                os.utime(entry)  # Last use, for prune()
+                logger.info(f"Artifact cache hit for s3://{bucket}/{key}")
+            else:
+                download_artifact(s3_client, bucket, key, entry, self.part_size, self.max_concurrency, head)
+        return entry
+
+    def prune(self, max_bytes: int) -> int:
+        """Delete least recently used artifacts until the cache holds at most max_bytes; returns artifacts deleted."""
+        entries = []
+        for prefix in os.listdir(self.root) if os.path.isdir(self.root) else []:
+            for name in os.listdir(os.path.join(self.root, prefix)):
+                path = os.path.join(self.root, prefix, name)
+                if not name.endswith(('.lock', '.part')):
+                    entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+        total = sum(size for _, size, _ in entries)
+        deleted = 0
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            deleted += 1
+        return deleted
+
+
+def link_or_copy(source: str, destination: str):
+    """Hard-link source to destination (copy across file systems), replacing destination."""
+    os.makedirs(os.path.dirname(os.path.abspath(destination)), exist_ok=True)
+    tmp_path = f"{destination}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, destination)
@@ -0,0 +1,155 @@
+"""
+Offline Batch Scoring
+Scores large CSV/Parquet files in chunks across a process pool
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'features'))
+from feature_kernel import build_feature_frame
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Read-only model state, loaded by the pool initializer in each worker process
+_model = None
+_preprocessor = None
+
+
+def load_artifacts(model_path: str, preprocessor_path: str, n_jobs: int = None):
+    """Load the model and preprocessor into this process's globals."""
+    global _model, _preprocessor
+    _model = joblib.load(model_path)
+    _preprocessor = joblib.load(preprocessor_path)
+    if n_jobs is not None:
+        # One inference thread per worker process so workers do not oversubscribe cores
+        _model.set_params(n_jobs=n_jobs)
+
+
+def prepare_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Derive the model's input columns the same way the API does (price_per_sqft is 0)."""
+    return build_feature_frame(df, serving=True)
+
+
+def score_chunk(chunk: pd.DataFrame):
+    """Score one chunk; returns the predictions and the time spent."""
+    start_time = time.perf_counter()
+    processed_features = _preprocessor.transform(prepare_features(chunk))
+    predictions = _model.predict(processed_features)
+    return predictions, time.perf_counter() - start_time
+
+
+def read_chunks(input_file: str, chunk_size: int):
+    """Yield DataFrame chunks from a CSV or Parquet file."""
+    if input_file.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(input_file).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(input_file, chunksize=chunk_size)
+
+
+class ChunkWriter:
+    """Append scored chunks to a CSV or Parquet file in order."""
+
+    def __init__(self, output_file: str):
+        self.output_file = output_file
+        self._parquet_writer = None
+        self._header_written = False
+
+    def write(self, chunk: pd.DataFrame):
+        if self.output_file.endswith('.parquet'):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.output_file, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            chunk.to_csv(self.output_file, mode='a' if self._header_written else 'w',
+                         header=not self._header_written, index=False)
+            self._header_written = True
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+def batch_score(input_file, output_file, model_path, preprocessor_path,
+                chunk_size=100000, workers=None, prediction_column='predicted_price'):
+    """
+    Score input_file chunk by chunk across a process pool and write the input
+    rows with the prediction column appended, in input order.
+    """
+    workers = workers or os.cpu_count() or 1
+    output_dir = os.path.dirname(output_file)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    # Spawn rather than fork, as the API's process executor does: a worker forked from a parent
+    # that has loaded XGBoost inherits its OpenMP state and can deadlock
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                               initializer=load_artifacts, initargs=(model_path, preprocessor_path, 1))
+    logger.info(f"Scoring {input_file} with {workers} workers, {chunk_size} rows per chunk")
+
+    writer = ChunkWriter(output_file)
+    total_rows = 0
+    start_time = time.perf_counter()
+
+    # Keep a bounded window of chunks in flight and write results in submission order
+    pending = deque()
+
+    def write_next():
+        nonlocal total_rows
+        index, chunk, future = pending.popleft()
+        predictions, seconds = future.result()
+        chunk[prediction_column] = predictions
+        writer.write(chunk)
+        total_rows += len(chunk)
+        logger.info(f"Chunk {index}: {len(chunk)} rows in {seconds:.3f}s "
+                    f"({len(chunk) / max(seconds, 1e-9):,.0f} rows/s)")
+
+    try:
+        with pool:
+            for index, chunk in enumerate(read_chunks(input_file, chunk_size)):
+                pending.append((index, chunk, pool.submit(score_chunk, chunk)))
+                if len(pending) >= workers * 2:
+                    write_next()
+            while pending:
+                write_next()
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start_time
+    logger.info(f"Scored {total_rows} rows in {elapsed:.2f}s "
+                f"({total_rows / max(elapsed, 1e-9):,.0f} rows/s) -> {output_file}")
+    return {"rows": total_rows, "seconds": elapsed, "rows_per_second": total_rows / max(elapsed, 1e-9)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a CSV or Parquet file of houses offline")
+    parser.add_argument("input_file", help="Input .csv or .parquet file")
+    parser.add_argument("output_file", help="Output .csv or .parquet file")
+    parser.add_argument("--model", default="models/trained/house_price_model.pkl")
+    parser.add_argument("--preprocessor", default="models/trained/preprocessor.pkl")
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--prediction-column", default="predicted_price")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input_file):
+        logger.error(f"Input file not found: {args.input_file}")
+        sys.exit(1)
+
+    batch_score(args.input_file, args.output_file, args.model, args.preprocessor,
+                chunk_size=args.chunk_size, workers=args.workers,
+                prediction_column=args.prediction_column)
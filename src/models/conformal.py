@@ -0,0 +1,130 @@
+# src/models/conformal.py
+"""
+Split-conformal prediction intervals for train_model.py.
+
+The held-out rows calibrate the intervals. Residuals (actual - predicted) are
+grouped into cells keyed by location and by bin of the predicted price, and
+each cell gets the finite-sample conformal quantiles of its residuals. The
+result is a small lookup table (prediction_intervals.json) that the API turns
+into intervals with one searchsorted per batch, so serving runs one model,
+not three. Cells with too few calibration rows fall back to the
+all-locations row of the same price bin.
+
+With n calibration rows no interval can promise more than (n - 1) / (n + 1)
+coverage, so a cell needs conformal_min_rows(coverage) rows (19 at 90%) for
+its own quantiles; when even all calibration rows together are too few, the
+table records the coverage it can actually promise instead.
+"""
+import json
+import math
+
+import numpy as np
+
+from evaluation import one_hot_codes
+
+INTERVALS_FILE = "prediction_intervals.json"
+LOCATION_PREFIX = "cat__location_"
+
+# Fewest calibration rows for a cell to get its own quantiles
+MIN_CELL_ROWS = 30
+
+
+# Slack for the float rounding of (n + 1) * tail, which is exactly 1 at conformal_min_rows
+RANK_TOLERANCE = 1e-9
+
+
+def conformal_min_rows(coverage):
+    """Fewest calibration residuals whose split-conformal interval reaches the given coverage."""
+    tail = (1 - coverage) / 2
+    return max(math.ceil(1 / tail - 1 - RANK_TOLERANCE), 1) if tail > 0 else math.inf
+
+
+def achievable_coverage(n):
+    """Highest coverage a split-conformal interval can promise from n residuals (their min to max)."""
+    return (n - 1) / (n + 1)
+
+
+def conformal_bounds(sorted_residuals, coverage):
+    """
+    (lower, upper) residual offsets of a split-conformal interval with at
+    least the given coverage, from n sorted calibration residuals; each tail
+    gets half the miscoverage. Raises ValueError when n is below
+    conformal_min_rows(coverage): the interval would have to be unbounded.
+    """
+    n = len(sorted_residuals)
+    if n < conformal_min_rows(coverage):
+        raise ValueError(f"{n} calibration rows cannot give {coverage:.0%} coverage "
+                         f"(at least {conformal_min_rows(coverage)} needed)")
+    tail = (1 - coverage) / 2
+    low = math.floor((n + 1) * tail + RANK_TOLERANCE)
+    high = math.ceil((n + 1) * (1 - tail) - RANK_TOLERANCE)
+    return float(sorted_residuals[low - 1]), float(sorted_residuals[high - 1])
+
+
+def fit_interval_table(y, pred, locations, location_names, coverage=0.9, bins=10):
+    """
+    Interval table from calibration targets, predictions and location codes
+    (-1 for rows without a known location). Offsets are added to a
+    prediction to give its interval. With fewer than
+    conformal_min_rows(coverage) rows, the table is fitted for (and
+    records) achievable_coverage instead. Raises ValueError without rows.
+    """
+    y, pred = np.asarray(y, dtype=np.float64), np.asarray(pred, dtype=np.float64)
+    if len(y) == 0:
+        raise ValueError("No calibration rows to fit prediction intervals on")
+    if len(y) < conformal_min_rows(coverage):
+        coverage = achievable_coverage(len(y))
+    # Cells too small for the coverage fall back, as sparse cells do
+    min_rows = max(MIN_CELL_ROWS, conformal_min_rows(coverage))
+    residuals = y - pred
+    edges = np.unique(np.quantile(pred, np.linspace(0, 1, bins + 1)[1:-1]))
+    price_bins = np.searchsorted(edges, pred, side='right')
+    n_bins = len(edges) + 1
+
+    def cell_bounds(rows):
+        bounds = np.empty((n_bins, 2))
+        fallback = conformal_bounds(np.sort(residuals[rows]), coverage)
+        for b in range(n_bins):
+            cell = np.sort(residuals[rows][price_bins[rows] == b])
+            bounds[b] = conformal_bounds(cell, coverage) if len(cell) >= min_rows else fallback
+        return bounds
+
+    all_rows = np.arange(len(y))
+    overall = cell_bounds(all_rows)
+    groups = {}
+    for code, name in enumerate(location_names):
+        rows = all_rows[locations == code]
+        if len(rows) >= min_rows:
+            bounds = cell_bounds(rows)
+            # Sparse cells of a location fall back to the all-locations cell of their bin
+            counts = np.bincount(price_bins[rows], minlength=n_bins)
+            bounds[counts < min_rows] = overall[counts < min_rows]
+            groups[name] = bounds.tolist()
+
+    return {
+        "coverage": coverage,
+        "calibration_rows": int(len(y)),
+        "price_edges": edges.tolist(),
+        "overall": overall.tolist(),
+        "locations": groups,
+    }
+
+
+def location_codes(X, feature_names):
+    """(codes, names) of the location one-hot columns of a feature matrix."""
+    return one_hot_codes(X, feature_names or [], LOCATION_PREFIX)
+
+
+def interval_coverage(table, y, pred, locations, location_names):
+    """Share of rows whose target falls inside the table's interval (for checking on other rows)."""
+    edges = np.asarray(table["price_edges"])
+    bounds = np.array([table["overall"]] + [table["locations"].get(name, table["overall"]) for name in location_names])
+    price_bins = np.searchsorted(edges, pred, side='right')
+    cell = bounds[np.asarray(locations) + 1, price_bins]
+    residuals = np.asarray(y) - np.asarray(pred)
+    return float(np.mean((residuals >= cell[:, 0]) & (residuals <= cell[:, 1])))
+
+
+def save_interval_table(table, path):
+    with open(path, 'w') as f:
+        json.dump(table, f, indent=2)
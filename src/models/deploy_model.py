@@ -1,50 +1,65 @@
 """
 Model Deployment with Versioning
-Handles S3 upload with proper version management
+Handles S3 upload with proper version management, and the matching download
 """
+import argparse
 import boto3
 import os
 import sys
+import time
 import logging
 from pathlib import Path
 
 # Add parent directory to path for imports
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from version import versioning
+from artifact_transfer import (MAX_CONCURRENCY, PART_SIZE, ArtifactCache, download_artifact, link_or_copy,
+                               upload_artifact)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class ModelDeployer:
-    def __init__(self, bucket_name: str):
+    def __init__(self, bucket_name: str, s3_client=None, part_size: int = PART_SIZE,
+                 max_concurrency: int = MAX_CONCURRENCY, cache_dir: str = None, listing_ttl: float = 60):
         self.bucket_name = bucket_name
-        self.s3_client = boto3.client('s3')
-        
-    def upload_versioned_model(self, local_model_path: str, model_name: str = "house-price-model"):
-        """Upload model with version to S3"""
-        version = versioning.get_version()
-        
+        # boto3 honours AWS_ENDPOINT_URL, so a local S3 stand-in needs no code changes
+        self.s3_client = s3_client or boto3.client('s3')
+        self.part_size = part_size
+        self.max_concurrency = max_concurrency
+        self.cache = ArtifactCache(cache_dir, part_size, max_concurrency) if cache_dir else None
+        self.listing_ttl = listing_ttl
+        self._listings = {}
+
+    def upload_versioned_model(self, local_model_path: str, model_name: str = "house-price-model",
+                               version: str = None):
+        """Upload model with version to S3 (multipart, sha256 recorded as metadata)"""
+        version = version or versioning.get_version()
+
         # Create versioned S3 path
         s3_key = f"models/{model_name}/{version}/model.tar.gz"
-        
+
         try:
             # Upload model
-            self.s3_client.upload_file(local_model_path, self.bucket_name, s3_key)
+            upload_artifact(self.s3_client, local_model_path, self.bucket_name, s3_key,
+                            self.part_size, self.max_concurrency)
             logger.info(f"Model uploaded: s3://{self.bucket_name}/{s3_key}")
-            
+            self._listings.pop(model_name, None)
+
             # Update latest symlink
             self._update_latest_version(model_name, version)
-            
+
             return f"s3://{self.bucket_name}/{s3_key}"
-            
+
         except Exception as e:
             logger.error(f"Upload failed: {e}")
             raise
-    
+
     def _update_latest_version(self, model_name: str, version: str):
         """Update latest version pointer"""
         latest_key = f"models/{model_name}/latest/version.txt"
-        
+
         try:
             # Upload version info to latest
             self.s3_client.put_object(
@@ -55,43 +70,112 @@ class ModelDeployer:
             logger.info(f"Latest version updated to: {version}")
         except Exception as e:
             logger.warning(f"Failed to update latest version: {e}")
-    
-    def list_model_versions(self, model_name: str = "house-price-model"):
-        """List all model versions"""
+
+    def latest_version(self, model_name: str = "house-price-model"):
+        """Version named by latest/version.txt"""
+        latest_key = f"models/{model_name}/latest/version.txt"
+        response = self.s3_client.get_object(Bucket=self.bucket_name, Key=latest_key)
+        return response['Body'].read().decode('utf-8').strip()
+
+    def list_model_versions(self, model_name: str = "house-price-model", refresh: bool = False):
+        """List all model versions (every page; cached for listing_ttl seconds)"""
+        cached = self._listings.get(model_name)
+        if cached is not None and not refresh and time.monotonic() - cached[0] < self.listing_ttl:
+            return list(cached[1])
+
         prefix = f"models/{model_name}/"
-        
+
         try:
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.bucket_name,
-                Prefix=prefix,
-                Delimiter='/'
-            )
-            
+            paginator = self.s3_client.get_paginator('list_objects_v2')
             versions = []
-            for obj in response.get('CommonPrefixes', []):
-                version = obj['Prefix'].split('/')[-2]
-                if version != 'latest':
-                    versions.append(version)
-            
-            return sorted(versions, reverse=True)
-            
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix, Delimiter='/'):
+                for obj in page.get('CommonPrefixes', []):
+                    version = obj['Prefix'].split('/')[-2]
+                    if version != 'latest':
+                        versions.append(version)
+
+            versions = sorted(versions, reverse=True)
+            self._listings[model_name] = (time.monotonic(), versions)
+            return list(versions)
+
         except Exception as e:
             logger.error(f"Failed to list versions: {e}")
             return []
 
+    def download_model(self, destination: str, model_name: str = "house-price-model", version: str = None):
+        """
+        Download a version's model.tar.gz (default: latest) to destination with
+        parallel ranged GETs, through the local artifact cache if there is one.
+        Returns (version, destination).
+        """
+        version = version or self.latest_version(model_name)
+        s3_key = f"models/{model_name}/{version}/model.tar.gz"
+        if self.cache is not None:
+            link_or_copy(self.cache.fetch(self.s3_client, self.bucket_name, s3_key), destination)
+        else:
+            download_artifact(self.s3_client, self.bucket_name, s3_key, destination,
+                              self.part_size, self.max_concurrency)
+        return version, destination
+
+    def fetch_to_store(self, store_dir: str, model_name: str = "house-price-model", version: str = None):
+        """
+        Download a version (default: latest) into a local model store laid out
+        like the bucket ({store_dir}/models/{model_name}/{version}/model.tar.gz),
+        as read by the API's MODEL_STORE_DIR. Fetching the latest version also
+        points the store's latest/version.txt at it. Returns the version.
+        """
+        latest = version is None
+        model_dir = Path(store_dir) / "models" / model_name
+        version = version or self.latest_version(model_name)
+        self.download_model(str(model_dir / version / "model.tar.gz"), model_name, version)
+        if latest:
+            pointer = model_dir / "latest" / "version.txt"
+            pointer.parent.mkdir(parents=True, exist_ok=True)
+            tmp_pointer = pointer.with_suffix(".tmp")
+            tmp_pointer.write_text(version)
+            os.replace(tmp_pointer, pointer)
+        logger.info(f"Model version {version} fetched into {model_dir}")
+        return version
+
 if __name__ == "__main__":
-    # Example usage
-    bucket_name = "your-mlops-bucket"  # Replace with your bucket
-    model_path = "/opt/ml/processing/output/model.tar.gz"
-    
-    deployer = ModelDeployer(bucket_name)
-    
-    if os.path.exists(model_path):
-        s3_path = deployer.upload_versioned_model(model_path)
+    parser = argparse.ArgumentParser(description="Upload, list and fetch versioned models in S3")
+    parser.add_argument("--bucket", default=os.getenv("MODEL_BUCKET"), help="Model bucket (default: MODEL_BUCKET)")
+    parser.add_argument("--model-name", default=os.getenv("MODEL_NAME", "house-price-model"))
+    parser.add_argument("--part-size-mb", type=float, default=PART_SIZE / 1024 / 1024,
+                        help="Multipart upload part size and download range size")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY, help="Parallel parts per transfer")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    upload = commands.add_parser("upload", help="Upload a model.tar.gz as a new version and make it latest")
+    upload.add_argument("model_path", nargs="?", default="/opt/ml/processing/output/model.tar.gz")
+    upload.add_argument("--version", help="Version name (default: from version.py)")
+
+    commands.add_parser("list", help="List model versions")
+
+    fetch = commands.add_parser("fetch", help="Download a version into a local model store")
+    fetch.add_argument("--store-dir", default=os.getenv("MODEL_STORE_DIR", "models/store"))
+    fetch.add_argument("--version", help="Version to fetch (default: latest)")
+    fetch.add_argument("--cache-dir", default=os.getenv("MODEL_CACHE_DIR"),
+                       help="Artifact cache shared by processes on this machine")
+    fetch.add_argument("--cache-max-mb", type=float, default=4096,
+                       help="Least recently used artifacts are pruned beyond this size")
+
+    args = parser.parse_args()
+    if not args.bucket:
+        parser.error("--bucket or MODEL_BUCKET is required")
+
+    deployer = ModelDeployer(args.bucket, part_size=int(args.part_size_mb * 1024 * 1024),
+                             max_concurrency=args.concurrency, cache_dir=getattr(args, "cache_dir", None))
+    if args.command == "upload":
+        if not os.path.exists(args.model_path):
+            sys.exit(f"Model file not found: {args.model_path}")
+        s3_path = deployer.upload_versioned_model(args.model_path, args.model_name, args.version)
         print(f"Model deployed to: {s3_path}")
-        
-        # List all versions
-        versions = deployer.list_model_versions()
+    elif args.command == "list":
+        versions = deployer.list_model_versions(args.model_name)
         print(f"Available versions: {versions}")
     else:
-        print(f"Model file not found: {model_path}")
\ No newline at end of file
+        version = deployer.fetch_to_store(args.store_dir, args.model_name, args.version)
+        if deployer.cache is not None:
+            deployer.cache.prune(int(args.cache_max_mb * 1e6))
+        print(f"Model version {version} fetched into {args.store_dir}")
@@ -2,93 +2,104 @@ import pandas as pd
 import joblib
 import json
 import numpy as np
-from sklearn.metrics import mean_absolute_error, r2_score, mean_squared_error
 import logging
 import os
 import sys
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data'))
+from storage import find_input_file, read_sparse, read_table, table_format
+from evaluation import decile_codes, evaluate, gate, one_hot_codes
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def evaluate_model():
-    """Evaluate trained model and determine approval status."""
+# Performance gates
+THRESHOLDS = {
+    "min_r2": 0.6,
+    "max_mae": 80000,
+    "max_mape": 20
+}
+
+# One-hot column prefixes of the categorical slices
+SLICE_PREFIXES = {
+    "location": "cat__location_",
+    "condition": "cat__condition_",
+}
+
+def evaluate_model(model_path="/opt/ml/processing/input/model", data_path="/opt/ml/processing/input/data",
+                   output_path="/opt/ml/processing/output", n_bootstrap=1000, confidence=0.95, gate_on="interval"):
+    """
+    Evaluate trained model and determine approval status (defaults: SageMaker paths).
+    gate_on="interval" gates on the pessimistic end of the bootstrap confidence
+    intervals, "point" on the point estimates.
+    """
     
     try:
-        # SageMaker paths
-        input_path = "/opt/ml/processing/input"
-        output_path = "/opt/ml/processing/output"
-        
         logger.info("Starting model evaluation")
-        logger.info(f"Input path contents: {os.listdir(input_path)}")
         
         # Load model
-        model_file = os.path.join(input_path, "model", "house_price_model.pkl")
+        model_file = os.path.join(model_path, "house_price_model.pkl")
         if not os.path.exists(model_file):
             logger.error(f"Model file not found: {model_file}")
-            logger.info(f"Model directory contents: {os.listdir(os.path.join(input_path, 'model'))}")
+            logger.info(f"Model directory contents: {os.listdir(model_path)}")
             sys.exit(1)
             
         model = joblib.load(model_file)
         logger.info("Model loaded successfully")
         
         # Load test data
-        data_path = os.path.join(input_path, "data")
         if not os.path.exists(data_path):
             logger.error(f"Data path not found: {data_path}")
             sys.exit(1)
             
-        data_files = [f for f in os.listdir(data_path) if f.endswith('.csv')]
-        if not data_files:
-            logger.error("No CSV test data found")
+        data_file = find_input_file(data_path)
+        if data_file is None:
+            logger.error("No test data found")
             logger.info(f"Data directory contents: {os.listdir(data_path)}")
             sys.exit(1)
         
-        test_data = pd.read_csv(os.path.join(data_path, data_files[0]))
-        logger.info(f"Loaded test data: {data_files[0]}")
-        logger.info(f"Test data columns: {list(test_data.columns)}")
-        
-        if 'price' not in test_data.columns:
-            logger.error("Price column not found in test data")
-            sys.exit(1)
+        if table_format(data_file) == 'sparse':
+            X_test, y_test, feature_names, _ = read_sparse(data_file)
+            logger.info(f"Loaded sparse test data: {os.path.basename(data_file)}")
+            if y_test is None:
+                logger.error("Price column not found in test data")
+                sys.exit(1)
+        else:
+            test_data = read_table(data_file)
+            logger.info(f"Loaded test data: {os.path.basename(data_file)}")
+            logger.info(f"Test data columns: {list(test_data.columns)}")
             
-        X_test = test_data.drop('price', axis=1)
-        y_test = test_data['price']
+            if 'price' not in test_data.columns:
+                logger.error("Price column not found in test data")
+                sys.exit(1)
+                
+            X_test = test_data.drop('price', axis=1)
+            y_test = test_data['price'].to_numpy()
+            feature_names = list(X_test.columns)
         
         logger.info(f"Test data shape: {X_test.shape}")
         
         # Make predictions
         y_pred = model.predict(X_test)
         
-        # Calculate metrics
-        mae = float(mean_absolute_error(y_test, y_pred))
-        rmse = float(np.sqrt(mean_squared_error(y_test, y_pred)))
-        r2 = float(r2_score(y_test, y_pred))
-        mape = float(np.mean(np.abs((y_test - y_pred) / y_test)) * 100)
-        
-        metrics = {
-            "mae": mae,
-            "rmse": rmse,
-            "r2": r2,
-            "mape": mape
-        }
-        
-        # Performance gates
-        performance_passed = (
-            r2 > 0.6 and 
-            mae < 80000 and
-            mape < 20
-        )
-        
+        # Calculate metrics, confidence intervals and slice metrics
+        slices = {name: one_hot_codes(X_test, feature_names, prefix) for name, prefix in SLICE_PREFIXES.items()}
+        slices["price_decile"] = decile_codes(y_test)
+        result = evaluate(y_test, y_pred, slices, n_bootstrap=n_bootstrap, confidence=confidence)
+        metrics = result["metrics"]
+        performance_passed, gated_values = gate(result, THRESHOLDS, use_intervals=gate_on == "interval" and n_bootstrap > 0)
+
         # Create evaluation report
         report = {
             "metrics": metrics,
+            "confidence_intervals": result.get("confidence_intervals"),
+            "bootstrap": result.get("bootstrap"),
+            "rows": result["rows"],
+            "slices": result["slices"],
             "performance_passed": performance_passed,
             "model_approved": performance_passed,
-            "thresholds": {
-                "min_r2": 0.6,
-                "max_mae": 80000,
-                "max_mape": 20
-            }
+            "gate": {"on": gate_on if n_bootstrap > 0 else "point", "values": gated_values},
+            "thresholds": THRESHOLDS
         }
         
         # Save evaluation report
@@ -97,11 +108,11 @@ def evaluate_model():
         with open(report_file, "w") as f:
             json.dump(report, f, indent=2)
         
-        logger.info(f"Evaluation completed:")
-        logger.info(f"  R²: {r2:.4f}")
-        logger.info(f"  MAE: {mae:.2f}")
-        logger.info(f"  RMSE: {rmse:.2f}")
-        logger.info(f"  MAPE: {mape:.2f}%")
+        logger.info(f"Evaluation completed on {result['rows']} rows:")
+        intervals = result.get("confidence_intervals") or {}
+        for name, label, unit in (("r2", "R²", ""), ("mae", "MAE", ""), ("rmse", "RMSE", ""), ("mape", "MAPE", "%")):
+            interval = f" ({intervals[name]['low']:.4g}-{intervals[name]['high']:.4g})" if name in intervals else ""
+            logger.info(f"  {label}: {metrics[name]:.4g}{unit}{interval}")
         logger.info(f"  Performance Passed: {performance_passed}")
         
         return report
@@ -113,4 +124,16 @@ def evaluate_model():
         sys.exit(1)
 
 if __name__ == "__main__":
-    evaluate_model()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Evaluate the trained model")
+    parser.add_argument("--model-dir", default="/opt/ml/processing/input/model", help="Directory with house_price_model.pkl")
+    parser.add_argument("--data-dir", default="/opt/ml/processing/input/data", help="Directory with the featured data")
+    parser.add_argument("--output", default="/opt/ml/processing/output", help="Directory for evaluation.json")
+    parser.add_argument("--bootstrap", type=int, default=int(os.getenv("EVALUATION_BOOTSTRAP", "1000")),
+                        help="Bootstrap resamples for the confidence intervals (0: none)")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level of the intervals")
+    parser.add_argument("--gate-on", choices=("interval", "point"), default=os.getenv("EVALUATION_GATE", "interval"),
+                        help="Gate on the pessimistic end of the confidence intervals or on the point estimates")
+    args = parser.parse_args()
+    evaluate_model(args.model_dir, args.data_dir, args.output, args.bootstrap, args.confidence, args.gate_on)
\ No newline at end of file
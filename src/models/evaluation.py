@@ -0,0 +1,206 @@
+# src/models/evaluation.py
+"""
+Vectorized regression evaluation for evaluate_model.py.
+
+One pass over the predictions builds a matrix of per-row terms (absolute
+error, squared error, absolute percentage error, and the target centred on
+its mean, plain and squared). MAE, RMSE, MAPE and R² are all functions of
+the column sums of that matrix, so every metric set below (global, bootstrap
+replicate or slice) is a sum reduction followed by metrics_from_sums:
+
+* bootstrap replicates: batches of resampling index matrices turned into
+  row counts with one bincount, then counts @ terms. That costs
+  O(replicates x rows), so past BOOTSTRAP_FULL_BUDGET the intervals come
+  from the bag of little bootstraps instead (Kleiner et al., 2014): each of
+  a few random subsets of rows**0.6 rows is resampled up to the full row
+  count with multinomial weights, and the subsets' interval bounds around
+  their own estimates are averaged. Its cost depends on the subset size, not the row count;
+* slices: one weighted bincount per term over the rows' group codes.
+"""
+import time
+
+import numpy as np
+
+METRICS = ('mae', 'rmse', 'r2', 'mape')
+
+# Resampling counts held at once (replicates x rows), about 64 MB of int64
+BOOTSTRAP_BATCH_ELEMENTS = 8_000_000
+# Largest replicates x rows resampled in full (a few seconds); larger evaluations use the bag of little bootstraps
+BOOTSTRAP_FULL_BUDGET = 100_000_000
+LITTLE_BOOTSTRAP_SUBSETS = 20
+LITTLE_BOOTSTRAP_EXPONENT = 0.6
+
+
+def row_terms(y, pred):
+    """(rows, 5) per-row terms whose sums determine every metric."""
+    y = np.asarray(y, dtype=np.float64)
+    error = np.abs(np.asarray(pred, dtype=np.float64) - y)
+    centred = y - y.mean()
+    # Centring first keeps R²'s sum of squares from cancelling catastrophically on narrow slices
+    with np.errstate(divide='ignore'):
+        return np.column_stack([error, error * error, error / np.abs(y), centred, centred * centred])
+
+
+def metrics_from_sums(sums, counts):
+    """Metrics from term sums of shape (..., 5) over counts rows (same leading shape)."""
+    sums = np.asarray(sums, dtype=np.float64)
+    counts = np.asarray(counts, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        total_ss = sums[..., 4] - sums[..., 3] ** 2 / counts
+        return {
+            'mae': sums[..., 0] / counts,
+            'rmse': np.sqrt(sums[..., 1] / counts),
+            'r2': 1 - sums[..., 1] / total_ss,
+            'mape': sums[..., 2] / counts * 100,
+        }
+
+
+def bootstrap_metrics(terms, n_bootstrap, seed=42):
+    """Metrics of n_bootstrap resamples (with replacement) of the rows, one array per metric."""
+    n = len(terms)
+    rng = np.random.default_rng(seed)
+    batch = max(1, BOOTSTRAP_BATCH_ELEMENTS // n)
+    sums = np.empty((n_bootstrap, terms.shape[1]))
+    for start in range(0, n_bootstrap, batch):
+        replicates = min(batch, n_bootstrap - start)
+        # Row r of the index matrix draws from row offsets [r * n, (r + 1) * n), so one bincount counts every replicate
+        indices = rng.integers(0, n, size=(replicates, n))
+        indices += (np.arange(replicates) * n)[:, None]
+        counts = np.bincount(indices.ravel(), minlength=replicates * n).reshape(replicates, n)
+        sums[start:start + replicates] = counts @ terms
+    return metrics_from_sums(sums, np.full(n_bootstrap, n))
+
+
+def little_bootstrap_intervals(terms, n_bootstrap, confidence, seed=42, subsets=LITTLE_BOOTSTRAP_SUBSETS,
+                               exponent=LITTLE_BOOTSTRAP_EXPONENT):
+    """
+    Bag of little bootstraps: (percentile intervals per metric, subset rows).
+    n_bootstrap resamples are spread over the subsets. Each subset's bounds
+    are taken relative to its own estimate and re-centred on the full data's.
+    """
+    n = len(terms)
+    rng = np.random.default_rng(seed)
+    subset_rows = min(n, int(np.ceil(n ** exponent)))
+    replicates = max(1, n_bootstrap // subsets)
+    tail = (1 - confidence) / 2 * 100
+    point = metrics_from_sums(terms.sum(axis=0), n)
+    offsets = {name: [] for name in METRICS}
+    for _ in range(subsets):
+        subset = terms[rng.choice(n, size=subset_rows, replace=False)]
+        estimate = metrics_from_sums(subset.sum(axis=0), subset_rows)
+        # Counts of a size-n resample of the subset's rows
+        weights = rng.multinomial(n, np.full(subset_rows, 1 / subset_rows), size=replicates)
+        values = metrics_from_sums(weights @ subset, np.full(replicates, n))
+        for name in METRICS:
+            offsets[name].append(np.nanpercentile(values[name], [tail, 100 - tail]) - estimate[name])
+    intervals = {}
+    for name in METRICS:
+        low, high = np.mean(offsets[name], axis=0) + point[name]
+        intervals[name] = {'low': float(low), 'high': float(high)}
+    return intervals, subset_rows
+
+
+def group_metrics(terms, codes, n_groups):
+    """(row counts, metrics) per group code in [0, n_groups); rows with a negative code are left out."""
+    keep = codes >= 0
+    codes, terms = codes[keep], terms[keep]
+    counts = np.bincount(codes, minlength=n_groups)
+    sums = np.column_stack([np.bincount(codes, weights=terms[:, j], minlength=n_groups)
+                            for j in range(terms.shape[1])])
+    return counts, metrics_from_sums(sums, counts)
+
+
+def one_hot_codes(X, feature_names, prefix):
+    """
+    (codes, labels) of the category encoded by the one-hot columns named
+    {prefix}{label}; rows with none of them set (unseen categories) get -1.
+    """
+    columns = [i for i, name in enumerate(feature_names) if name.startswith(prefix)]
+    labels = [feature_names[i][len(prefix):] for i in columns]
+    codes = np.full(X.shape[0], -1, dtype=np.int64)
+    if not columns:
+        return codes, labels
+    if hasattr(X, 'tocsr'):
+        block = X.tocsr()[:, columns].tocsr()
+        block.eliminate_zeros()
+        rows = np.repeat(np.arange(block.shape[0]), np.diff(block.indptr))
+        codes[rows] = block.indices
+    elif hasattr(X, 'column_names'):
+        # Arrow table: only the one-hot columns are converted
+        rows, hot = np.nonzero(np.column_stack([X.column(i).to_numpy() for i in columns]))
+        codes[rows] = hot
+    else:
+        block = X.iloc[:, columns].to_numpy() if hasattr(X, 'iloc') else np.asarray(X)[:, columns]
+        rows, hot = np.nonzero(block)
+        codes[rows] = hot
+    return codes, labels
+
+
+def decile_codes(y):
+    """(codes, labels) of the target's deciles, labelled with their price range."""
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.quantile(y, np.linspace(0, 1, 11))
+    codes = np.clip(np.searchsorted(edges[1:-1], y, side='right'), 0, 9)
+    labels = [f"d{i + 1} ({edges[i]:.0f}-{edges[i + 1]:.0f})" for i in range(10)]
+    return codes, labels
+
+
+def evaluate(y, pred, slices=None, n_bootstrap=1000, confidence=0.95, seed=42):
+    """
+    Point metrics, percentile bootstrap confidence intervals and per-slice
+    metrics. slices maps a slice name to (codes, labels) as returned by
+    one_hot_codes or decile_codes.
+    """
+    terms = row_terms(y, pred)
+    n = len(terms)
+    metrics = {name: float(value) for name, value in metrics_from_sums(terms.sum(axis=0), n).items()}
+
+    result = {'metrics': metrics, 'rows': n}
+    if n_bootstrap:
+        start = time.perf_counter()
+        if n * n_bootstrap <= BOOTSTRAP_FULL_BUDGET:
+            replicates = bootstrap_metrics(terms, n_bootstrap, seed)
+            tail = (1 - confidence) / 2 * 100
+            result['confidence_intervals'] = {
+                name: {'low': float(np.nanpercentile(values, tail)), 'high': float(np.nanpercentile(values, 100 - tail))}
+                for name, values in replicates.items()
+            }
+            method = {'method': 'bootstrap'}
+        else:
+            result['confidence_intervals'], subset_rows = little_bootstrap_intervals(terms, n_bootstrap, confidence, seed)
+            method = {'method': 'bag_of_little_bootstraps', 'subsets': LITTLE_BOOTSTRAP_SUBSETS, 'subset_rows': subset_rows}
+        result['bootstrap'] = {**method, 'samples': n_bootstrap, 'confidence': confidence, 'seed': seed,
+                               'seconds': round(time.perf_counter() - start, 3)}
+
+    result['slices'] = {}
+    for slice_name, (codes, labels) in (slices or {}).items():
+        counts, values = group_metrics(terms, codes, len(labels))
+        result['slices'][slice_name] = {
+            label: {'rows': int(counts[i]),
+                    **{name: float(values[name][i]) if counts[i] else None for name in METRICS}}
+            for i, label in enumerate(labels)
+        }
+        unseen = int(np.sum(codes < 0))
+        if unseen:
+            result['slices'][slice_name]['unseen'] = {'rows': unseen}
+    return result
+
+
+def gate(result, thresholds, use_intervals=True):
+    """
+    Whether the metrics pass the thresholds (min_r2, max_mae, max_mape), and
+    the values compared. With use_intervals the pessimistic end of each
+    confidence interval has to pass, not just the point estimate.
+    """
+    intervals = result.get('confidence_intervals') if use_intervals else None
+    checked = {
+        'r2': intervals['r2']['low'] if intervals else result['metrics']['r2'],
+        'mae': intervals['mae']['high'] if intervals else result['metrics']['mae'],
+        'mape': intervals['mape']['high'] if intervals else result['metrics']['mape'],
+    }
+    passed = (
+        checked['r2'] > thresholds['min_r2'] and
+        checked['mae'] < thresholds['max_mae'] and
+        checked['mape'] < thresholds['max_mape']
+    )
+    return bool(passed), checked
@@ -0,0 +1,204 @@
+# src/models/incremental.py
+"""
+Warm-start retraining for train_model.py: continue boosting the previous model
+version on the rows appended since it was trained, unless a drift gate calls
+for a full retrain.
+
+Lineage lives in version_metadata.json. "data" records the rows the model has
+seen: a digest of their target values and the row boundaries of every
+increment, so each increment keeps its own train/test split.
+"""
+import hashlib
+import json
+import logging
+import os
+import sys
+import tarfile
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.model_selection import train_test_split
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data'))
+from storage import take_rows
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILE = "house_price_model.pkl"
+METADATA_FILE = "version_metadata.json"
+
+# Rows per side compared by the distribution gate
+PSI_SAMPLE_ROWS = 100000
+# Fewer appended rows than this cannot be split into train and test rows
+MIN_NEW_ROWS = 10
+
+
+def target_digest(y):
+    """Short sha256 of target values, to check that earlier rows were not rewritten."""
+    return hashlib.sha256(np.ascontiguousarray(y, dtype=np.float64).tobytes()).hexdigest()[:16]
+
+
+def resolve_previous_model(location, work_dir):
+    """
+    (model, version metadata) of the previous version, or None if there is none.
+
+    location is a house_price_model.pkl or model.tar.gz file, a directory holding
+    either, a model store directory with latest/version.txt (the layout
+    ModelDeployer writes), or that same store on S3
+    (s3://bucket/models/house-price-model). Metadata is {} for models packaged
+    without version_metadata.json.
+    """
+    if location.startswith("s3://"):
+        location = _download_latest(location, work_dir)
+        if location is None:
+            return None
+    pointer = os.path.join(location, "latest", "version.txt")
+    if os.path.isfile(pointer):
+        with open(pointer) as f:
+            location = os.path.join(location, f.read().strip())
+    if os.path.isdir(location):
+        candidates = [os.path.join(location, name) for name in (MODEL_FILE, "model.tar.gz")]
+        location = next((path for path in candidates if os.path.isfile(path)), None)
+        if location is None:
+            return None
+    if not os.path.isfile(location):
+        return None
+
+    if location.endswith(".tar.gz"):
+        extract_dir = os.path.join(work_dir, "previous")
+        with tarfile.open(location) as tar:
+            tar.extractall(extract_dir, filter='data')
+        location = os.path.join(extract_dir, MODEL_FILE)
+
+    metadata_file = os.path.join(os.path.dirname(location), METADATA_FILE)
+    metadata = {}
+    if os.path.isfile(metadata_file):
+        with open(metadata_file) as f:
+            metadata = json.load(f)
+    return joblib.load(location), metadata
+
+
+def _download_latest(uri, work_dir):
+    """model.tar.gz of the version named by {uri}/latest/version.txt, or None."""
+    import boto3
+    from botocore.exceptions import ClientError
+
+    bucket, _, prefix = uri[len("s3://"):].partition("/")
+    prefix = prefix.rstrip("/")
+    s3 = boto3.client("s3")
+    try:
+        version = s3.get_object(Bucket=bucket, Key=f"{prefix}/latest/version.txt")["Body"].read().decode().strip()
+        archive = os.path.join(work_dir, "model.tar.gz")
+        s3.download_file(bucket, f"{prefix}/{version}/model.tar.gz", archive)
+    except ClientError as e:
+        logger.warning(f"No previous model at {uri}: {e}")
+        return None
+    logger.info(f"Downloaded previous model version {version} from {uri}")
+    return archive
+
+
+def population_stability_index(expected, actual, bins=10):
+    """PSI of actual against expected, over expected's quantile bins."""
+    expected = expected[~np.isnan(expected)]
+    actual = actual[~np.isnan(actual)]
+    if len(expected) == 0 or len(actual) == 0:
+        return 0.0
+    edges = np.unique(np.quantile(expected, np.linspace(0, 1, bins + 1))[1:-1])
+    expected_share = np.bincount(np.searchsorted(edges, expected, side='right'), minlength=len(edges) + 1) / len(expected)
+    actual_share = np.bincount(np.searchsorted(edges, actual, side='right'), minlength=len(edges) + 1) / len(actual)
+    expected_share = np.clip(expected_share, 1e-4, None)
+    actual_share = np.clip(actual_share, 1e-4, None)
+    return float(np.sum((actual_share - expected_share) * np.log(actual_share / expected_share)))
+
+
+def _column(X, feature_names, name, rows):
+    if isinstance(X, pd.DataFrame):
+        return X[name].to_numpy(dtype=np.float64)[rows]
+    if hasattr(X, 'column'):
+        return X.column(name).take(rows).to_numpy().astype(np.float64)
+    return X[rows][:, feature_names.index(name)].toarray().ravel().astype(np.float64)
+
+
+def check_gates(parent_model, parent_metadata, X, y, feature_names, max_new_fraction=0.5, max_psi=0.25,
+                max_error_ratio=1.5, max_chain=10, seed=42):
+    """
+    Reasons to fall back to a full retrain (empty if continuing is safe) and the
+    measured gate values. Gates: the parent's rows must be an unchanged prefix
+    of the data with the same feature layout; the appended share, the chain of
+    increments, the PSI of the target and numerical features between old and
+    new rows, and the parent's error on the new rows against its own test error
+    must stay within their limits.
+    """
+    data = parent_metadata.get("data")
+    if not data:
+        return ["parent version records no training data lineage"], {}
+    old_rows, rows = data["rows"], len(y)
+    if rows - old_rows < MIN_NEW_ROWS:
+        return [f"{max(rows - old_rows, 0)} rows appended since the parent version (need {MIN_NEW_ROWS})"], {}
+    if target_digest(y[:old_rows]) != data["target_digest"]:
+        return ["rows the parent version was trained on have changed"], {}
+    parent_names = parent_model.get_booster().feature_names
+    if parent_model.n_features_in_ != X.shape[1] or (parent_names and feature_names and list(parent_names) != list(feature_names)):
+        return [f"feature layout changed ({parent_model.n_features_in_} features, now {X.shape[1]})"], {}
+
+    reasons = []
+    new_fraction = (rows - old_rows) / rows
+    chain_depth = parent_metadata.get("lineage", {}).get("chain_depth", 0) + 1
+    gates = {"new_fraction": round(new_fraction, 4), "chain_depth": chain_depth}
+    if new_fraction > max_new_fraction:
+        reasons.append(f"{new_fraction:.0%} of rows are new (limit {max_new_fraction:.0%})")
+    if chain_depth > max_chain:
+        reasons.append(f"{chain_depth} increments since the last full retrain (limit {max_chain})")
+
+    rng = np.random.default_rng(seed)
+    old_sample = np.sort(rng.choice(old_rows, size=min(old_rows, PSI_SAMPLE_ROWS), replace=False))
+    new_sample = old_rows + np.sort(rng.choice(rows - old_rows, size=min(rows - old_rows, PSI_SAMPLE_ROWS), replace=False))
+    psi = {"price": population_stability_index(y[old_sample].astype(np.float64), y[new_sample].astype(np.float64))}
+    for name in feature_names or []:
+        if name.startswith("num__"):
+            psi[name] = population_stability_index(_column(X, feature_names, name, old_sample),
+                                                   _column(X, feature_names, name, new_sample))
+    gates["psi"] = {name: round(value, 4) for name, value in psi.items()}
+    drifted = [name for name, value in psi.items() if value > max_psi]
+    if drifted:
+        reasons.append(f"distribution drift (PSI > {max_psi}) in {', '.join(drifted)}")
+
+    parent_mae = parent_metadata.get("metrics", {}).get("mae")
+    if parent_mae:
+        new_rows = np.arange(old_rows, rows)
+        new_mae = float(np.mean(np.abs(parent_model.predict(take_rows(X, new_rows)) - y[new_rows])))
+        gates["error_ratio"] = round(new_mae / parent_mae, 4)
+        if new_mae / parent_mae > max_error_ratio:
+            reasons.append(f"parent MAE on new rows is {new_mae / parent_mae:.2f}x its test MAE (limit {max_error_ratio})")
+    return reasons, gates
+
+
+def continue_training(parent_model, X, y, train_rows, max_rounds=None, n_jobs=None, early_stopping_rounds=20, seed=42):
+    """
+    (model, trees added): the parent model boosted further on the new training
+    rows. The number of trees to add is picked by early stopping on a
+    validation split of those rows (at most max_rounds, default the parent's
+    tree count), then the trees are refit on all of them. When no added tree
+    beats the parent on the validation rows, the parent is returned as is.
+    """
+    parent_trees = parent_model.get_booster().num_boosted_rounds()
+    fit_rows, valid_rows = train_test_split(train_rows, test_size=0.2, random_state=seed)
+    X_valid, y_valid = take_rows(X, valid_rows), y[valid_rows]
+
+    params = parent_model.get_params()
+    params.update(n_estimators=max_rounds or parent_trees, n_jobs=n_jobs, early_stopping_rounds=early_stopping_rounds,
+                  eval_metric='rmse')
+    probe = xgb.XGBRegressor(**params)
+    probe.fit(take_rows(X, fit_rows), y[fit_rows], eval_set=[(X_valid, y_valid)],
+              xgb_model=parent_model.get_booster(), verbose=False)
+    parent_rmse = float(np.sqrt(np.mean((parent_model.predict(X_valid) - y_valid) ** 2)))
+    rounds = probe.best_iteration + 1 - parent_trees  # best_iteration counts the parent's trees too
+    if rounds <= 0 or probe.best_score >= parent_rmse:
+        return parent_model, 0
+
+    params.update(n_estimators=rounds, early_stopping_rounds=None, eval_metric=None)
+    model = xgb.XGBRegressor(**params)
+    model.fit(take_rows(X, train_rows), y[train_rows], xgb_model=parent_model.get_booster())
+    return model, rounds
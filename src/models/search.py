@@ -0,0 +1,284 @@
+# src/models/search.py
+"""
+Successive-halving / Hyperband search over XGBoost parameters for train_model.py.
+
+Every trial trains a hist XGBRegressor with early stopping on a validation
+split. Trials of one rung run in a process pool, and the machine's cores are
+split between concurrent trials and XGBoost threads per trial. Completed
+trials are appended to a JSON-lines checkpoint, so a rerun of an interrupted
+job skips them.
+"""
+import hashlib
+import json
+import logging
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import xgboost as xgb
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ('none', 'successive_halving', 'hyperband')
+
+# (low, high, scale) per parameter: 'int' and 'linear' are sampled uniformly, 'log' log-uniformly
+SEARCH_SPACE = {
+    'max_depth': (3, 10, 'int'),
+    'learning_rate': (0.01, 0.3, 'log'),
+    'min_child_weight': (1.0, 20.0, 'log'),
+    'subsample': (0.5, 1.0, 'linear'),
+    'colsample_bytree': (0.5, 1.0, 'linear'),
+    'reg_lambda': (0.1, 10.0, 'log'),
+}
+
+EARLY_STOPPING_ROUNDS = 20
+CHECKPOINT_FILE = "search_trials.jsonl"
+
+# Validation split of the worker process, set by _init_worker
+_data = None
+
+
+def available_cores():
+    """CPUs this process may run on (respects taskset/cpusets, unlike os.cpu_count)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def file_fingerprint(path, chunk_size=1 << 20):
+    """sha256 of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sample_configs(n, rng):
+    """n parameter dicts drawn from SEARCH_SPACE."""
+    configs = []
+    for _ in range(n):
+        config = {}
+        for name, (low, high, scale) in SEARCH_SPACE.items():
+            if scale == 'int':
+                config[name] = int(rng.integers(low, high + 1))
+            elif scale == 'log':
+                config[name] = float(math.exp(rng.uniform(math.log(low), math.log(high))))
+            else:
+                config[name] = float(rng.uniform(low, high))
+        configs.append(config)
+    return configs
+
+
+def bracket_plan(strategy, n_configs, min_rounds, max_rounds, eta):
+    """
+    (configs, rounds) of the first rung of every bracket. Successive halving is
+    a single bracket of n_configs; Hyperband runs one bracket per trade-off
+    between many short trials and few long ones, and sizes them itself.
+    """
+    if strategy == 'successive_halving':
+        return [(n_configs, min_rounds)]
+    s_max = int(math.floor(math.log(max_rounds / min_rounds, eta) + 1e-9))
+    return [
+        (int(math.ceil((s_max + 1) / (s + 1) * eta ** s)), max(1, int(round(max_rounds * eta ** -s))))
+        for s in range(s_max, -1, -1)
+    ]
+
+
+def rung_schedule(n, rounds, max_rounds, eta):
+    """(configs kept, boosting rounds) per rung, until a rung reaches max_rounds."""
+    schedule = []
+    while True:
+        schedule.append((n, min(rounds, max_rounds)))
+        if rounds >= max_rounds or n == 1:
+            return schedule
+        n, rounds = max(1, n // eta), rounds * eta
+
+
+def split_cores(cores, concurrent):
+    """(concurrent trials, XGBoost threads per trial) for a rung."""
+    concurrent = max(1, min(cores, concurrent))
+    return concurrent, max(1, cores // concurrent)
+
+
+class TrialCheckpoint:
+    """
+    Completed trials as JSON lines tagged with the search fingerprint. Records
+    from resume_from (e.g. the previous attempt's checkpoint) and path are
+    merged; records of any other search are dropped when path is rewritten.
+    """
+
+    def __init__(self, path, fingerprint, resume_from=()):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.records = {}
+        for source in (*resume_from, path):
+            if source and os.path.exists(source):
+                with open(source) as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue  # Torn last line of an interrupted write
+                        if record.get('fingerprint') == fingerprint:
+                            self.records[record['key']] = record
+
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                for record in self.records.values():
+                    f.write(json.dumps(record) + "\n")
+            os.replace(tmp_path, path)
+
+    def get(self, key):
+        return self.records.get(key)
+
+    def add(self, record):
+        record = {'key': record['key'], 'fingerprint': self.fingerprint, **record}
+        self.records[record['key']] = record
+        if self.path:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def _init_worker(load):
+    global _data
+    _data = load()
+
+
+def _run_trial(params, rounds, n_jobs, seed):
+    X_fit, y_fit, X_valid, y_valid = _data
+    start = time.perf_counter()
+    model = xgb.XGBRegressor(
+        tree_method='hist',
+        n_estimators=rounds,
+        early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+        eval_metric='rmse',
+        n_jobs=n_jobs,
+        random_state=seed,
+        **params,
+    )
+    model.fit(X_fit, y_fit, eval_set=[(X_valid, y_valid)], verbose=False)
+    return {
+        'val_rmse': float(model.best_score),
+        'best_iteration': int(model.best_iteration),
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+def run_search(load, data_fingerprint, strategy='successive_halving', n_configs=27, min_rounds=30,
+               max_rounds=810, eta=3, workers=None, checkpoint_dir=None, resume_dirs=(), seed=42):
+    """
+    Search XGBoost parameters and return the winner plus every trial's result.
+
+    load is a picklable callable returning (X_fit, y_fit, X_valid, y_valid);
+    each worker process calls it once. data_fingerprint identifies the data in
+    the checkpoint, so a rerun only reuses trials of the same search on the
+    same data. workers defaults to one trial per core.
+    """
+    if strategy not in STRATEGIES[1:]:
+        raise ValueError(f"Unknown search strategy: {strategy}")
+    start = time.perf_counter()
+    cores = available_cores()
+    brackets = bracket_plan(strategy, n_configs, min_rounds, max_rounds, eta)
+    widest_rung = max(n for n, _ in brackets)
+    pool_size, _ = split_cores(cores, min(workers or cores, widest_rung))
+
+    settings = {
+        'strategy': strategy, 'n_configs': n_configs, 'min_rounds': min_rounds, 'max_rounds': max_rounds,
+        'eta': eta, 'seed': seed, 'early_stopping_rounds': EARLY_STOPPING_ROUNDS,
+        'search_space': SEARCH_SPACE, 'xgboost': xgb.__version__, 'data': data_fingerprint,
+    }
+    fingerprint = hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:16]
+    checkpoint = TrialCheckpoint(
+        os.path.join(checkpoint_dir, CHECKPOINT_FILE) if checkpoint_dir else None,
+        fingerprint,
+        [os.path.join(directory, CHECKPOINT_FILE) for directory in resume_dirs],
+    )
+    if checkpoint.records:
+        logger.info(f"Resuming search {fingerprint}: {len(checkpoint.records)} trials already completed")
+
+    rng = np.random.default_rng(seed)
+    trials = []
+    # Spawned, not forked: forking after OpenMP or Arrow threads have started can deadlock the child
+    with ProcessPoolExecutor(max_workers=pool_size, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(load,)) as pool:
+        for bracket, (n, rounds) in enumerate(brackets):
+            candidates = list(enumerate(sample_configs(n, rng)))
+            for rung, (keep, rung_rounds) in enumerate(rung_schedule(n, rounds, max_rounds, eta)):
+                candidates = candidates[:keep]
+                results = _run_rung(pool, pool_size, cores, checkpoint, bracket, rung, rung_rounds,
+                                    candidates, trials, seed)
+                candidates.sort(key=lambda candidate: results[candidate[0]]['val_rmse'])
+                logger.info(f"Bracket {bracket} rung {rung}: {len(results)} trials at {rung_rounds} rounds, "
+                            f"best validation RMSE {results[candidates[0][0]]['val_rmse']:.2f}")
+
+    best = min(trials, key=lambda trial: trial['val_rmse'])
+    return {
+        'strategy': strategy,
+        'fingerprint': fingerprint,
+        'eta': eta,
+        'min_rounds': min_rounds,
+        'max_rounds': max_rounds,
+        'cores': cores,
+        'workers': pool_size,
+        'wall_clock_seconds': round(time.perf_counter() - start, 3),
+        'resumed_trials': sum(trial['resumed'] for trial in trials),
+        'best': {
+            'trial': best['key'],
+            'params': best['params'],
+            'n_estimators': best['best_iteration'] + 1,
+            'val_rmse': best['val_rmse'],
+        },
+        'trials': trials,
+    }
+
+
+def _run_rung(pool, pool_size, cores, checkpoint, bracket, rung, rounds, candidates, trials, seed):
+    """Run (or recover) one rung's trials; returns results by config index and appends them to trials."""
+    results, pending = {}, []
+    for index, params in candidates:
+        key = f"b{bracket}-c{index}-r{rung}"
+        record = checkpoint.get(key)
+        if record is not None:
+            results[index] = {**record, 'resumed': True}
+            continue
+        previous = _previous_result(trials, bracket, rung, index)
+        if previous is not None and previous['best_iteration'] + 1 + EARLY_STOPPING_ROUNDS <= previous['rounds']:
+            # Early stopping ended this config short of its last budget; more rounds stop at the same tree
+            record = {**previous, 'key': key, 'rung': rung, 'rounds': rounds, 'seconds': 0.0, 'carried_over': True}
+            del record['resumed']
+            checkpoint.add(record)
+            results[index] = {**checkpoint.get(key), 'resumed': False}
+            continue
+        pending.append((key, index, params))
+
+    _, n_jobs = split_cores(cores, min(pool_size, len(pending)))
+    futures = [(key, index, params, pool.submit(_run_trial, params, rounds, n_jobs, seed))
+               for key, index, params in pending]
+    for key, index, params, future in futures:
+        record = {'key': key, 'bracket': bracket, 'rung': rung, 'config': index, 'rounds': rounds,
+                  'n_jobs': n_jobs, 'params': params, **future.result()}
+        checkpoint.add(record)
+        results[index] = {**checkpoint.get(key), 'resumed': False}
+
+    for index, _ in candidates:
+        result = results[index]
+        trials.append({name: value for name, value in result.items() if name != 'fingerprint'})
+    return results
+
+
+def _previous_result(trials, bracket, rung, index):
+    if rung == 0:
+        return None
+    for trial in reversed(trials):
+        if trial['bracket'] == bracket and trial['rung'] == rung - 1 and trial['config'] == index:
+            return trial
+    return None
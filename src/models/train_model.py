@@ -8,6 +8,15 @@ import logging
 import os
 import sys
 import json
+import tempfile
+import time
+from functools import partial
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data'))
+from storage import find_input_file, read_arrow, read_metadata, read_sparse, table_format, take_rows
+from search import STRATEGIES, available_cores, file_fingerprint, run_search
+from incremental import check_gates, continue_training, resolve_previous_model, target_digest
+from conformal import INTERVALS_FILE, fit_interval_table, location_codes, save_interval_table
 
 # Simple versioning for SageMaker container
 def get_git_commit():
@@ -28,36 +37,215 @@ def get_timestamp():
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def load_training_data(data_file):
+    """Features and target of a featured data file, without densifying or converting it."""
+    if table_format(data_file) == 'sparse':
+        # CSR features go straight into XGBoost's DMatrix; entries not stored
+        # (one-hot zeros) are treated as missing, as they are at serving time
+        X, y, feature_names, metadata = read_sparse(data_file)
+        logger.info(f"Data shape: {X.shape} ({X.nnz} non-zeros)")
+        logger.info(f"Metadata: {metadata}")
+        return X, y
+    if table_format(data_file) == 'csv':
+        data = pd.read_csv(data_file)
+        logger.info(f"Data shape: {data.shape}")
+        logger.info(f"Columns: {list(data.columns)}")
+        return data.drop(columns=['price']), data['price'].to_numpy()
+    # Keep the features in Arrow: XGBoost reads the table's column buffers directly,
+    # without an intermediate pandas frame or row-major NumPy copy
+    data = read_arrow(data_file)
+    logger.info(f"Data shape: {data.shape}")
+    logger.info(f"Columns: {data.column_names}")
+    logger.info(f"Metadata: {read_metadata(data_file)}")
+    return data.drop(['price']), data.column('price').to_numpy()
+
+def feature_names_of(X, data_file):
+    """Names of the feature columns, or None if the data file does not record them."""
+    if isinstance(X, pd.DataFrame):
+        return list(X.columns)
+    if hasattr(X, 'column_names'):
+        return list(X.column_names)
+    return read_metadata(data_file).get('feature_names')
+
+def split_segments(boundaries, test_size=0.2, random_state=42):
+    """
+    (train, test) row indices for each segment of rows appended together, given
+    the cumulative row count after each segment. Splitting row indices gives the
+    same split as train_test_split on the data itself, so a single segment
+    splits exactly like the full dataset.
+    """
+    splits, start = [], 0
+    for end in boundaries:
+        splits.append(train_test_split(np.arange(start, end), test_size=test_size, random_state=random_state))
+        start = end
+    return splits
+
+def load_search_split(data_file, fit_rows, valid_rows):
+    """(X_fit, y_fit, X_valid, y_valid) for search trials; runs in each search worker."""
+    X, y = load_training_data(data_file)
+    return take_rows(X, fit_rows), y[fit_rows], take_rows(X, valid_rows), y[valid_rows]
+
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train the house price model")
+    parser.add_argument("--input", help="Featured data file (default: first data file in the SageMaker input directory)")
+    parser.add_argument("--output", default="/opt/ml/processing/output", help="Directory for the model artifacts")
+    parser.add_argument("--search", choices=STRATEGIES, default=os.getenv("SEARCH_STRATEGY", "successive_halving"),
+                        help="Hyperparameter search strategy; 'none' trains the fixed baseline model")
+    parser.add_argument("--configs", type=int, default=int(os.getenv("SEARCH_CONFIGS", "27")),
+                        help="Configurations sampled for successive halving (Hyperband sizes its own brackets)")
+    parser.add_argument("--min-rounds", type=int, default=30, help="Boosting rounds of the first rung")
+    parser.add_argument("--max-rounds", type=int, default=810, help="Boosting rounds of the last rung")
+    parser.add_argument("--eta", type=int, default=3, help="Fraction (1/eta) of trials promoted at each rung")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SEARCH_WORKERS", "0")) or None,
+                        help="Concurrent trials (default: one per core); cores are split between them")
+    parser.add_argument("--checkpoint-dir", default=os.getenv("SEARCH_CHECKPOINT_DIR", "/opt/ml/processing/checkpoints"),
+                        help="Where completed trials are recorded")
+    parser.add_argument("--resume-dir", default="/opt/ml/processing/input/checkpoints",
+                        help="Checkpoint of a previous attempt to resume from, if present")
+    parser.add_argument("--incremental", action="store_true",
+                        default=os.getenv("INCREMENTAL_TRAINING", "false").lower() == "true",
+                        help="Continue boosting the previous version on appended rows unless a drift gate trips")
+    parser.add_argument("--previous-model", default=os.getenv("PREVIOUS_MODEL_URI", "/opt/ml/processing/input/previous"),
+                        help="Previous version: model file, model directory, or model store (local or s3://) "
+                             "with latest/version.txt")
+    parser.add_argument("--incremental-rounds", type=int, default=None,
+                        help="Most trees to add, picked by early stopping (default: the previous version's tree count)")
+    parser.add_argument("--max-new-fraction", type=float, default=0.5, help="Largest share of new rows to continue on")
+    parser.add_argument("--max-psi", type=float, default=0.25,
+                        help="Largest PSI between old and new rows of the target and numerical features")
+    parser.add_argument("--max-error-ratio", type=float, default=1.5,
+                        help="Largest previous-model MAE on new rows relative to its test MAE")
+    parser.add_argument("--max-chain", type=int, default=10, help="Increments allowed before a full retrain")
+    parser.add_argument("--interval-coverage", type=float, default=float(os.getenv("INTERVAL_COVERAGE", "0.9")),
+                        help="Coverage of the conformal prediction intervals calibrated on the held-out rows")
+    args = parser.parse_args()
+
     # SageMaker processing environment
     input_path = "/opt/ml/processing/input"
-    model_path = "/opt/ml/processing/output"
-    
-    logger.info(f"Looking for CSV files in: {input_path}")
+    model_path = args.output
     
-    # Find CSV file in input directory
-    input_files = [f for f in os.listdir(input_path) if f.endswith('.csv')]
-    if not input_files:
-        logger.error("No CSV files found in training input directory")
-        sys.exit(1)
+    data_file = args.input
+    if data_file is None:
+        logger.info(f"Looking for data files in: {input_path}")
+        
+        # Find data file (Parquet, Arrow IPC, CSR or CSV) in input directory
+        data_file = find_input_file(input_path)
+        if data_file is None:
+            logger.error("No data files found in training input directory")
+            sys.exit(1)
     
-    data_file = os.path.join(input_path, input_files[0])
     logger.info(f"Loading data from: {data_file}")
     
     # Load and train model
-    data = pd.read_csv(data_file)
-    logger.info(f"Data shape: {data.shape}")
-    logger.info(f"Columns: {list(data.columns)}")
+    X, y = load_training_data(data_file)
+    feature_names = feature_names_of(X, data_file)
+    training_start = time.perf_counter()
     
-    X = data.drop(columns=['price'])
-    y = data['price']
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    # Continue the previous version only when every drift gate passes
+    parent, parent_metadata, fallback_reasons, gates = None, {}, [], {}
+    if args.incremental:
+        with tempfile.TemporaryDirectory() as work_dir:
+            previous = resolve_previous_model(args.previous_model, work_dir)
+        if previous is None:
+            fallback_reasons = [f"no previous model version at {args.previous_model}"]
+        else:
+            parent, parent_metadata = previous
+            fallback_reasons, gates = check_gates(
+                parent, parent_metadata, X, y, feature_names,
+                max_new_fraction=args.max_new_fraction,
+                max_psi=args.max_psi,
+                max_error_ratio=args.max_error_ratio,
+                max_chain=args.max_chain,
+            )
+        if fallback_reasons:
+            logger.warning(f"Full retrain instead of incremental training: {'; '.join(fallback_reasons)}")
+    incremental = args.incremental and not fallback_reasons
     
-    logger.info(f"Training set shape: {X_train.shape}")
+    # Each appended segment keeps its own split, so rows an earlier version was tested on are never trained on
+    segments = parent_metadata["data"]["segments"] + [len(y)] if incremental else [len(y)]
+    splits = split_segments(segments)
+    train_idx = np.concatenate([train for train, _ in splits])
+    test_idx = np.concatenate([test for _, test in splits])
+    X_test, y_test = take_rows(X, test_idx), y[test_idx]
+    if len(test_idx) == 0:
+        # The held-out rows are the only calibration set the prediction intervals have
+        logger.error(f"No held-out rows to evaluate and calibrate on ({len(y)} rows in {data_file})")
+        sys.exit(1)
+    
+    search_result = None
+    if incremental:
+        new_train_idx = splits[-1][0]
+        logger.info(f"Continuing {parent_metadata.get('version')} on {len(new_train_idx)} new rows")
+        model, rounds = continue_training(parent, X, y, new_train_idx, max_rounds=args.incremental_rounds,
+                                          n_jobs=available_cores())
+        logger.info(f"Added {rounds} trees")
+        hyperparameters = {**parent_metadata.get("hyperparameters", {}),
+                           "n_estimators": model.get_booster().num_boosted_rounds()}
+    else:
+        X_train, y_train = take_rows(X, train_idx), y[train_idx]
+        logger.info(f"Training set shape: {X_train.shape}")
+        
+        if args.search == 'none':
+            # Train XGBoost model
+            hyperparameters = {"n_estimators": 100}
+            model = xgb.XGBRegressor(random_state=42, **hyperparameters)
+            model.fit(X_train, y_train)
+        else:
+            # Trials early-stop on a validation split of the training rows; the test rows stay held out
+            fit_idx, valid_idx = train_test_split(train_idx, test_size=0.2, random_state=42)
+            search_result = run_search(
+                partial(load_search_split, data_file, fit_idx, valid_idx),
+                file_fingerprint(data_file),
+                strategy=args.search,
+                n_configs=args.configs,
+                min_rounds=args.min_rounds,
+                max_rounds=args.max_rounds,
+                eta=args.eta,
+                workers=args.workers,
+                checkpoint_dir=args.checkpoint_dir,
+                resume_dirs=[args.resume_dir],
+            )
+            best = search_result['best']
+            logger.info(f"Best trial {best['trial']}: validation RMSE {best['val_rmse']:.2f} "
+                        f"with {best['n_estimators']} trees, {best['params']}")
+            
+            # Refit the winner on all training rows with every core
+            hyperparameters = {"tree_method": "hist", "n_estimators": best['n_estimators'], **best['params']}
+            model = xgb.XGBRegressor(random_state=42, n_jobs=available_cores(), **hyperparameters)
+            model.fit(X_train, y_train)
+    training_seconds = time.perf_counter() - training_start
     
-    # Train XGBoost model
-    model = xgb.XGBRegressor(n_estimators=100, random_state=42)
-    model.fit(X_train, y_train)
+    # Lineage: where this version came from and, for increments, the time saved over a full retrain
+    lineage = {
+        "mode": "incremental" if incremental else "full",
+        "parent_version": parent_metadata.get("version") if incremental else None,
+        "chain_depth": gates["chain_depth"] if incremental else 0,
+        "rows_total": len(y),
+        "rows_added": len(y) - segments[-2] if incremental else len(y),
+        "training_seconds": round(training_seconds, 3),
+    }
+    if incremental:
+        parent_lineage = parent_metadata.get("lineage", {})
+        lineage["boosting_rounds_added"] = rounds
+        full_seconds, full_rows = parent_lineage.get("full_training_seconds"), parent_lineage.get("full_training_rows")
+        if full_seconds and full_rows:
+            # A full retrain's cost grows with the training rows
+            estimated_full_seconds = full_seconds * len(train_idx) / full_rows
+            lineage.update(
+                full_training_seconds=full_seconds,
+                full_training_rows=full_rows,
+                estimated_full_seconds=round(estimated_full_seconds, 3),
+                time_saved_seconds=round(estimated_full_seconds - training_seconds, 3),
+            )
+    else:
+        lineage.update(full_training_seconds=round(training_seconds, 3), full_training_rows=len(train_idx))
+    if args.incremental:
+        lineage["gates"] = gates
+        if fallback_reasons:
+            lineage["fallback_reasons"] = fallback_reasons
+    logger.info(f"Trained ({lineage['mode']}) in {training_seconds:.1f}s")
     
     # Get model version
     model_version = get_version()
@@ -68,32 +256,57 @@ if __name__ == "__main__":
     joblib.dump(model, model_file)
     logger.info(f"Model saved to: {model_file}")
     
-    # Create versioned tar.gz for SageMaker
-    import tarfile
-    tar_file = os.path.join(model_path, "model.tar.gz")
-    with tarfile.open(tar_file, "w:gz") as tar:
-        tar.add(model_file, arcname="house_price_model.pkl")
-    logger.info(f"Model tar.gz created: {tar_file}")
+    # Also save the booster in XGBoost's native UBJSON format for fast loading in the API
+    native_model_file = os.path.join(model_path, "house_price_model.ubj")
+    model.save_model(native_model_file)
+    logger.info(f"Native model saved to: {native_model_file}")
     
-    # Log metrics
+    # Log metrics on the held-out rows of every segment
     y_pred = model.predict(X_test)
     mae = float(mean_absolute_error(y_test, y_pred))
     r2 = float(r2_score(y_test, y_pred))
     
+    # Calibrate prediction intervals on the same held-out rows, which the model never trained on
+    locations, location_names = location_codes(X_test, feature_names)
+    interval_table = fit_interval_table(y_test, y_pred, locations, location_names, coverage=args.interval_coverage)
+    intervals_file = os.path.join(model_path, INTERVALS_FILE)
+    save_interval_table(interval_table, intervals_file)
+    if interval_table["coverage"] < args.interval_coverage:
+        logger.warning(f"{len(y_test)} calibration rows cannot give {args.interval_coverage:.0%} coverage; "
+                       f"intervals promise {interval_table['coverage']:.0%} instead")
+    logger.info(f"Prediction intervals ({interval_table['coverage']:.0%}) calibrated on {len(y_test)} rows: {intervals_file}")
+    
     # Save version metadata
     version_metadata = {
         "version": model_version,
         "git_commit": get_git_commit(),
         "timestamp": get_timestamp(),
         "model_type": "XGBRegressor",
-        "metrics": {"mae": mae, "r2": r2}
+        "hyperparameters": hyperparameters,
+        "metrics": {"mae": mae, "r2": r2},
+        "intervals": {"coverage": interval_table["coverage"], "calibration_rows": len(y_test),
+                      "locations": sorted(interval_table["locations"])},
+        "data": {"rows": len(y), "target_digest": target_digest(y), "segments": segments},
+        "lineage": lineage,
     }
+    if search_result is not None:
+        version_metadata["search"] = search_result
     
     metadata_file = os.path.join(model_path, "version_metadata.json")
     with open(metadata_file, 'w') as f:
         json.dump(version_metadata, f, indent=2)
     logger.info(f"Version metadata saved: {metadata_file}")
     
+    # Create versioned tar.gz for SageMaker
+    import tarfile
+    tar_file = os.path.join(model_path, "model.tar.gz")
+    with tarfile.open(tar_file, "w:gz") as tar:
+        tar.add(model_file, arcname="house_price_model.pkl")
+        tar.add(native_model_file, arcname="house_price_model.ubj")
+        tar.add(metadata_file, arcname="version_metadata.json")
+        tar.add(intervals_file, arcname=INTERVALS_FILE)
+    logger.info(f"Model tar.gz created: {tar_file}")
+    
     logger.info(f"Model trained - MAE: {mae:.2f}, R²: {r2:.4f}")
     print(f"Training completed successfully!")
     print(f"Model Version: {model_version}")
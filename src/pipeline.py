@@ -0,0 +1,130 @@
+# src/pipeline.py
+"""
+Run processing -> feature engineering -> training -> evaluation locally,
+skipping every stage whose inputs, code and parameters are unchanged since a
+cached run (see data/stage_cache.py).
+
+    python src/pipeline.py --raw data/raw/house_data.csv --work-dir build/pipeline
+
+Each stage runs its own script in a subprocess, exactly as SageMaker runs it,
+with its output directory under --work-dir.
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(SRC_DIR, 'data'))
+from stage_cache import StageCache, code_closure, open_cache
+from storage import find_input_file, stage_output_path
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('pipeline')
+
+# Environment variables each stage reads, which are part of its cache key
+STAGE_ENVIRONMENT = {
+    'process': ('PIPELINE_DATA_FORMAT', 'PROCESSING_CHUNK_SIZE'),
+    'features': ('PIPELINE_DATA_FORMAT', 'SPARSE_FEATURES', 'PREVIOUS_PREPROCESSOR'),
+    # Not GITHUB_SHA: it only names the version, and would make every commit miss
+    'train': ('SEARCH_STRATEGY', 'SEARCH_CONFIGS', 'SEARCH_WORKERS', 'INCREMENTAL_TRAINING', 'PREVIOUS_MODEL_URI',
+              'INTERVAL_COVERAGE'),
+    'evaluate': ('EVALUATION_BOOTSTRAP', 'EVALUATION_GATE'),
+}
+
+# Directories each stage's script puts on sys.path, where its repository imports resolve
+STAGE_SEARCH_PATH = {
+    'process': ['data'],
+    'features': ['features', 'data'],
+    'train': ['models', 'data'],
+    'evaluate': ['models', 'data'],
+}
+
+STAGE_SCRIPTS = {
+    'process': 'data/run_processing.py',
+    'features': 'features/engineer.py',
+    'train': 'models/train_model.py',
+    'evaluate': 'models/evaluate_model.py',
+}
+
+
+def run_script(script, args):
+    command = [sys.executable, os.path.join(SRC_DIR, script), *args]
+    logger.info(f"Running {' '.join(command)}")
+    subprocess.run(command, check=True)
+
+
+def run_stage(cache, stage, inputs, output_dir, args, cacheable=True):
+    script = STAGE_SCRIPTS[stage]
+    search_path = [os.path.join(SRC_DIR, directory) for directory in STAGE_SEARCH_PATH[stage]]
+    params = {
+        # Paths only by file name: their contents are in the key already, and the work directory may move
+        'args': [os.path.basename(arg) if os.path.isabs(arg) else arg for arg in args],
+        'environment': {name: os.getenv(name) for name in STAGE_ENVIRONMENT[stage]},
+    }
+    return cache.run(
+        stage,
+        lambda: run_script(script, args),
+        inputs,
+        output_dir,
+        code_closure(os.path.join(SRC_DIR, script), search_path),
+        params,
+        cacheable=cacheable,
+    )
+
+
+def run_pipeline(raw_file, work_dir, cache):
+    """Run the four stages in order through cache; returns the per-stage statistics."""
+    dirs = {stage: os.path.abspath(os.path.join(work_dir, stage)) for stage in STAGE_SCRIPTS}
+    sparse = os.getenv("SPARSE_FEATURES", "false").lower() == "true"
+
+    cleaned_file = stage_output_path(dirs['process'], "cleaned_house_data")
+    run_stage(cache, 'process', {'raw': raw_file}, dirs['process'],
+              ['--input', os.path.abspath(raw_file), '--output', cleaned_file])
+
+    featured_file = stage_output_path(dirs['features'], "featured_house_data", 'sparse' if sparse else None)
+    run_stage(cache, 'features', {'cleaned': cleaned_file}, dirs['features'],
+              ['--input', cleaned_file, '--output', featured_file])
+
+    # Incremental training depends on the previous model version, which is not part of the key
+    incremental = os.getenv("INCREMENTAL_TRAINING", "false").lower() == "true"
+    checkpoint_dir = os.path.abspath(os.path.join(work_dir, "search-checkpoints"))
+    run_stage(cache, 'train', {'featured': featured_file}, dirs['train'],
+              ['--input', featured_file, '--output', dirs['train'],
+               '--checkpoint-dir', checkpoint_dir, '--resume-dir', checkpoint_dir],
+              cacheable=not incremental)
+
+    run_stage(cache, 'evaluate', {'model': os.path.join(dirs['train'], "house_price_model.pkl"),
+                                  'featured': find_input_file(dirs['features'])}, dirs['evaluate'],
+              ['--model-dir', dirs['train'], '--data-dir', dirs['features'], '--output', dirs['evaluate']])
+    return cache.stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the training pipeline locally with a stage cache")
+    parser.add_argument("--raw", default="data/raw/house_data.csv", help="Raw house data file")
+    parser.add_argument("--work-dir", default="build/pipeline", help="Directory for the stages' outputs")
+    parser.add_argument("--cache", default=os.getenv("PIPELINE_CACHE", ".cache/pipeline"),
+                        help="Cache location: a directory or a URI of a registered backend")
+    parser.add_argument("--no-cache", action="store_true", help="Run every stage without reading or writing the cache")
+    parser.add_argument("--cache-max-mb", type=float, default=2048,
+                        help="Least recently used entries are pruned beyond this size (local caches)")
+    args = parser.parse_args()
+
+    backend = open_cache(args.cache)
+    stats = run_pipeline(args.raw, args.work_dir, StageCache(backend, enabled=not args.no_cache))
+
+    if hasattr(backend, 'prune'):
+        pruned = backend.prune(int(args.cache_max_mb * 1e6))
+        if pruned:
+            logger.info(f"Pruned {pruned} least recently used cache entries")
+
+    stats_file = os.path.join(args.work_dir, "cache_stats.json")
+    with open(stats_file, 'w') as f:
+        json.dump(stats, f, indent=2)
+    hits = sum(stage['result'] == 'hit' for stage in stats)
+    saved = sum(stage.get('saved_seconds', 0) for stage in stats)
+    logger.info(f"{hits}/{len(stats)} stages restored from the cache, {saved:.1f}s of work skipped "
+                f"(stats in {stats_file})")
@@ -23,6 +23,18 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
+# Display names for the features the API attributes predictions to
+FEATURE_LABELS = {
+    "sqft": "Square Footage",
+    "bedrooms": "Bedrooms",
+    "bathrooms": "Bathrooms",
+    "house_age": "House Age",
+    "price_per_sqft": "Price per Sq Ft",
+    "bed_bath_ratio": "Bedroom/Bathroom Ratio",
+    "location": "Location",
+    "condition": "Condition",
+}
+
 # Create a two-column layout
 col1, col2 = st.columns(2, gap="large")
 
@@ -85,8 +97,8 @@ with col2:
 
                 st.write(f"Connecting to API at: {predict_url}")
 
-                # Make API call to FastAPI backend
-                response = requests.post(predict_url, json=api_data)
+                # Make API call to FastAPI backend, asking for per-feature attributions
+                response = requests.post(predict_url, json=api_data, params={"explain": "true"})
                 response.raise_for_status()  # Raise exception for bad status codes
                 prediction = response.json()
 
@@ -101,9 +113,9 @@ with col2:
                     "predicted_price": 467145,
                     "confidence_interval": [420430.5, 513859.5],
                     "features_importance": {
-                        "sqft": 0.43,
-                        "location": 0.27,
-                        "bathrooms": 0.15
+                        "sqft": 61500.0,
+                        "location": 38600.0,
+                        "bathrooms": 21400.0
                     },
                     "prediction_time": "0.12 seconds"
                 }
@@ -117,12 +129,14 @@ with col2:
         formatted_price = "${:,.0f}".format(pred["predicted_price"])
         st.markdown(f'<div class="prediction-value">{formatted_price}</div>', unsafe_allow_html=True)
 
-        # Display confidence score and model used
+        # Display the interval's calibrated coverage and model used
+        coverage = pred.get("interval_coverage")
         col_a, col_b = st.columns(2)
         with col_a:
             st.markdown('<div class="info-card">', unsafe_allow_html=True)
-            st.markdown('<p class="info-label">Confidence Score</p>', unsafe_allow_html=True)
-            st.markdown('<p class="info-value">92%</p>', unsafe_allow_html=True)
+            st.markdown('<p class="info-label">Interval Coverage</p>', unsafe_allow_html=True)
+            st.markdown(f'<p class="info-value">{"{:.0%}".format(coverage) if coverage else "Not calibrated"}</p>',
+                        unsafe_allow_html=True)
             st.markdown('</div>', unsafe_allow_html=True)
 
         with col_b:
@@ -147,15 +161,18 @@ with col2:
             st.markdown('<p class="info-value">0.12 seconds</p>', unsafe_allow_html=True)
             st.markdown('</div>', unsafe_allow_html=True)
 
-        # Top factors
+        # Top factors: the features with the largest attributions (the API returns them largest first)
         st.markdown('<div class="top-factors">', unsafe_allow_html=True)
         st.markdown("<p><strong>Top Factors Affecting Price:</strong></p>", unsafe_allow_html=True)
-        st.markdown("""
-        <ul>
-            <li>Square Footage</li>
-            <li>Number of Bedrooms/Bathrooms</li>
-        </ul>
-        """, unsafe_allow_html=True)
+        factors = list(pred.get("features_importance", {}).items())[:3]
+        if factors:
+            items = "".join(
+                f"<li>{FEATURE_LABELS.get(name, name)}: {'+' if value >= 0 else '-'}${abs(value):,.0f}</li>"
+                for name, value in factors
+            )
+            st.markdown(f"<ul>{items}</ul>", unsafe_allow_html=True)
+        else:
+            st.markdown("<p>Not available for this model.</p>", unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
     else:
         # Display placeholder message
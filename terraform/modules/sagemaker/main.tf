@@ -125,6 +125,11 @@ resource "aws_sagemaker_pipeline" "house_price_pipeline" {
             ImageUri = var.ecr_repository_url
             ContainerEntrypoint = ["python3", "src/models/train_model.py"]
           }
+          Environment = {
+            # "true" continues the latest deployed version on appended rows (see train_model.py --incremental)
+            INCREMENTAL_TRAINING = "false"
+            PREVIOUS_MODEL_URI   = "s3://${var.s3_bucket_name}/models/house-price-model"
+          }
           ProcessingInputs = [
             {
               InputName = "training-data"
@@ -134,6 +139,16 @@ resource "aws_sagemaker_pipeline" "house_price_pipeline" {
                 S3DataType = "S3Prefix"
                 S3InputMode = "File"
               }
+            },
+            {
+              # Trials finished by a previous attempt; train_model.py resumes the search from them
+              InputName = "search-checkpoints"
+              S3Input = {
+                S3Uri = "s3://${var.s3_bucket_name}/checkpoints/search/"
+                LocalPath = "/opt/ml/processing/input/checkpoints"
+                S3DataType = "S3Prefix"
+                S3InputMode = "File"
+              }
             }
           ]
           ProcessingOutputConfig = {
@@ -145,6 +160,15 @@ resource "aws_sagemaker_pipeline" "house_price_pipeline" {
                   LocalPath = "/opt/ml/processing/output"
                   S3UploadMode = "EndOfJob"
                 }
+              },
+              {
+                # Uploaded as trials complete, so they survive an interrupted job
+                OutputName = "search-checkpoints"
+                S3Output = {
+                  S3Uri = "s3://${var.s3_bucket_name}/checkpoints/search/"
+                  LocalPath = "/opt/ml/processing/checkpoints"
+                  S3UploadMode = "Continuous"
+                }
               }
             ]
           }
@@ -225,6 +249,13 @@ resource "aws_sagemaker_pipeline" "house_price_pipeline" {
   })
 }
 
+# Keeps the search checkpoint prefix non-empty, so the TrainModel input exists on the first run
+resource "aws_s3_object" "search_checkpoints" {
+  bucket  = var.s3_bucket_name
+  key     = "checkpoints/search/.keep"
+  content = ""
+}
+
 # Get Git commit for versioning
 data "external" "git_version" {
   program = ["bash", "-c", <<-EOT
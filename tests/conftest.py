@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The API and pipeline modules import each other by bare module name, as they run in the container
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+for directory in ('src/api', 'src/features', 'src/data', 'src/models'):
+    sys.path.insert(0, os.path.join(ROOT, directory))
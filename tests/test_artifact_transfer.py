@@ -0,0 +1,106 @@
+"""
+The S3 transfer layer (src/models/artifact_transfer.py) and ModelDeployer's
+listing against moto's in-process S3 stand-in.
+"""
+import hashlib
+import logging
+import os
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from artifact_transfer import ArtifactCache, ChecksumMismatch, download_artifact, upload_artifact
+from deploy_model import ModelDeployer
+
+BUCKET = "models-test"
+MiB = 1024 * 1024
+# moto, like S3, rejects multipart parts under 5 MiB
+PART_SIZE = 5 * MiB
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_SESSION_TOKEN"):
+        monkeypatch.setenv(name, "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.delenv("AWS_ENDPOINT_URL", raising=False)
+    with mock_aws():
+        client = boto3.client("s3")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    path = tmp_path / "model.tar.gz"
+    path.write_bytes(os.urandom(2 * PART_SIZE + 123))
+    return path
+
+
+def count_calls(client, operation):
+    calls = []
+    client.meta.events.register(f"before-parameter-build.s3.{operation}", lambda params, **kwargs: calls.append(dict(params)))
+    return calls
+
+
+def test_multipart_upload_and_ranged_download(s3, artifact, tmp_path):
+    sha256 = upload_artifact(s3, str(artifact), BUCKET, "a/model.tar.gz", part_size=PART_SIZE)
+    head = s3.head_object(Bucket=BUCKET, Key="a/model.tar.gz")
+    assert head["ETag"].strip('"').endswith("-3")
+    assert head["Metadata"]["sha256"] == sha256 == hashlib.sha256(artifact.read_bytes()).hexdigest()
+
+    ranges = count_calls(s3, "GetObject")
+    destination = tmp_path / "out" / "model.tar.gz"
+    assert download_artifact(s3, BUCKET, "a/model.tar.gz", str(destination), part_size=MiB) == sha256
+    assert destination.read_bytes() == artifact.read_bytes()
+    assert len(ranges) == 11
+    assert all(call["IfMatch"] == head["ETag"] for call in ranges)
+    assert os.listdir(destination.parent) == ["model.tar.gz"]
+
+
+def test_checksum_mismatch_leaves_no_partial_file(s3, tmp_path):
+    s3.put_object(Bucket=BUCKET, Key="bad", Body=b"abc" * 1000, Metadata={"sha256": "0" * 64})
+    destination = tmp_path / "out" / "bad"
+    with pytest.raises(ChecksumMismatch):
+        download_artifact(s3, BUCKET, "bad", str(destination), part_size=1000)
+    assert os.listdir(destination.parent) == []
+
+
+def test_list_model_versions_pages_and_caches(s3, artifact):
+    deployer = ModelDeployer(BUCKET, s3_client=s3, part_size=PART_SIZE, listing_ttl=3600)
+    for i in range(1005):
+        s3.put_object(Bucket=BUCKET, Key=f"models/house-price-model/v{i:05d}/model.tar.gz", Body=b"")
+    s3.put_object(Bucket=BUCKET, Key="models/house-price-model/latest/version.txt", Body=b"v01004")
+
+    pages = count_calls(s3, "ListObjectsV2")
+    versions = deployer.list_model_versions()
+    assert len(versions) == 1005 and versions[0] == "v01004" and "latest" not in versions
+    assert len(pages) == 2
+
+    # Served from the cache until the TTL runs out...
+    s3.put_object(Bucket=BUCKET, Key="models/house-price-model/v99999/model.tar.gz", Body=b"")
+    assert len(deployer.list_model_versions()) == 1005
+    assert len(pages) == 2
+    # ...or an upload through the deployer invalidates it
+    deployer.upload_versioned_model(str(artifact), version="v99998")
+    versions = deployer.list_model_versions()
+    assert len(versions) == 1007 and versions[:2] == ["v99999", "v99998"]
+    assert deployer.latest_version() == "v99998"
+
+
+def test_artifact_cache_hit(s3, artifact, tmp_path, caplog):
+    upload_artifact(s3, str(artifact), BUCKET, "a/model.tar.gz", part_size=PART_SIZE)
+    cache = ArtifactCache(str(tmp_path / "cache"), part_size=2 * MiB)
+    gets = count_calls(s3, "GetObject")
+
+    first = cache.fetch(s3, BUCKET, "a/model.tar.gz")
+    downloads = len(gets)
+    assert downloads > 0
+    with caplog.at_level(logging.INFO, logger="artifact_transfer"):
+        second = cache.fetch(s3, BUCKET, "a/model.tar.gz")
+    assert second == first
+    assert len(gets) == downloads
+    assert "Artifact cache hit" in caplog.text
+    with open(first, "rb") as f:
+        assert f.read() == artifact.read_bytes()
@@ -0,0 +1,39 @@
+"""MicroBatcher (src/api/batching.py): batching and per-batcher metrics."""
+import asyncio
+
+from prometheus_client import REGISTRY
+
+from batching import MicroBatcher
+
+
+def sample(name, batcher):
+    return REGISTRY.get_sample_value(name, {'batcher': batcher}) or 0
+
+
+def test_batches_are_reported_per_batcher():
+    batches = []
+
+    async def predict(requests):
+        batches.append(len(requests))
+        return [request * 2 for request in requests]
+
+    async def run():
+        plain = MicroBatcher(predict, max_batch_size=8, max_wait_us=50_000, name='test-plain')
+        explain = MicroBatcher(predict, max_batch_size=8, max_wait_us=50_000, name='test-explain')
+        await plain.start()
+        await explain.start()
+        try:
+            return await asyncio.gather(*[plain.submit(i) for i in range(8)], explain.submit(100))
+        finally:
+            await plain.stop()
+            await explain.stop()
+
+    before = {batcher: sample('predict_batch_size_count', batcher) for batcher in ('test-plain', 'test-explain')}
+    assert asyncio.run(run()) == [0, 2, 4, 6, 8, 10, 12, 14, 200]
+    assert sorted(batches) == [1, 8]
+    assert sample('predict_batch_size_count', 'test-plain') - before['test-plain'] == 1
+    assert sample('predict_batch_size_sum', 'test-plain') == 8
+    assert sample('predict_batch_size_count', 'test-explain') - before['test-explain'] == 1
+    assert sample('predict_batch_size_sum', 'test-explain') == 1
+    assert sample('predict_batch_queue_wait_seconds_count', 'test-plain') == 8
+    assert sample('predict_batch_queue_wait_seconds_count', 'test-explain') == 1
@@ -0,0 +1,146 @@
+"""
+Parity of the compiled preprocessing plan (src/api/compiled_preprocessor.py)
+with the fitted ColumnTransformer it replaces: every encoded value and every
+prediction must be identical, not merely close.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+from xgboost import XGBRegressor
+
+from compiled_preprocessor import CompiledPreprocessor
+from engineer import create_features, create_preprocessor, export_preprocessor_spec
+from schemas import HousePredictionRequest
+from registry import ModelBundle
+import inference
+
+LOCATIONS = ['Downtown', 'Mountain', 'Rural', 'Suburb', 'Urban', 'Waterfront']
+CONDITIONS = ['Excellent', 'Fair', 'Good', 'Poor']
+
+
+def training_frame(rows=400, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'sqft': rng.uniform(500, 5000, rows).round(),
+        'bedrooms': rng.integers(1, 6, rows),
+        'bathrooms': rng.choice([1.0, 1.5, 2.0, 2.5, 3.0], rows),
+        'location': rng.choice(LOCATIONS, rows),
+        'year_built': rng.integers(1900, 2023, rows),
+        'condition': rng.choice(CONDITIONS, rows),
+    })
+    df['price'] = df['sqft'] * 200 + df['bedrooms'] * 10000 + rng.normal(0, 20000, rows)
+    # Missing values, so the imputer's fitted means are exercised
+    df.loc[df.index[::17], 'sqft'] = np.nan
+    df.loc[df.index[::23], 'bathrooms'] = np.nan
+    return df
+
+
+def requests(n=300, seed=1):
+    """Requests including locations and conditions the encoder never saw."""
+    rng = np.random.default_rng(seed)
+    return [HousePredictionRequest(sqft=float(rng.uniform(300, 8000)), bedrooms=int(rng.integers(1, 8)),
+                                   bathrooms=float(rng.choice([0.5, 1, 1.5, 2, 3.5])),
+                                   location=str(rng.choice(LOCATIONS + ['Mars', 'suburban', ''])),
+                                   year_built=int(rng.integers(1800, 2024)),
+                                   condition=str(rng.choice(CONDITIONS + ['Unknown'])))
+            for _ in range(n)]
+
+
+def nan_requests():
+    """Requests with missing numerics, which validation rejects but the plan must still impute like sklearn."""
+    construct = getattr(HousePredictionRequest, 'model_construct', None) or HousePredictionRequest.construct
+    return [
+        construct(sqft=float('nan'), bedrooms=3, bathrooms=2.0, location='Urban', year_built=2000,
+                  condition='Good', model_version=None),
+        construct(sqft=1500.0, bedrooms=2, bathrooms=float('nan'), location='Mars', year_built=1990,
+                  condition='Poor', model_version=None),
+        construct(sqft=float('nan'), bedrooms=4, bathrooms=float('nan'), location='Rural', year_built=1950,
+                  condition='Unknown', model_version=None),
+    ]
+
+
+def dense(matrix):
+    return matrix.toarray() if sparse.issparse(matrix) else np.asarray(matrix)
+
+
+@pytest.fixture(scope='module', params=[False, True], ids=['dense', 'sparse'])
+def fitted(request):
+    """(preprocessor, model) fitted the way the training pipeline fits them."""
+    df = create_features(training_frame())
+    X, y = df.drop(columns=['price']), df['price']
+    preprocessor = create_preprocessor(sparse=request.param)
+    X_encoded = preprocessor.fit_transform(X)
+    model = XGBRegressor(n_estimators=20, max_depth=4, random_state=0).fit(X_encoded, y)
+    return preprocessor, model
+
+
+def expected(preprocessor, batch):
+    return preprocessor.transform(inference._prepare_features(batch))
+
+
+def assert_identical(actual, wanted):
+    assert sparse.issparse(actual) == sparse.issparse(wanted)
+    if sparse.issparse(wanted):
+        # Same stored entries as sklearn: XGBoost treats unstored cells as missing
+        assert actual.nnz == wanted.nnz
+    np.testing.assert_array_equal(dense(actual), dense(wanted))
+
+
+def test_transform_one_matches_preprocessor(fitted):
+    preprocessor, _ = fitted
+    compiled = CompiledPreprocessor.compile(preprocessor)
+    for request in requests() + nan_requests():
+        assert_identical(compiled.transform_one(request), expected(preprocessor, [request]))
+
+
+def test_transform_matches_preprocessor(fitted):
+    preprocessor, _ = fitted
+    compiled = CompiledPreprocessor.compile(preprocessor)
+    batch = requests() + nan_requests()
+    assert_identical(compiled.transform(batch), expected(preprocessor, batch))
+
+
+def test_from_spec_matches_preprocessor(fitted, tmp_path):
+    preprocessor, _ = fitted
+    spec_path = str(tmp_path / 'preprocessor_spec.json')
+    export_preprocessor_spec(preprocessor, spec_path)
+    compiled = CompiledPreprocessor.from_spec(spec_path)
+    assert compiled.sparse_output == bool(preprocessor.sparse_output_)
+    batch = requests() + nan_requests()
+    assert_identical(compiled.transform(batch), expected(preprocessor, batch))
+    for request in batch[:50]:
+        assert_identical(compiled.transform_one(request), expected(preprocessor, [request]))
+
+
+def test_feature_names_match_preprocessor(fitted):
+    preprocessor, _ = fitted
+    names = [name.split('__', 1)[-1] for name in preprocessor.get_feature_names_out()]
+    assert CompiledPreprocessor.compile(preprocessor).feature_names_out() == names
+
+
+def test_all_missing_column_is_dropped_like_sklearn():
+    df = create_features(training_frame())
+    df['bathrooms'] = np.nan
+    preprocessor = create_preprocessor().fit(df.drop(columns=['price']))
+    compiled = CompiledPreprocessor.compile(preprocessor)
+    assert 'bathrooms' not in compiled.numerical_features
+    batch = requests(50)
+    assert_identical(compiled.transform(batch), expected(preprocessor, batch))
+
+
+def test_predict_price_identical_on_compiled_and_pandas_paths(fitted):
+    preprocessor, model = fitted
+    compiled_bundle = ModelBundle(model, preprocessor, 'compiled')
+    pandas_bundle = ModelBundle(model, preprocessor, 'pandas')
+    pandas_bundle.compiled = None
+    assert compiled_bundle.compiled is not None
+
+    batch = requests()
+    for request in batch:
+        fast = inference.predict_price(request, compiled_bundle)
+        slow = inference.predict_price(request, pandas_bundle)
+        assert fast.predicted_price == slow.predicted_price
+        assert fast.confidence_interval == slow.confidence_interval
+        assert inference.predict_raw(request, compiled_bundle) == inference.predict_raw(request, pandas_bundle)
+    assert inference.batch_predict(batch, compiled_bundle) == inference.batch_predict(batch, pandas_bundle)
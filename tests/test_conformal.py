@@ -0,0 +1,61 @@
+"""Finite-sample guarantees of the conformal interval table (src/models/conformal.py)."""
+import numpy as np
+import pytest
+
+from conformal import (MIN_CELL_ROWS, achievable_coverage, conformal_bounds, conformal_min_rows,
+                       fit_interval_table, interval_coverage)
+
+
+def test_min_rows():
+    assert conformal_min_rows(0.9) == 19
+    assert conformal_min_rows(0.8) == 9
+    assert conformal_min_rows(0.99) == 199
+    for n in range(1, 50):
+        assert conformal_min_rows(achievable_coverage(n)) == n
+
+
+def test_bounds_refuse_too_few_rows():
+    residuals = np.arange(18, dtype=np.float64)
+    with pytest.raises(ValueError, match="cannot give 90% coverage"):
+        conformal_bounds(residuals, 0.9)
+    # At exactly the minimum the interval spans the extreme residuals
+    assert conformal_bounds(np.arange(19, dtype=np.float64), 0.9) == (0.0, 18.0)
+
+
+def test_bounds_reach_coverage():
+    rng = np.random.default_rng(0)
+    for n in (19, 30, 57, 200):
+        hits = []
+        for _ in range(2000):
+            residuals = rng.normal(size=n + 1)
+            low, high = conformal_bounds(np.sort(residuals[:n]), 0.9)
+            hits.append(low <= residuals[n] <= high)
+        # The guarantee is marginal over calibration sets: at least 90%, give or take the simulation error
+        assert np.mean(hits) >= 0.88
+
+
+def test_small_calibration_set_records_achievable_coverage():
+    rng = np.random.default_rng(1)
+    y, pred = rng.normal(size=10), np.zeros(10)
+    table = fit_interval_table(y, pred, np.zeros(10, dtype=int), ['Urban'], coverage=0.9)
+    assert table["coverage"] == pytest.approx(9 / 11)
+    residuals = np.sort(y - pred)
+    assert table["overall"] == [[residuals[0], residuals[-1]]] * len(table["overall"])
+
+
+def test_empty_calibration_set_fails():
+    with pytest.raises(ValueError, match="No calibration rows"):
+        fit_interval_table([], [], np.array([], dtype=int), ['Urban'])
+
+
+def test_cells_too_small_for_coverage_fall_back():
+    rng = np.random.default_rng(2)
+    n = 1000
+    y, pred = rng.normal(size=n) * 10, rng.uniform(0, 100, n)
+    locations = rng.integers(0, 2, n)
+    # 99% coverage needs 199 rows per cell: the 50-row price bins of each location are too few
+    table = fit_interval_table(y, pred, locations, ['Urban', 'Rural'], coverage=0.99)
+    assert table["coverage"] == 0.99
+    assert all(bounds == table["overall"] for bounds in table["locations"].values())
+    assert MIN_CELL_ROWS < conformal_min_rows(0.99)
+    assert interval_coverage(table, y, pred, locations, ['Urban', 'Rural']) >= 0.99
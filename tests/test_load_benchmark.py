@@ -0,0 +1,64 @@
+"""The load test's report (summarize) and its regression check against a baseline (compare)."""
+import copy
+import importlib.util
+import os
+
+import pytest
+
+LOAD_BENCHMARK = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks', 'load_benchmark.py')
+spec = importlib.util.spec_from_file_location('load_benchmark', LOAD_BENCHMARK)
+load_benchmark = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(load_benchmark)
+
+
+def report(rows_per_second=1000.0, p99=20.0, errors=0):
+    return {"scenarios": {
+        "predict_c8": {"rows_per_second": rows_per_second, "errors": errors,
+                       "latency_ms": {"p50": 5.0, "p99": p99}},
+        "batch_100_c4": {"rows_per_second": 50000.0, "errors": 0, "latency_ms": {"p50": 8.0, "p99": 30.0}},
+    }}
+
+
+def test_summarize():
+    latencies = [i / 1000 for i in range(1, 1001)]  # 1..1000 ms
+    summary = load_benchmark.summarize(latencies, errors=3, elapsed=2.0, rows_per_request=10)
+    assert summary["requests"] == 1003
+    assert summary["errors"] == 3
+    assert summary["requests_per_second"] == 500.0
+    assert summary["rows_per_second"] == 5000.0
+    assert summary["latency_ms"]["p50"] == pytest.approx(500.5)
+    assert summary["latency_ms"]["p99"] == pytest.approx(990.01)
+    assert summary["latency_ms"]["max"] == 1000.0
+
+
+def test_summarize_without_successes():
+    summary = load_benchmark.summarize([], errors=5, elapsed=1.0, rows_per_request=1)
+    assert summary["requests"] == 5
+    assert summary["rows_per_second"] == 0.0
+    assert summary["latency_ms"]["p99"] == 0.0
+
+
+def test_compare_passes_within_tolerance():
+    baseline = report()
+    # Slightly slower, but within 10%; scenarios missing from either run are skipped
+    current = report(rows_per_second=950.0, p99=21.5)
+    current["scenarios"]["predict_c32"] = current["scenarios"]["predict_c8"]
+    assert load_benchmark.compare(current, baseline, 0.10) == []
+    assert load_benchmark.compare(baseline, baseline, 0.0) == []
+
+
+@pytest.mark.parametrize("current, expected", [
+    (report(rows_per_second=850.0), "predict_c8: throughput 1000.0 -> 850.0 rows/s"),
+    (report(p99=23.0), "predict_c8: p99 20.0 -> 23.0 ms"),
+    (report(errors=1), "predict_c8: errors 0 -> 1"),
+])
+def test_compare_flags_regressions(current, expected):
+    assert load_benchmark.compare(current, report(), 0.10) == [expected]
+
+
+def test_compare_reports_every_regression():
+    current = copy.deepcopy(report(rows_per_second=500.0, p99=40.0, errors=2))
+    current["scenarios"]["batch_100_c4"]["rows_per_second"] = 10000.0
+    regressions = load_benchmark.compare(current, report(), 0.10)
+    assert len(regressions) == 4
+    assert regressions[-1].startswith("batch_100_c4: throughput")
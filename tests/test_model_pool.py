@@ -0,0 +1,80 @@
+"""Concurrency of ModelPool (src/api/registry.py): loads of one version must not block the others."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import registry
+from registry import ModelPool, ModelRegistry, UnknownModelVersion
+
+
+class FakeBundle:
+    def __init__(self, version):
+        self.version = version
+        self.size_bytes = 1
+
+
+class FakeStore:
+    def __init__(self, versions):
+        self.versions = versions
+
+    def artifact_paths(self, version):
+        if version not in self.versions:
+            raise UnknownModelVersion(f"Model version not found: {version}")
+        return f"{version}/model.pkl", f"{version}/preprocessor.pkl"
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Versions passed to load_bundle; loading 'slow' blocks until release is set."""
+    calls, release = [], threading.Event()
+
+    def load_bundle(model_path, preprocessor_path, version=None):
+        calls.append(version)
+        if version == 'slow':
+            assert release.wait(5)
+        return FakeBundle(version)
+
+    monkeypatch.setattr(registry, 'load_bundle', load_bundle)
+    return calls, release
+
+
+def test_loaded_versions_are_served_while_another_loads(loads):
+    calls, release = loads
+    pool = ModelPool(ModelRegistry(), FakeStore({'slow', 'a', 'b'}), memory_budget_bytes=10)
+    pool.get('a')
+    with ThreadPoolExecutor(4) as executor:
+        slow = executor.submit(pool.get, 'slow')
+        while 'slow' not in calls:
+            time.sleep(0.001)
+        # Neither an already loaded version nor a new one waits for the slow load
+        assert executor.submit(pool.get, 'a').result(timeout=1).version == 'a'
+        assert executor.submit(pool.get, 'b').result(timeout=1).version == 'b'
+        assert not slow.done()
+        release.set()
+        assert slow.result(timeout=5).version == 'slow'
+    assert pool.versions() == ['a', 'b', 'slow']
+
+
+def test_concurrent_requests_for_one_version_load_it_once(loads):
+    calls, release = loads
+    pool = ModelPool(ModelRegistry(), FakeStore({'slow'}), memory_budget_bytes=10)
+    with ThreadPoolExecutor(8) as executor:
+        futures = [executor.submit(pool.get, 'slow') for _ in range(8)]
+        time.sleep(0.05)
+        release.set()
+        bundles = [future.result(timeout=5) for future in futures]
+    assert calls == ['slow']
+    assert all(bundle is bundles[0] for bundle in bundles)
+    assert pool._load_locks == {}
+
+
+def test_unknown_versions_leave_no_state(loads):
+    pool = ModelPool(ModelRegistry(), FakeStore(set()), memory_budget_bytes=10)
+    for _ in range(3):
+        with pytest.raises(UnknownModelVersion):
+            pool.get('missing')
+    assert pool._load_locks == {} and pool.versions() == []
+    with pytest.raises(UnknownModelVersion):
+        ModelPool(ModelRegistry(), None, memory_budget_bytes=10).get('missing')
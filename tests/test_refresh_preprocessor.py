@@ -0,0 +1,42 @@
+"""Refreshing a fitted preprocessor with appended rows (refresh_preprocessor in src/features/engineer.py)."""
+import numpy as np
+import pandas as pd
+
+from engineer import create_features, refresh_preprocessor, run_feature_engineering
+from test_compiled_preprocessor import training_frame
+
+
+def fit(tmp_path, df):
+    cleaned_file, preprocessor_file = tmp_path / "cleaned.csv", tmp_path / "preprocessor.pkl"
+    df.to_csv(cleaned_file, index=False)
+    run_feature_engineering(str(cleaned_file), str(tmp_path / "featured.csv"), str(preprocessor_file),
+                            sparse=False, previous_preprocessor='')
+    return str(preprocessor_file)
+
+
+def features(df):
+    return create_features(df).drop(columns=['price'])
+
+
+def test_appended_rows_refresh_means(tmp_path):
+    df = training_frame(rows=400)
+    preprocessor_file = fit(tmp_path, df.iloc[:300])
+    preprocessor, counts = refresh_preprocessor(preprocessor_file, features(df))
+    assert preprocessor is not None
+    imputer = preprocessor.named_transformers_['num'].named_steps['imputer']
+    expected = features(df)[['sqft', 'bedrooms', 'bathrooms', 'house_age', 'price_per_sqft', 'bed_bath_ratio']]
+    np.testing.assert_allclose(imputer.statistics_, expected.astype(np.float64).mean().to_numpy(), rtol=1e-6)  # The previous means are float32-rounded by sklearn
+    assert list(counts) == list(expected.notna().sum())
+
+
+def test_changed_prefix_refits(tmp_path):
+    df = training_frame(rows=400)
+    preprocessor_file = fit(tmp_path, df.iloc[:300])
+    # Outlier filtering over the grown dataset dropped an early row: same length, shifted rows
+    shifted = pd.concat([df.iloc[:10], df.iloc[11:302]])
+    preprocessor, reason = refresh_preprocessor(preprocessor_file, features(shifted))
+    assert preprocessor is None and 'not the rows the preprocessor was fitted on' in reason
+    # Re-imputation rewrote a fitted value in place
+    rewritten = df.copy()
+    rewritten.loc[1, 'sqft'] += 1
+    assert refresh_preprocessor(preprocessor_file, features(rewritten))[0] is None
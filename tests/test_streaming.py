@@ -0,0 +1,121 @@
+"""CSV/NDJSON parsing of the streaming bulk endpoint (src/api/streaming.py)."""
+import asyncio
+import csv
+import io
+import json
+import random
+
+import pytest
+
+import streaming
+from streaming import iter_lines, iter_records, score_stream
+
+
+async def chunked(body: bytes, size: int):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def records(body: bytes, fmt: str, chunk_size: int = 7) -> list:
+    async def collect():
+        return [item async for item in iter_records(iter_lines(chunked(body, chunk_size)), fmt)]
+    return asyncio.run(collect())
+
+
+HEADER = "id,sqft,bedrooms,bathrooms,location,year_built,condition\n"
+
+
+def test_quoted_newlines_stay_in_one_row():
+    body = (HEADER + 'a,1500,3,2,"Down\ntown",2000,Good\n'
+            'b,1200,2,1,"say ""hi""\n\nthere",1990,"Fa\nir"\n'
+            'c,900,1,1,Rural,1960,Poor\n').encode()
+    rows = records(body, 'csv')
+    assert [row_id for row_id, _, _ in rows] == ['a', 'b', 'c']
+    assert rows[0][1]['location'] == 'Down\ntown'
+    assert rows[1][1]['location'] == 'say "hi"\n\nthere'
+    assert rows[1][1]['condition'] == 'Fa\nir'
+    assert all(error is None for _, _, error in rows)
+
+
+def test_matches_csv_reader():
+    random.seed(0)
+    values = ['plain', 'with space', '"quoted"', '"multi\nline"', '"a ""b"" c"', 'mid"quote', '"x"y', '""', '',
+              '"trailing\n"', '"\n\n"', '"a"""', '"a"b"c', 'a""', '"a""\n""b"', '"""\n"""', '"a"\n']
+    lines = ['k0,k1,k2']
+    for i in range(300):
+        lines.append(','.join([str(i)] + random.choices(values, k=2)))
+    text = '\n'.join(lines) + '\n'
+    expected = [row for row in csv.reader(io.StringIO(text)) if row]
+    header, expected = expected[0], expected[1:]
+    for chunk_size in (1, 5, 64, 4096):
+        assert [list(record.values()) for _, record, _ in records(text.encode(), 'csv', chunk_size)] == expected
+    assert header == ['k0', 'k1', 'k2']
+
+
+def test_unterminated_quote_is_bounded(monkeypatch):
+    monkeypatch.setattr(streaming, 'MAX_RECORD_SIZE', 100)
+    body = (HEADER + 'a,1500,3,2,"Urban,2000,Good\n' + 'x' * 60 + '\n' + 'y' * 60 + '\n'
+            'b,1200,2,1,Rural,1990,Fair\n').encode()
+    rows = records(body, 'csv')
+    assert rows[0][1] is None and 'unterminated quoted field' in rows[0][2]
+    assert rows[1][0] == 'b' and rows[1][2] is None
+    # At the end of the body an unterminated quote is parsed as csv.reader would
+    assert records((HEADER + 'c,900,1,1,"Rural\n').encode(), 'csv')[0][1]['location'] == 'Rural\n'
+
+
+def test_ndjson_records():
+    body = b'{"id": "a", "sqft": 1}\n\nnot json\n[1]\n{"sqft": 2}\n'
+    rows = records(body, 'ndjson')
+    assert [row_id for row_id, _, _ in rows] == ['a', 1, 2, 3]
+    assert rows[1][2].startswith('Invalid JSON') and rows[2][2] == 'Expected a JSON object'
+    assert rows[3][1] == {'sqft': 2}
+
+
+def test_bad_lines_are_row_errors(monkeypatch):
+    monkeypatch.setattr(streaming, 'MAX_RECORD_SIZE', 100)
+    body = b'{"sqft": 1}\n{"location": "\xff"}\n{"x": "' + b'y' * 300 + b'"}\n{"sqft": 2}\n'
+    for chunk_size in (1, 7, 4096):
+        rows = records(body, 'ndjson', chunk_size)
+        assert [row_id for row_id, _, _ in rows] == [0, 1, 2, 3]
+        assert rows[1][2].startswith('Invalid UTF-8') and 'exceeds 100 bytes' in rows[2][2]
+        assert rows[3][1] == {'sqft': 2}
+    rows = records((HEADER + 'a,1500,3,2,"Urb\xff",2000,Good\n' + 'b,1200,2,1,Rural,1990,Fair\n').encode('latin-1'), 'csv')
+    assert rows[0][2].startswith('Invalid UTF-8') and rows[1][0] == 'b'
+
+
+def test_score_stream_csv():
+    body = (HEADER + 'a,1500,3,2,"Down\ntown",2000,Good\n' + 'b,-1,2,1,Rural,1990,Fair\n').encode()
+
+    async def predict(requests):
+        return [request.sqft * 100 for request in requests]
+
+    async def run():
+        return ''.join([part async for part in score_stream(chunked(body, 3), 'csv', 1, predict)])
+
+    output = list(csv.reader(io.StringIO(asyncio.run(run()))))
+    assert output[0] == ['id', 'predicted_price', 'error']
+    assert output[1] == ['a', '150000.0', '']
+    assert output[2][0] == 'b' and output[2][1] == '' and 'sqft' in output[2][2]
+    assert len(output) == 3
+
+
+def test_matches_csv_reader_on_random_quoting():
+    random.seed(1)
+    for _ in range(2000):
+        text = 'h\n' + ''.join(random.choice('"",a\nb') for _ in range(random.randint(1, 16))) + '\n'
+        expected = [row[:1] for row in csv.reader(io.StringIO(text)) if row][1:]
+        assert [list(record.values()) for _, record, _ in records(text.encode(), 'csv', 3)] == expected, text
+
+
+def test_score_stream_row_errors_from_predict():
+    body = b'{"id": "a", "sqft": 1500, "bedrooms": 3, "bathrooms": 2, "location": "Urban", "year_built": 2000, "condition": "Good"}\n' \
+           b'{"id": "b", "sqft": 1200, "bedrooms": 2, "bathrooms": 1, "location": "Rural", "year_built": 1990, "condition": "Fair", "model_version": "nope"}\n'
+
+    async def predict(requests):
+        return ["Model version not found: nope" if request.model_version else request.sqft * 100 for request in requests]
+
+    async def run():
+        return ''.join([part async for part in score_stream(chunked(body, 5), 'ndjson', 10, predict)])
+
+    output = [json.loads(line) for line in asyncio.run(run()).splitlines()]
+    assert output == [{"id": "a", "predicted_price": 150000}, {"id": "b", "error": "Model version not found: nope"}]